@@ -10,7 +10,8 @@ from app.models import (
     message,
     call,
     activity_log,
-    file_attachment
+    file_attachment,
+    revoked_token
 )
 
 from app.models.user import User
@@ -20,6 +21,7 @@ from app.models.message import Message
 from app.models.call import Call
 from app.models.activity_log import ActivityLog
 from app.models.file_attachment import FileAttachment
+from app.models.revoked_token import RevokedToken
 
 
 
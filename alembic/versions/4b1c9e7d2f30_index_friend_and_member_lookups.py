@@ -0,0 +1,26 @@
+"""index friend and member lookups
+
+Revision ID: 4b1c9e7d2f30
+Revises: 65a9a492b6da
+Create Date: 2026-10-19 16:10:12.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b1c9e7d2f30'
+down_revision = '65a9a492b6da'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_friendships_addressee_id_status', 'friendships', ['addressee_id', 'status'], unique=False)
+    op.create_index('ix_group_members_group_id_user_id', 'group_members', ['group_id', 'user_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_group_members_group_id_user_id', table_name='group_members')
+    op.drop_index('ix_friendships_addressee_id_status', table_name='friendships')
@@ -0,0 +1,24 @@
+"""index file attachment urls
+
+Revision ID: 787c1d12a4dc
+Revises: da2fd392db7d
+Create Date: 2026-10-19 14:59:44.128349
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '787c1d12a4dc'
+down_revision = 'da2fd392db7d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(op.f('ix_file_attachments_file_url'), 'file_attachments', ['file_url'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_file_attachments_file_url'), table_name='file_attachments')
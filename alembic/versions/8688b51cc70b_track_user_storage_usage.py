@@ -0,0 +1,31 @@
+"""track user storage usage
+
+Revision ID: 8688b51cc70b
+Revises: 787c1d12a4dc
+Create Date: 2026-10-19 15:00:35.314855
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8688b51cc70b'
+down_revision = '787c1d12a4dc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('users', sa.Column('storage_used_bytes', sa.BigInteger(), server_default='0', nullable=False))
+    op.execute(
+        "UPDATE users SET storage_used_bytes = totals.used "
+        "FROM (SELECT user_id, SUM(file_size) AS used FROM file_attachments GROUP BY user_id) AS totals "
+        "WHERE users.id = totals.user_id"
+    )
+    op.create_index(op.f('ix_messages_file_url'), 'messages', ['file_url'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_messages_file_url'), table_name='messages')
+    op.drop_column('users', 'storage_used_bytes')
@@ -0,0 +1,33 @@
+"""add group member counters
+
+Revision ID: 9c2e4f1a7b85
+Revises: 4b1c9e7d2f30
+Create Date: 2026-10-19 17:02:44.903115
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c2e4f1a7b85'
+down_revision = '4b1c9e7d2f30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('groups', sa.Column('member_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('groups', sa.Column('admin_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        "UPDATE groups SET member_count = counts.members, admin_count = counts.admins "
+        "FROM (SELECT group_id, COUNT(*) AS members, "
+        "COUNT(*) FILTER (WHERE role = 'ADMIN') AS admins "
+        "FROM group_members WHERE is_active GROUP BY group_id) AS counts "
+        "WHERE groups.id = counts.group_id"
+    )
+
+
+def downgrade():
+    op.drop_column('groups', 'admin_count')
+    op.drop_column('groups', 'member_count')
@@ -0,0 +1,32 @@
+"""track group read markers
+
+Revision ID: b7d3a9e2c4f6
+Revises: 9c2e4f1a7b85
+Create Date: 2026-10-19 17:41:09.276530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3a9e2c4f6'
+down_revision = '9c2e4f1a7b85'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('group_members', sa.Column('last_read_message_id', sa.Integer(), nullable=True))
+    op.create_index('ix_messages_group_id_id', 'messages', ['group_id', 'id'], unique=False)
+    # Start existing members with nothing unread rather than the whole history
+    op.execute(
+        "UPDATE group_members SET last_read_message_id = latest.id "
+        "FROM (SELECT group_id, MAX(id) AS id FROM messages WHERE group_id IS NOT NULL GROUP BY group_id) AS latest "
+        "WHERE group_members.group_id = latest.group_id"
+    )
+
+
+def downgrade():
+    op.drop_index('ix_messages_group_id_id', table_name='messages')
+    op.drop_column('group_members', 'last_read_message_id')
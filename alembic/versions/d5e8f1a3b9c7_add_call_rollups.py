@@ -0,0 +1,73 @@
+"""add call rollups
+
+Revision ID: d5e8f1a3b9c7
+Revises: b7d3a9e2c4f6
+Create Date: 2026-10-19 18:52:40.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5e8f1a3b9c7'
+down_revision = 'b7d3a9e2c4f6'
+branch_labels = None
+depends_on = None
+
+
+def rollup_columns():
+    return [
+        sa.Column('calls_answered', sa.Integer(), nullable=False),
+        sa.Column('calls_missed', sa.Integer(), nullable=False),
+        sa.Column('calls_declined', sa.Integer(), nullable=False),
+        sa.Column('talk_seconds', sa.Integer(), nullable=False),
+        sa.Column('quality_score_total', sa.Integer(), nullable=False),
+        sa.Column('quality_score_count', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    ]
+
+
+def upgrade():
+    op.create_table('user_call_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('calls_made', sa.Integer(), nullable=False),
+    sa.Column('calls_received', sa.Integer(), nullable=False),
+    *rollup_columns(),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('daily_call_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('calls', sa.Integer(), nullable=False),
+    *rollup_columns(),
+    sa.PrimaryKeyConstraint('day')
+    )
+    # Backfill from calls that have already ended; live calls are added when they finish
+    op.execute(
+        "INSERT INTO user_call_stats (user_id, calls_made, calls_received, calls_answered, calls_missed, "
+        "calls_declined, talk_seconds, quality_score_total, quality_score_count, updated_at) "
+        "SELECT user_id, SUM(made), SUM(received), SUM(answered), SUM(missed), SUM(declined), "
+        "SUM(talk), SUM(quality), SUM(rated), timezone('utc', now()) FROM ("
+        "SELECT caller_id AS user_id, 1 AS made, 0 AS received, 0 AS answered, 0 AS missed, 0 AS declined, "
+        "COALESCE(duration_seconds, 0) AS talk, COALESCE(quality_score, 0) AS quality, "
+        "(quality_score IS NOT NULL)::int AS rated FROM calls WHERE status IN ('DECLINED', 'MISSED', 'COMPLETED') "
+        "UNION ALL "
+        "SELECT receiver_id, 0, 1, (answered_at IS NOT NULL)::int, (status = 'MISSED')::int, "
+        "(status = 'DECLINED')::int, COALESCE(duration_seconds, 0), COALESCE(quality_score, 0), "
+        "(quality_score IS NOT NULL)::int FROM calls WHERE status IN ('DECLINED', 'MISSED', 'COMPLETED')"
+        ") AS sides GROUP BY user_id"
+    )
+    op.execute(
+        "INSERT INTO daily_call_stats (day, calls, calls_answered, calls_missed, calls_declined, "
+        "talk_seconds, quality_score_total, quality_score_count, updated_at) "
+        "SELECT started_at::date, COUNT(*), COUNT(answered_at), COUNT(*) FILTER (WHERE status = 'MISSED'), "
+        "COUNT(*) FILTER (WHERE status = 'DECLINED'), COALESCE(SUM(duration_seconds), 0), "
+        "COALESCE(SUM(quality_score), 0), COUNT(quality_score), timezone('utc', now()) "
+        "FROM calls WHERE status IN ('DECLINED', 'MISSED', 'COMPLETED') GROUP BY started_at::date"
+    )
+
+
+def downgrade():
+    op.drop_table('daily_call_stats')
+    op.drop_table('user_call_stats')
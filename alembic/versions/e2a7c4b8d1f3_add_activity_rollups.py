@@ -0,0 +1,70 @@
+"""add activity rollups and archive
+
+Revision ID: e2a7c4b8d1f3
+Revises: d5e8f1a3b9c7
+Create Date: 2026-10-19 19:47:12.503817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a7c4b8d1f3'
+down_revision = 'd5e8f1a3b9c7'
+branch_labels = None
+depends_on = None
+
+# Created with activity_logs
+activity_type = postgresql.ENUM(name='activitytype', create_type=False)
+
+
+def upgrade():
+    op.create_index(op.f('ix_activity_logs_created_at'), 'activity_logs', ['created_at'], unique=False)
+    op.create_table('activity_logs_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('activity_type', activity_type, nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('ip_address', sa.String(), nullable=True),
+    sa.Column('user_agent', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_activity_logs_archive_user_id'), 'activity_logs_archive', ['user_id'], unique=False)
+    op.create_index(op.f('ix_activity_logs_archive_created_at'), 'activity_logs_archive', ['created_at'], unique=False)
+    op.create_table('activity_daily_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('activity_type', activity_type, nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'activity_type')
+    )
+    op.create_table('activity_user_daily_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('activity_type', activity_type, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('day', 'activity_type', 'user_id')
+    )
+    op.create_index('ix_activity_user_daily_stats_user_id_day', 'activity_user_daily_stats', ['user_id', 'day'], unique=False)
+    op.create_table('activity_rollup_state',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('last_id', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+    # Existing rows are folded in by the maintenance task, starting from the oldest
+    op.execute("INSERT INTO activity_rollup_state (name, last_id, updated_at) VALUES ('activity_logs', 0, timezone('utc', now()))")
+
+
+def downgrade():
+    op.drop_table('activity_rollup_state')
+    op.drop_index('ix_activity_user_daily_stats_user_id_day', table_name='activity_user_daily_stats')
+    op.drop_table('activity_user_daily_stats')
+    op.drop_table('activity_daily_stats')
+    op.drop_index(op.f('ix_activity_logs_archive_created_at'), table_name='activity_logs_archive')
+    op.drop_index(op.f('ix_activity_logs_archive_user_id'), table_name='activity_logs_archive')
+    op.drop_table('activity_logs_archive')
+    op.drop_index(op.f('ix_activity_logs_created_at'), table_name='activity_logs')
@@ -0,0 +1,33 @@
+"""backfill group read markers
+
+Revision ID: f3b6d9a2c8e4
+Revises: e2a7c4b8d1f3
+Create Date: 2026-10-19 21:06:38.114205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b6d9a2c8e4'
+down_revision = 'e2a7c4b8d1f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Members who joined after b7d3a9e2c4f6 started without a marker and saw the
+    # whole history as unread; start them at the newest message when they joined
+    op.execute(
+        "UPDATE group_members SET last_read_message_id = ("
+        "SELECT MAX(messages.id) FROM messages "
+        "WHERE messages.group_id = group_members.group_id "
+        "AND messages.created_at <= group_members.joined_at"
+        ") WHERE last_read_message_id IS NULL"
+    )
+
+
+def downgrade():
+    # Markers set here are indistinguishable from ones set by reading
+    pass
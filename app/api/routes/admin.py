@@ -1,16 +1,41 @@
-from typing import List
-from datetime import datetime
+import asyncio
+from typing import List, Optional
+from datetime import date, datetime, timedelta
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, WebSocket, WebSocketDisconnect
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.dependencies import get_db, get_current_user
+from app.core.activity_retention import activity_maintenance
+from app.core.auth_cache import invalidate_principal, principal_cache, token_cache
+from app.core.config import settings
+from app.core.dependencies import get_db, get_current_user, get_read_db
+from app.core.email import mail_queue
+from app.core.export import ExportFormat, export_response
+from app.core.friend_graph import friend_graph
+from app.core.group_counters import repair_group_counters
+from app.core.membership_cache import membership_cache
+from app.core.rate_limit import limiter
+from app.core.security import password_hasher
+from app.core.token_revocation import revocation_store
+from app.db.session import async_session, replica_router
 from app.models.user import User, UserRole
 from app.models.message import Message
-from app.models.activity_log import ActivityLog, ActivityType
+from app.models.activity_log import ActivityDailyStats, ActivityLog, ActivityType, ActivityUserDailyStats
+from app.models.call import DailyCallStats
 from app.schemas.user import UserResponse
 from app.schemas.message import MessageResponse
-from app.schemas.activity_log import ActivityLogResponse
+from app.schemas.activity_log import (
+    ActivityDailyStatsResponse,
+    ActivityLogResponse,
+    ActivityTypeCountResponse,
+    ActivityUserCountResponse,
+)
+from app.schemas.call import DailyCallStatsResponse
+from app.websockets.call_signaling import call_signaling
+from app.websockets.fanout import fanout_engine
+from app.websockets.flood_control import flood_metrics
+from app.websockets.live_stats import live_stats
+from app.websockets.presence import presence
 from sqlalchemy import select
 
 
@@ -32,7 +57,7 @@ async def get_all_users(
     skip: int = 0,
     limit: int = 100,
     current_admin: User = Depends(get_current_admin),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all users (admin only)."""
     users = await User.get_all_users(db, skip=skip, limit=limit)
@@ -79,6 +104,7 @@ async def deactivate_user(
         user_id,
         is_active=False
     )
+    await invalidate_principal(user_id)
     
     return {"detail": f"User {user.username} has been deactivated"}
 
@@ -101,23 +127,45 @@ async def activate_user(
         user_id,
         is_active=True
     )
+    await invalidate_principal(user_id)
     
     return {"detail": f"User {user.username} has been activated"}
 
-@router.get("/messages", response_model=List[MessageResponse])
-async def get_all_messages(
-    skip: int = 0,
-    limit: int = 100,
-    user_id: int = None,
-    date_from: datetime = None,
-    date_to: datetime = None,
+@router.post("/users/{user_id}/sign-out")
+async def force_sign_out(
+    user_id: int,
     current_admin: User = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get messages with filters (admin only)."""
-    query = select(Message)
+    """Revoke every token issued to a user (admin only)."""
+    user = await User.get_by_id(db, user_id)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    await revocation_store.revoke_user(db, user_id)
+    await invalidate_principal(user_id)
+    
+    return {"detail": f"User {user.username} has been signed out of all devices"}
+
+def _check_date_range(date_from: date, date_to: date, max_days: int):
+    """Raise if a stats date range is reversed or too long."""
+    if date_from > date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="date_from must not be after date_to"
+        )
     
-    # Apply filters
+    if (date_to - date_from).days >= max_days:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ranges are limited to {max_days} days"
+        )
+
+def _filter_messages(query, user_id: Optional[int], date_from: Optional[datetime], date_to: Optional[datetime]):
+    """Apply the admin message filters to a query."""
     if user_id:
         query = query.where(
             (Message.sender_id == user_id) | (Message.receiver_id == user_id)
@@ -129,6 +177,42 @@ async def get_all_messages(
     if date_to:
         query = query.where(Message.created_at <= date_to)
     
+    return query
+
+def _filter_activity_logs(
+    query,
+    user_id: Optional[int],
+    activity_type: Optional[ActivityType],
+    date_from: Optional[datetime],
+    date_to: Optional[datetime]
+):
+    """Apply the admin activity log filters to a query."""
+    if user_id:
+        query = query.where(ActivityLog.user_id == user_id)
+    
+    if activity_type:
+        query = query.where(ActivityLog.activity_type == activity_type)
+    
+    if date_from:
+        query = query.where(ActivityLog.created_at >= date_from)
+    
+    if date_to:
+        query = query.where(ActivityLog.created_at <= date_to)
+    
+    return query
+
+@router.get("/messages", response_model=List[MessageResponse])
+async def get_all_messages(
+    skip: int = 0,
+    limit: int = 100,
+    user_id: int = None,
+    date_from: datetime = None,
+    date_to: datetime = None,
+    current_admin: User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get messages with filters (admin only)."""
+    query = _filter_messages(select(Message), user_id, date_from, date_to)
     query = query.order_by(Message.created_at.desc()).offset(skip).limit(limit)
     
     result = await db.execute(query)
@@ -136,6 +220,26 @@ async def get_all_messages(
     
     return messages
 
+@router.get("/messages/export")
+async def export_messages(
+    format: ExportFormat = ExportFormat.NDJSON,
+    gzip: bool = False,
+    after_id: Optional[int] = None,
+    user_id: int = None,
+    date_from: datetime = None,
+    date_to: datetime = None,
+    current_admin: User = Depends(get_current_admin)
+):
+    """Stream every matching message as NDJSON or CSV, in id order (admin only).
+    
+    An interrupted export resumes with ``after_id`` set to the last id received.
+    """
+    query = _filter_messages(select(*Message.__table__.columns), user_id, date_from, date_to)
+    if after_id is not None:
+        query = query.where(Message.id > after_id)
+    
+    return export_response(query.order_by(Message.id), "messages", format, gzip)
+
 @router.delete("/messages/{message_id}")
 async def delete_message_admin(
     message_id: int,
@@ -177,27 +281,177 @@ async def get_activity_logs(
     date_from: datetime = None,
     date_to: datetime = None,
     current_admin: User = Depends(get_current_admin),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get activity logs with filters (admin only)."""
-    query = select(ActivityLog)
+    query = _filter_activity_logs(select(ActivityLog), user_id, activity_type, date_from, date_to)
+    query = query.order_by(ActivityLog.created_at.desc()).offset(skip).limit(limit)
     
-    # Apply filters
-    if user_id:
-        query = query.where(ActivityLog.user_id == user_id)
+    result = await db.execute(query)
+    logs = result.scalars().all()
     
-    if activity_type:
-        query = query.where(ActivityLog.activity_type == activity_type)
+    return logs
+
+@router.get("/activity-logs/export")
+async def export_activity_logs(
+    format: ExportFormat = ExportFormat.NDJSON,
+    gzip: bool = False,
+    after_id: Optional[int] = None,
+    user_id: int = None,
+    activity_type: ActivityType = None,
+    date_from: datetime = None,
+    date_to: datetime = None,
+    current_admin: User = Depends(get_current_admin)
+):
+    """Stream every matching activity log as NDJSON or CSV, in id order (admin only).
     
-    if date_from:
-        query = query.where(ActivityLog.created_at >= date_from)
+    An interrupted export resumes with ``after_id`` set to the last id received.
+    """
+    query = _filter_activity_logs(
+        select(*ActivityLog.__table__.columns), user_id, activity_type, date_from, date_to
+    )
+    if after_id is not None:
+        query = query.where(ActivityLog.id > after_id)
     
-    if date_to:
-        query = query.where(ActivityLog.created_at <= date_to)
+    return export_response(query.order_by(ActivityLog.id), "activity_logs", format, gzip)
+
+@router.get("/calls/daily", response_model=List[DailyCallStatsResponse])
+async def get_daily_call_stats(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current_admin: User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get platform-wide call totals per day, from the daily rollups (admin only)."""
+    date_to = date_to or datetime.utcnow().date()
+    date_from = date_from or date_to - timedelta(days=29)
+    _check_date_range(date_from, date_to, settings.CALL_STATS_MAX_DAYS)
     
-    query = query.order_by(ActivityLog.created_at.desc()).offset(skip).limit(limit)
+    return await DailyCallStats.get_range(db, date_from, date_to)
+
+@router.get("/activity-stats/daily", response_model=List[ActivityDailyStatsResponse])
+async def get_daily_activity_stats(
+    activity_type: ActivityType = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current_admin: User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get activity counts per day and type, e.g. logins per day, from the rollups (admin only).
     
-    result = await db.execute(query)
-    logs = result.scalars().all()
+    The rollups trail the raw logs by up to one maintenance interval.
+    """
+    date_to = date_to or datetime.utcnow().date()
+    date_from = date_from or date_to - timedelta(days=29)
+    _check_date_range(date_from, date_to, settings.ACTIVITY_STATS_MAX_DAYS)
     
-    return logs
+    return await ActivityDailyStats.get_range(db, date_from, date_to, activity_type)
+
+@router.get("/activity-stats/top-users", response_model=List[ActivityUserCountResponse])
+async def get_top_users_by_activity(
+    activity_type: ActivityType,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    current_admin: User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get the users with the most activities of a type, this month by default (admin only)."""
+    date_to = date_to or datetime.utcnow().date()
+    date_from = date_from or date_to.replace(day=1)
+    _check_date_range(date_from, date_to, settings.ACTIVITY_STATS_MAX_DAYS)
+    
+    rows = await ActivityUserDailyStats.get_top_users(db, activity_type, date_from, date_to, limit)
+    return [ActivityUserCountResponse(user_id=user_id, count=count) for user_id, count in rows]
+
+@router.get("/activity-stats/users/{user_id}", response_model=List[ActivityTypeCountResponse])
+async def get_user_activity_stats(
+    user_id: int,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current_admin: User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get one user's activity counts per type, this month by default (admin only)."""
+    date_to = date_to or datetime.utcnow().date()
+    date_from = date_from or date_to.replace(day=1)
+    _check_date_range(date_from, date_to, settings.ACTIVITY_STATS_MAX_DAYS)
+    
+    rows = await ActivityUserDailyStats.get_user_totals(db, user_id, date_from, date_to)
+    return [ActivityTypeCountResponse(activity_type=activity_type, count=count) for activity_type, count in rows]
+
+@router.post("/activity-logs/maintenance")
+async def run_activity_maintenance(
+    current_admin: User = Depends(get_current_admin)
+):
+    """Roll up settled activity logs and prune those past retention now (admin only)."""
+    counts = await activity_maintenance.run()
+    return {
+        "detail": f"Rolled up {counts['rolled_up']} and pruned {counts['pruned']} activity logs",
+        **counts
+    }
+
+@router.post("/groups/repair-counters")
+async def repair_counters(
+    current_admin: User = Depends(get_current_admin)
+):
+    """Recompute every group's member and admin counts (admin only)."""
+    repaired = await repair_group_counters()
+    return {"detail": f"Repaired counters of {repaired} groups", "repaired": repaired}
+
+@router.get("/metrics")
+async def get_metrics(
+    current_admin: User = Depends(get_current_admin)
+):
+    """Get in-process performance metrics (admin only)."""
+    return {
+        "password_hasher": password_hasher.stats(),
+        "principal_cache": principal_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "token_revocation": revocation_store.stats(),
+        "mail_queue": mail_queue.stats(),
+        "rate_limiter": limiter.stats(),
+        "websocket_flood_control": flood_metrics.stats(),
+        "friend_graph": friend_graph.stats(),
+        "group_membership": membership_cache.stats(),
+        "presence": presence.stats(),
+        "fanout": fanout_engine.stats(),
+        "calls": call_signaling.stats(),
+        "activity_maintenance": activity_maintenance.stats(),
+        "database": replica_router.stats()
+    }
+
+@router.get("/live-stats")
+async def get_live_stats(
+    current_admin: User = Depends(get_current_admin)
+):
+    """Get live counters summed over all workers, refreshed every second (admin only)."""
+    return live_stats.snapshot()
+
+@router.websocket("/live-stats/ws")
+async def stream_live_stats(
+    websocket: WebSocket,
+    token: str = Query(...)
+):
+    """Push live counters to an admin once per interval."""
+    # Verify the token belongs to an admin; the session is returned to the pool before streaming
+    try:
+        async with async_session() as db:
+            user = await get_current_user(token, db)
+    except HTTPException:
+        await websocket.close(code=4001)
+        return
+    
+    if user.role != UserRole.ADMIN or not user.is_active:
+        await websocket.close(code=4003)
+        return
+    
+    await websocket.accept()
+    
+    try:
+        while True:
+            await websocket.send_json(live_stats.snapshot())
+            await asyncio.sleep(settings.LIVE_STATS_INTERVAL_SECONDS)
+    except (WebSocketDisconnect, RuntimeError):
+        # Closed by the client
+        pass
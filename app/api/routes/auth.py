@@ -1,20 +1,20 @@
 from datetime import datetime, timedelta
-from typing import Annotated
+from typing import Annotated, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
+from jose import JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 
+from app.core.auth_cache import decode_token, invalidate_principal
 from app.core.config import settings
-from app.core.dependencies import get_db, get_current_user
+from app.core.dependencies import get_db, get_current_user, oauth2_scheme
 from app.core.security import (
     create_access_token,
     create_refresh_token,
     generate_password_reset_token,
-    hash_password,
-    verify_password,
+    password_hasher,
+    password_needs_rehash,
     verify_token,
     generate_verification_token,
     validate_password_strength,
@@ -22,16 +22,21 @@ from app.core.security import (
     verify_2fa_code
 )
 from app.core.email import email_client
+from app.core.rate_limit import client_ip, limiter
+from app.core.token_revocation import revocation_store
 from app.models.user import User
 from app.models.activity_log import ActivityLog, ActivityType
 from app.schemas.token import RefreshToken, Token, TokenPayload, TwoFactorToken
 from app.schemas.user import UserCreate, UserResponse, VerifyEmail, ResetPassword, RequestPasswordReset
 
 router = APIRouter()
-limiter = Limiter(key_func=get_remote_address)
 
-@router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-@limiter.limit(settings.REGISTER_RATE_LIMIT)
+@router.post(
+    "/register",
+    response_model=UserResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(limiter.limit(settings.REGISTER_RATE_LIMIT, "register"))]
+)
 async def register(
     user_data: UserCreate, 
     request: Request,
@@ -66,7 +71,7 @@ async def register(
     token_expires = datetime.utcnow() + timedelta(hours=settings.VERIFICATION_TOKEN_EXPIRE_HOURS)
     
     # Create new user
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await password_hasher.hash(user_data.password)
     user_in_db = await User.create(
         db,
         email=user_data.email,
@@ -79,7 +84,7 @@ async def register(
         verification_token_expires=token_expires
     )
     
-    # Send verification email
+    # Queue verification email
     await email_client.send_verification_email(
         user_data.email,
         user_data.username,
@@ -91,7 +96,7 @@ async def register(
         db,
         user_in_db.id,
         ActivityType.REGISTER,
-        ip_address=request.client.host,
+        ip_address=client_ip(request),
         user_agent=request.headers.get("user-agent")
     )
     
@@ -126,6 +131,7 @@ async def verify_email(
         verification_token=None,
         verification_token_expires=None
     )
+    await invalidate_principal(user.id)
     
     # Log activity
     await ActivityLog.log_activity(
@@ -136,8 +142,11 @@ async def verify_email(
     
     return updated_user
 
-@router.post("/login", response_model=Token)
-@limiter.limit(settings.LOGIN_RATE_LIMIT)
+@router.post(
+    "/login",
+    response_model=Token,
+    dependencies=[Depends(limiter.limit(settings.LOGIN_RATE_LIMIT, "login"))]
+)
 async def login(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     request: Request,
@@ -148,7 +157,7 @@ async def login(
     if not user:
         user = await User.get_by_username(db, form_data.username)
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await password_hasher.verify(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email/username or password",
@@ -183,6 +192,15 @@ async def login(
             "requires_2fa": True
         }
     
+    # Upgrade hashes made with outdated cost parameters, only for logins that succeed
+    if password_needs_rehash(user.hashed_password):
+        await User.update(
+            db,
+            user.id,
+            hashed_password=await password_hasher.hash(form_data.password)
+        )
+        await invalidate_principal(user.id)
+    
     # Update last seen
     await User.update_last_seen(db, user.id)
     
@@ -200,7 +218,7 @@ async def login(
         db,
         user.id,
         ActivityType.LOGIN,
-        ip_address=request.client.host,
+        ip_address=client_ip(request),
         user_agent=request.headers.get("user-agent")
     )
     
@@ -264,7 +282,7 @@ async def verify_2fa(
             db,
             user.id,
             ActivityType.LOGIN,
-            ip_address=request.client.host,
+            ip_address=client_ip(request),
             user_agent=request.headers.get("user-agent")
         )
         
@@ -291,7 +309,7 @@ async def refresh_token_endpoint(
     try:
         payload = verify_token(token_data.refresh_token)
         user_id = payload.get("sub")
-        if user_id is None:
+        if user_id is None or revocation_store.is_revoked(payload):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid refresh token",
@@ -306,6 +324,14 @@ async def refresh_token_endpoint(
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
+        # Refresh tokens live for days, so check the database in case this worker missed a revocation
+        if await revocation_store.is_revoked_in_db(db, payload, user):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid refresh token",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        
         # Create new tokens
         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
@@ -331,24 +357,59 @@ async def refresh_token_endpoint(
 @router.post("/logout")
 async def logout(
     request: Request,
+    token: Annotated[str, Depends(oauth2_scheme)],
+    logout_data: Optional[RefreshToken] = None,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Log out a user."""
-    # In a stateless JWT system, we can't invalidate tokens
-    # But we can log the logout for tracking purposes
+    """Log out a user by revoking the current access token and, if given, the refresh token."""
+    await revocation_store.revoke_token(db, decode_token(token))
+    
+    if logout_data and logout_data.refresh_token:
+        try:
+            refresh_payload = verify_token(logout_data.refresh_token)
+        except JWTError:
+            refresh_payload = None
+        
+        # Only allow revoking the caller's own refresh token
+        if refresh_payload and refresh_payload.get("sub") == str(current_user.id):
+            await revocation_store.revoke_token(db, refresh_payload)
     
     await ActivityLog.log_activity(
         db,
         current_user.id,
         ActivityType.LOGOUT,
-        ip_address=request.client.host,
+        ip_address=client_ip(request),
         user_agent=request.headers.get("user-agent")
     )
     
     return {"detail": "Successfully logged out"}
 
-@router.post("/request-password-reset")
-@limiter.limit(settings.LOGIN_RATE_LIMIT)
+@router.post("/logout-all")
+async def logout_all_devices(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Log out a user everywhere by revoking every token issued so far."""
+    await revocation_store.revoke_user(db, current_user.id)
+    await invalidate_principal(current_user.id)
+    
+    await ActivityLog.log_activity(
+        db,
+        current_user.id,
+        ActivityType.LOGOUT,
+        description="Logged out from all devices",
+        ip_address=client_ip(request),
+        user_agent=request.headers.get("user-agent")
+    )
+    
+    return {"detail": "Successfully logged out from all devices"}
+
+@router.post(
+    "/request-password-reset",
+    dependencies=[Depends(limiter.limit(settings.LOGIN_RATE_LIMIT, "request_password_reset"))]
+)
 async def request_password_reset(
     reset_request: RequestPasswordReset,
     request: Request,
@@ -374,7 +435,7 @@ async def request_password_reset(
         password_reset_expires=token_expires
     )
     
-    # Send password reset email
+    # Queue password reset email
     await email_client.send_password_reset_email(
         user.email,
         user.username,
@@ -413,7 +474,7 @@ async def reset_password(
         )
     
     # Update password
-    hashed_password = hash_password(reset_data.new_password)
+    hashed_password = await password_hasher.hash(reset_data.new_password)
     await User.update(
         db,
         user.id,
@@ -421,6 +482,7 @@ async def reset_password(
         password_reset_token=None,
         password_reset_expires=None
     )
+    await invalidate_principal(user.id)
     
     return {"detail": "Password has been reset successfully"}
 
@@ -439,6 +501,7 @@ async def setup_2fa(
         current_user.id,
         two_factor_secret=secret
     )
+    await invalidate_principal(current_user.id)
     
     # Generate provisioning URI for QR code
     provisioning_uri = get_2fa_provisioning_uri(secret, current_user.email)
@@ -468,6 +531,7 @@ async def enable_2fa(
         current_user.id,
         two_factor_enabled=True
     )
+    await invalidate_principal(current_user.id)
     
     return {"detail": "Two-factor authentication has been enabled"}
 
@@ -492,5 +556,6 @@ async def disable_2fa(
         two_factor_enabled=False,
         two_factor_secret=None
     )
+    await invalidate_principal(current_user.id)
     
     return {"detail": "Two-factor authentication has been disabled"}
@@ -1,16 +1,71 @@
+from datetime import datetime, timedelta
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.dependencies import get_current_active_user, get_db
-from app.models.call import Call, CallStatus
-from app.models.friendship import Friendship, FriendshipStatus
+from app.core.config import settings
+from app.core.dependencies import get_current_active_user, get_db, get_read_db
+from app.core.friend_graph import friend_graph
+from app.models.call import Call, CallStatus, UserCallStats
 from app.models.user import User
-from app.schemas.call import CallCreate, CallResponse, CallUpdate
+from app.schemas.call import CallCreate, CallResponse, CallUpdate, UserCallStatsResponse
+from app.websockets.call_signaling import CallSession, call_signaling
 from app.websockets.connection_manager import connection_manager
+from app.websockets.presence import presence
 
 router = APIRouter()
 
+def _session_response(session: CallSession) -> CallResponse:
+    """Describe a live call from its in-memory state."""
+    return CallResponse(
+        id=session.id,
+        caller_id=session.caller_id,
+        receiver_id=session.receiver_id,
+        status=session.status,
+        started_at=session.started_at,
+        answered_at=session.answered_at,
+        ended_at=session.ended_at,
+        duration_seconds=session.duration_seconds,
+        quality_score=session.quality_score
+    )
+
+def _check_transition(current_status: CallStatus, receiver_id: int, user_id: int, new_status: CallStatus):
+    """Raise if a participant cannot move a call from its current status to a new one."""
+    if new_status == CallStatus.ACCEPTED:
+        if receiver_id != user_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Only the receiver can accept a call"
+            )
+        
+        if current_status != CallStatus.INITIATED:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Call cannot be accepted in its current state"
+            )
+    
+    elif new_status == CallStatus.DECLINED:
+        if receiver_id != user_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Only the receiver can decline a call"
+            )
+        
+        if current_status != CallStatus.INITIATED:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Call cannot be declined in its current state"
+            )
+    
+    elif new_status == CallStatus.COMPLETED:
+        # Either party can end the call
+        if current_status != CallStatus.ACCEPTED:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Only active calls can be completed"
+            )
+
 @router.post("/", response_model=CallResponse, status_code=status.HTTP_201_CREATED)
 async def initiate_call(
     call: CallCreate,
@@ -27,8 +82,8 @@ async def initiate_call(
         )
     
     # Check if users are friends
-    friendship = await Friendship.get_friendship(db, current_user.id, call.receiver_id)
-    if not friendship or friendship.status != FriendshipStatus.ACCEPTED:
+    are_friends = await friend_graph.are_friends(db, current_user.id, call.receiver_id)
+    if not are_friends:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You can only call friends"
@@ -42,29 +97,14 @@ async def initiate_call(
         status=CallStatus.INITIATED
     )
     
-    # Notify receiver if online
-    if connection_manager.is_user_connected(call.receiver_id):
-        await connection_manager.send_call_notification(
-            call.receiver_id,
-            {
-                "type": "incoming_call",
-                "call": {
-                    "id": new_call.id,
-                    "caller_id": current_user.id,
-                    "caller_name": current_user.username,
-                    "started_at": new_call.started_at.isoformat()
-                }
-            }
-        )
-    else:
-        # If receiver is not online, mark as missed
-        await Call.update(
-            db,
-            new_call.id,
-            status=CallStatus.MISSED
-        )
+    # Ring the receiver until they answer or the ring timeout; offline receivers miss the call at once
+    session = await call_signaling.ring(
+        new_call,
+        current_user.username,
+        presence.is_online(call.receiver_id)
+    )
     
-    return new_call
+    return _session_response(session)
 
 @router.put("/{call_id}", response_model=CallResponse)
 async def update_call_status(
@@ -73,8 +113,65 @@ async def update_call_status(
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Update call status (accept, decline, complete)."""
-    # Get call
+    """Update call status (accept, decline, complete).
+    
+    Returns 202 when the call is ringing on another worker: the change is
+    handed to that worker and its outcome arrives over the WebSocket.
+    """
+    # Check if the change is one a participant can make
+    if call_update.status not in call_signaling.STATUS_FRAMES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid call status update"
+        )
+    
+    # Live calls are driven by the state machine of the worker that rang them, without touching the database
+    session = call_signaling.get(call_id)
+    if session is not None:
+        if current_user.id not in (session.caller_id, session.receiver_id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You are not involved in this call"
+            )
+        
+        _check_transition(session.status, session.receiver_id, current_user.id, call_update.status)
+        
+        # The state machine notifies both parties and persists the final state once
+        await call_signaling.apply(session, current_user.id, call_update.status, call_update.quality_score)
+        if session.status != call_update.status:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Call was updated concurrently"
+            )
+        return _session_response(session)
+    
+    # An answered call is completed in one conditional UPDATE, which also covers
+    # calls whose worker went away; a live owner is told to end its session too
+    if call_update.status == CallStatus.COMPLETED:
+        completed_call = await Call.complete_call(db, call_id, current_user.id, call_update.quality_score)
+        if completed_call:
+            await call_signaling.handle_frame(current_user.id, {
+                "type": call_signaling.STATUS_FRAMES[CallStatus.COMPLETED],
+                "call_id": call_id,
+                "quality_score": call_update.quality_score
+            })
+            
+            # Notify the other party
+            other_user_id = completed_call.caller_id if current_user.id == completed_call.receiver_id else completed_call.receiver_id
+            if connection_manager.is_user_connected(other_user_id):
+                await connection_manager.send_call_notification(
+                    other_user_id,
+                    {
+                        "type": "call_status_updated",
+                        "call": {
+                            "id": completed_call.id,
+                            "status": completed_call.status
+                        }
+                    }
+                )
+            return completed_call
+    
+    # Nothing changed; load the call to tell why
     call = await Call.get_by_id(db, call_id)
     if not call:
         raise HTTPException(
@@ -89,96 +186,46 @@ async def update_call_status(
             detail="You are not involved in this call"
         )
     
-    # Handle different status updates
-    if call_update.status == CallStatus.ACCEPTED:
-        if call.receiver_id != current_user.id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Only the receiver can accept a call"
-            )
-        
-        if call.status != CallStatus.INITIATED:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Call cannot be accepted in its current state"
-            )
-        
-        # Update call as accepted
-        updated_call = await Call.update(
-            db,
-            call_id,
-            status=CallStatus.ACCEPTED,
-            answered_at=datetime.utcnow()
-        )
+    _check_transition(call.status, call.receiver_id, current_user.id, call_update.status)
     
-    elif call_update.status == CallStatus.DECLINED:
-        if call.receiver_id != current_user.id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Only the receiver can decline a call"
-            )
-        
-        if call.status != CallStatus.INITIATED:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Call cannot be declined in its current state"
-            )
-        
-        # Update call as declined
-        updated_call = await Call.update(
-            db,
-            call_id,
-            status=CallStatus.DECLINED
+    if call.status == CallStatus.INITIATED:
+        ring_deadline = call.started_at + timedelta(
+            seconds=settings.CALL_RING_TIMEOUT_SECONDS + settings.CALL_ORPHAN_GRACE_SECONDS
         )
-    
-    elif call_update.status == CallStatus.COMPLETED:
-        # Either party can end the call
-        if call.status != CallStatus.ACCEPTED:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Only active calls can be completed"
+        if datetime.utcnow() < ring_deadline:
+            # Ringing on another worker, which applies the change and notifies both parties
+            await call_signaling.handle_frame(current_user.id, {
+                "type": call_signaling.STATUS_FRAMES[call_update.status],
+                "call_id": call_id,
+                "quality_score": call_update.quality_score
+            })
+            return JSONResponse(
+                status_code=status.HTTP_202_ACCEPTED,
+                content={"detail": "Call update pending", "call_id": call_id, "status": "pending"}
             )
         
-        # Complete the call and calculate duration
-        await Call.complete_call(db, call_id)
-        updated_call = await Call.get_by_id(db, call_id)
-        
-        # Update quality score if provided
-        if call_update.quality_score is not None:
-            updated_call = await Call.update(
-                db,
-                call_id,
-                quality_score=call_update.quality_score
+        # The worker that rang it went away without ending it; nobody can pick it up now
+        final_status = CallStatus.DECLINED if call_update.status == CallStatus.DECLINED else CallStatus.MISSED
+        ended_call = await Call.finish(db, call_id, final_status, datetime.utcnow())
+        if ended_call and final_status == CallStatus.DECLINED:
+            return ended_call
+        if ended_call:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Call is no longer ringing"
             )
     
-    else:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid call status update"
-        )
-    
-    # Notify the other party
-    other_user_id = call.caller_id if current_user.id == call.receiver_id else call.receiver_id
-    if connection_manager.is_user_connected(other_user_id):
-        await connection_manager.send_call_notification(
-            other_user_id,
-            {
-                "type": "call_status_updated",
-                "call": {
-                    "id": call.id,
-                    "status": call_update.status
-                }
-            }
-        )
-    
-    return updated_call
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Call was updated concurrently"
+    )
 
 @router.get("/history", response_model=List[CallResponse])
 async def get_call_history(
     skip: int = 0,
     limit: int = 20,
     current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get call history for the current user."""
     calls = await Call.get_call_history(
@@ -189,3 +236,11 @@ async def get_call_history(
     )
     
     return calls
+
+@router.get("/stats", response_model=UserCallStatsResponse)
+async def get_call_stats(
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get call totals for the current user."""
+    return await UserCallStats.get_for_user(db, current_user.id)
@@ -1,18 +1,24 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.core.dependencies import get_current_active_user, get_db
+from app.core.friend_graph import friend_graph
+from app.core.pagination import paginate
 from app.models.friendship import Friendship, FriendshipStatus
 from app.models.user import User
 from app.schemas.friendship import (
     FriendRequestResponse,
     FriendshipCreate,
     FriendshipResponse,
-    FriendshipUpdate
+    FriendshipUpdate,
+    FriendSuggestionResponse,
+    MutualFriendsResponse
 )
 from app.schemas.user import UserResponse
+from app.websockets.presence import presence
 
 router = APIRouter()
 
@@ -56,6 +62,7 @@ async def send_friend_request(
                 # The other user already sent a request, accept it
                 existing.status = FriendshipStatus.ACCEPTED
                 await db.commit()
+                await friend_graph.friendship_changed(current_user.id, request.addressee_id)
                 return existing
         elif existing.status == FriendshipStatus.BLOCKED:
             raise HTTPException(
@@ -75,28 +82,17 @@ async def send_friend_request(
 
 @router.get("/requests", response_model=List[FriendRequestResponse])
 async def get_friend_requests(
+    response: Response,
+    cursor: Optional[int] = None,
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get all pending friend requests for the current user."""
-    requests = await Friendship.get_pending_requests(db, current_user.id)
+    """Get pending friend requests for the current user, one page at a time."""
+    rows = await Friendship.get_pending_requests_page(db, current_user.id, after_id=cursor, limit=limit + 1)
+    rows = paginate(response, rows, limit, lambda row: row.id)
     
-    # Enrich with requester information
-    result = []
-    for req in requests:
-        requester = await User.get_by_id(db, req.requester_id)
-        if requester:
-            result.append(
-                FriendRequestResponse(
-                    id=req.id,
-                    requester_id=requester.id,
-                    requester_username=requester.username,
-                    requester_avatar=requester.avatar_url,
-                    created_at=req.created_at
-                )
-            )
-    
-    return result
+    return [FriendRequestResponse(**row._mapping) for row in rows]
 
 @router.put("/requests/{request_id}", response_model=FriendshipResponse)
 async def respond_to_friend_request(
@@ -126,26 +122,79 @@ async def respond_to_friend_request(
         request_id,
         status=response.status
     )
+    await friend_graph.friendship_changed(request.requester_id, current_user.id)
     
     return updated
 
 @router.get("/", response_model=List[UserResponse])
 async def get_friends(
+    response: Response,
+    cursor: Optional[int] = None,
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get friends for the current user, one page at a time."""
+    rows = await Friendship.get_friends_page(db, current_user.id, after_id=cursor, limit=limit + 1)
+    rows = paginate(response, rows, limit, lambda row: row.id)
+    
+    return [UserResponse(**row._mapping) for row in rows]
+
+@router.get("/online", response_model=List[UserResponse])
+async def get_online_friends(
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the current user's friends who are online and share their status."""
+    adjacency = await friend_graph.get(db, current_user.id)
+    online_ids = presence.online(adjacency.friends)
+    rows = await User.get_profiles(db, online_ids, online_visible_only=True)
+    
+    return [UserResponse(**row._mapping, online_status=True) for row in rows]
+
+@router.get("/mutual/{user_id}", response_model=MutualFriendsResponse)
+async def get_mutual_friends(
+    user_id: int,
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the friends the current user has in common with another user."""
+    # Check if user exists
+    user = await User.get_by_id(db, user_id)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    mutual_ids = await friend_graph.mutual_friends(db, current_user.id, user_id)
+    rows = await User.get_profiles(db, mutual_ids[:limit])
+    
+    return MutualFriendsResponse(
+        user_id=user_id,
+        count=len(mutual_ids),
+        friends=[UserResponse(**row._mapping) for row in rows]
+    )
+
+@router.get("/suggestions", response_model=List[FriendSuggestionResponse])
+async def get_friend_suggestions(
+    limit: int = Query(20, ge=1, le=settings.FRIEND_SUGGESTIONS_MAX),
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get all friends for the current user."""
-    friendships = await Friendship.get_friends(db, current_user.id)
+    """Suggest people the current user may know, ranked by mutual friends."""
+    ranked = await friend_graph.suggestions(db, current_user.id)
     
-    # Get the friend user objects
-    friends = []
-    for friendship in friendships:
-        friend_id = friendship.addressee_id if friendship.requester_id == current_user.id else friendship.requester_id
-        friend = await User.get_by_id(db, friend_id)
-        if friend:
-            friends.append(friend)
+    # Leave out users with a request already pending either way
+    pending = set(await Friendship.get_pending_user_ids(db, current_user.id))
+    mutual_counts = {user_id: count for user_id, count in ranked if user_id not in pending}
     
-    return friends
+    rows = await User.get_profiles(db, list(mutual_counts))
+    return [
+        FriendSuggestionResponse(**row._mapping, mutual_friends=mutual_counts[row.id])
+        for row in rows[:limit]
+    ]
 
 @router.delete("/{friend_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def remove_friend(
@@ -162,4 +211,5 @@ async def remove_friend(
         )
     
     await Friendship.delete(db, friendship.id)
+    await friend_graph.friendship_changed(current_user.id, friend_id)
     return None
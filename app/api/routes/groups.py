@@ -1,9 +1,12 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import func, select
+from app.core.config import settings
 from app.core.dependencies import get_current_active_user, get_db
+from app.core.membership_cache import membership_cache
+from app.core.pagination import paginate
 from app.models.group import Group, GroupMember, GroupMemberRole
 from app.models.message import Message
 from app.models.user import User
@@ -13,10 +16,17 @@ from app.schemas.group import (
     GroupResponse,
     GroupUpdate,
     GroupMemberResponse,
-    GroupInvite
+    GroupInvite,
+    GroupLastMessage,
+    GroupOverviewResponse,
+    BulkMembers,
+    BulkMembershipResult,
+    BulkMembershipStatus,
+    BulkRoleChange
 )
 from app.schemas.message import MessageCreate, MessageResponse
-from app.websockets import connection_manager
+from app.websockets.fanout import fanout_engine
+from app.websockets.live_stats import live_stats
 
 router = APIRouter()
 
@@ -34,22 +44,15 @@ async def create_group(
             detail="Email verification required"
         )
     
-    # Create the group
-    group = await Group.create(
+    # Create the group with the creator as admin, counters included, in one transaction
+    group = await Group.create_with_admin(
         db,
+        current_user.id,
         name=group_data.name,
         description=group_data.description,
-        avatar_url=group_data.avatar_url,
-        created_by=current_user.id
-    )
-    
-    # Add creator as admin
-    await GroupMember.create(
-        db,
-        group_id=group.id,
-        user_id=current_user.id,
-        role=GroupMemberRole.ADMIN
+        avatar_url=group_data.avatar_url
     )
+    await membership_cache.member_added(group.id, current_user.id, GroupMemberRole.ADMIN)
     
     # Log activity
     await ActivityLog.log_activity(
@@ -70,6 +73,34 @@ async def get_user_groups(
     groups = await Group.get_user_groups(db, current_user.id)
     return groups
 
+@router.get("/overview", response_model=List[GroupOverviewResponse])
+async def get_groups_overview(
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get all of the current user's groups with their latest message and unread count."""
+    rows = await Message.get_group_overview(db, current_user.id, settings.GROUP_UNREAD_COUNT_CAP)
+    
+    return [
+        GroupOverviewResponse(
+            id=row.id,
+            name=row.name,
+            avatar_url=row.avatar_url,
+            member_count=row.member_count,
+            unread_count=row.unread_count,
+            last_message=GroupLastMessage(
+                id=row.last_message_id,
+                sender_id=row.last_message_sender_id,
+                sender_username=row.last_message_sender_username,
+                content=row.last_message_content,
+                has_attachment=row.last_message_has_attachment,
+                file_type=row.last_message_file_type,
+                created_at=row.last_message_created_at
+            ) if row.last_message_id is not None else None
+        )
+        for row in rows
+    ]
+
 @router.get("/{group_id}", response_model=GroupResponse)
 async def get_group(
     group_id: int,
@@ -86,7 +117,7 @@ async def get_group(
         )
     
     # Check if user is a member
-    is_member = await GroupMember.is_member(db, group_id, current_user.id)
+    is_member = await membership_cache.is_member(db, group_id, current_user.id)
     if not is_member:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -112,7 +143,7 @@ async def update_group(
         )
     
     # Check if user is an admin
-    is_admin = await GroupMember.is_admin(db, group_id, current_user.id)
+    is_admin = await membership_cache.is_admin(db, group_id, current_user.id)
     if not is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -136,8 +167,8 @@ async def invite_to_group(
     db: AsyncSession = Depends(get_db)
 ):
     """Invite a user to a group."""
-    # Check if group exists
-    group = await Group.get_by_id(db, group_id)
+    # Check if group exists, locking it so concurrent invites can not add the same user twice
+    group = await Group.lock(db, group_id)
     if not group:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -145,7 +176,7 @@ async def invite_to_group(
         )
     
     # Check if user is a member with invite permissions (admin)
-    is_admin = await GroupMember.is_admin(db, group_id, current_user.id)
+    is_admin = await membership_cache.is_admin(db, group_id, current_user.id)
     if not is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -161,20 +192,22 @@ async def invite_to_group(
         )
     
     # Check if user is already a member
-    is_already_member = await GroupMember.is_member(db, group_id, invite_data.user_id)
+    is_already_member = await membership_cache.is_member(db, group_id, invite_data.user_id)
     if is_already_member:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User is already a member of this group"
         )
     
-    # Add user to group
-    await GroupMember.create(
-        db,
-        group_id=group_id,
-        user_id=invite_data.user_id,
-        role=GroupMemberRole.MEMBER
-    )
+    # Add user to group, unless a concurrent invite already did
+    added = await GroupMember.bulk_add(db, group_id, [invite_data.user_id], GroupMemberRole.MEMBER)
+    if not added:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User is already a member of this group"
+        )
+    await Group.adjust_counts(db, group_id, members=1)
+    await membership_cache.member_added(group_id, invite_data.user_id, GroupMemberRole.MEMBER)
     
     # Log activity
     await ActivityLog.log_activity(
@@ -186,13 +219,208 @@ async def invite_to_group(
     
     return {"detail": f"User {invited_user.username} has been added to the group"}
 
+async def _get_group_as_admin(db: AsyncSession, group_id: int, user_id: int):
+    """Get a group and its membership, checking the user is one of its admins."""
+    # Check if group exists
+    group = await Group.get_by_id(db, group_id)
+    if not group:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Group not found"
+        )
+    
+    # Check if user is an admin
+    members = await membership_cache.get(db, group_id)
+    if members.roles.get(user_id) != GroupMemberRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only group admins can manage members"
+        )
+    
+    return group, members
+
+@router.post("/{group_id}/members/bulk-invite", response_model=List[BulkMembershipResult])
+async def bulk_invite_to_group(
+    group_id: int,
+    invite_data: BulkMembers,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Add many users to a group at once."""
+    group, members = await _get_group_as_admin(db, group_id, current_user.id)
+    user_ids = list(dict.fromkeys(invite_data.user_ids))
+    
+    # One INSERT ... SELECT skips unknown users and existing members; the group lock
+    # stops an overlapping invite from passing the same existence check
+    await Group.lock(db, group_id)
+    added = await GroupMember.bulk_add(db, group_id, user_ids, GroupMemberRole.MEMBER)
+    added_ids = set(added)
+    results = [
+        BulkMembershipResult(
+            user_id=user_id,
+            status=(
+                BulkMembershipStatus.ADDED if user_id in added_ids
+                else BulkMembershipStatus.ALREADY_MEMBER if user_id in members.roles
+                else BulkMembershipStatus.NOT_FOUND
+            )
+        )
+        for user_id in user_ids
+    ]
+    if not added:
+        return results
+    
+    await Group.adjust_counts(db, group_id, members=len(added))
+    
+    # Log activity; this commits the new memberships in the same transaction
+    await ActivityLog.log_activity(
+        db,
+        current_user.id,
+        ActivityType.JOIN_GROUP,
+        description=f"Added {len(added)} users to group {group.name}"
+    )
+    await membership_cache.members_added(group_id, added, GroupMemberRole.MEMBER)
+    
+    # One notification for the whole batch
+    fanout_engine.dispatch(
+        await membership_cache.member_ids(db, group_id),
+        {
+            "type": "group_members_added",
+            "group_id": group_id,
+            "user_ids": added,
+            "added_by": current_user.id
+        }
+    )
+    
+    return results
+
+@router.post("/{group_id}/members/bulk-remove", response_model=List[BulkMembershipResult])
+async def bulk_remove_from_group(
+    group_id: int,
+    remove_data: BulkMembers,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Remove many members from a group at once."""
+    group, members = await _get_group_as_admin(db, group_id, current_user.id)
+    user_ids = list(dict.fromkeys(remove_data.user_ids))
+    
+    # Admins leave through the leave endpoint, which protects the last admin
+    removed_rows = await GroupMember.bulk_deactivate(
+        db,
+        group_id,
+        [user_id for user_id in user_ids if user_id != current_user.id]
+    )
+    removed = [row.user_id for row in removed_rows]
+    removed_ids = set(removed)
+    results = [
+        BulkMembershipResult(
+            user_id=user_id,
+            status=(
+                BulkMembershipStatus.SKIPPED if user_id == current_user.id
+                else BulkMembershipStatus.REMOVED if user_id in removed_ids
+                else BulkMembershipStatus.NOT_MEMBER
+            )
+        )
+        for user_id in user_ids
+    ]
+    if not removed:
+        return results
+    
+    await Group.adjust_counts(
+        db,
+        group_id,
+        members=-len(removed),
+        admins=-sum(1 for row in removed_rows if row.role == GroupMemberRole.ADMIN)
+    )
+    
+    # Log activity; this commits the removals in the same transaction
+    await ActivityLog.log_activity(
+        db,
+        current_user.id,
+        ActivityType.LEAVE_GROUP,
+        description=f"Removed {len(removed)} users from group {group.name}"
+    )
+    await membership_cache.members_removed(group_id, removed)
+    
+    # One notification for the whole batch, including the removed users
+    fanout_engine.dispatch(
+        await membership_cache.member_ids(db, group_id) + removed,
+        {
+            "type": "group_members_removed",
+            "group_id": group_id,
+            "user_ids": removed,
+            "removed_by": current_user.id
+        }
+    )
+    
+    return results
+
+@router.post("/{group_id}/members/bulk-role", response_model=List[BulkMembershipResult])
+async def bulk_change_member_roles(
+    group_id: int,
+    role_data: BulkRoleChange,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Change the role of many members at once."""
+    _, members = await _get_group_as_admin(db, group_id, current_user.id)
+    user_ids = list(dict.fromkeys(role_data.user_ids))
+    
+    # Check if the group would be left without an admin, against the database under the group lock
+    if role_data.role != GroupMemberRole.ADMIN:
+        await Group.lock(db, group_id)
+        admins = set(await GroupMember.get_admin_ids(db, group_id))
+        if not admins - set(user_ids):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="A group must keep at least one admin"
+            )
+    
+    changed = await GroupMember.bulk_set_role(db, group_id, user_ids, role_data.role)
+    changed_ids = set(changed)
+    results = [
+        BulkMembershipResult(
+            user_id=user_id,
+            status=(
+                BulkMembershipStatus.UPDATED if user_id in changed_ids
+                else BulkMembershipStatus.UNCHANGED if user_id in members.roles
+                else BulkMembershipStatus.NOT_MEMBER
+            )
+        )
+        for user_id in user_ids
+    ]
+    if not changed:
+        return results
+    
+    admins_delta = len(changed) if role_data.role == GroupMemberRole.ADMIN else -len(changed)
+    await Group.adjust_counts(db, group_id, admins=admins_delta)
+    await db.commit()
+    await membership_cache.roles_changed(group_id, changed, role_data.role)
+    
+    # One notification for the whole batch
+    fanout_engine.dispatch(
+        await membership_cache.member_ids(db, group_id),
+        {
+            "type": "group_roles_changed",
+            "group_id": group_id,
+            "user_ids": changed,
+            "role": role_data.role.value,
+            "changed_by": current_user.id
+        }
+    )
+    
+    return results
+
 @router.get("/{group_id}/members", response_model=List[GroupMemberResponse])
 async def get_group_members(
     group_id: int,
+    response: Response,
+    cursor: Optional[int] = None,
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get all members of a group."""
+    """Get members of a group, one page at a time."""
     # Check if group exists
     group = await Group.get_by_id(db, group_id)
     if not group:
@@ -202,7 +430,7 @@ async def get_group_members(
         )
     
     # Check if user is a member
-    is_member = await GroupMember.is_member(db, group_id, current_user.id)
+    is_member = await membership_cache.is_member(db, group_id, current_user.id)
     if not is_member:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -210,26 +438,10 @@ async def get_group_members(
         )
     
     # Get members
-    members = await GroupMember.get_group_members(db, group_id)
-    
-    # Enrich with user information
-    result = []
-    for member in members:
-        user = await User.get_by_id(db, member.user_id)
-        if user:
-            result.append(
-                GroupMemberResponse(
-                    id=member.id,
-                    user_id=user.id,
-                    username=user.username,
-                    full_name=user.full_name,
-                    avatar_url=user.avatar_url,
-                    role=member.role,
-                    joined_at=member.joined_at
-                )
-            )
+    rows = await GroupMember.get_group_members_page(db, group_id, after_id=cursor, limit=limit + 1)
+    rows = paginate(response, rows, limit, lambda row: row.id)
     
-    return result
+    return [GroupMemberResponse(**row._mapping) for row in rows]
 
 @router.delete("/{group_id}/leave")
 async def leave_group(
@@ -238,8 +450,8 @@ async def leave_group(
     db: AsyncSession = Depends(get_db)
 ):
     """Leave a group."""
-    # Check if group exists
-    group = await Group.get_by_id(db, group_id)
+    # Check if group exists, locking it so the admin check below can not race
+    group = await Group.lock(db, group_id)
     if not group:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -263,38 +475,23 @@ async def leave_group(
         )
     
     # Check if user is the only admin
-    if membership.role == GroupMemberRole.ADMIN:
-        admin_count = await db.execute(
-            select(func.count()).where(
-                (GroupMember.group_id == group_id) & 
-                (GroupMember.role == GroupMemberRole.ADMIN) &
-                (GroupMember.is_active == True)
-            )
-        )
-        admin_count = admin_count.scalar()
-        
-        if admin_count == 1:
-            # Check if there are other members
-            member_count = await db.execute(
-                select(func.count()).where(
-                    (GroupMember.group_id == group_id) & 
-                    (GroupMember.is_active == True)
-                )
+    is_admin = membership.role == GroupMemberRole.ADMIN
+    if is_admin and group.admin_count == 1:
+        # Check if there are other members
+        if group.member_count > 1:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="You are the only admin. Promote another member to admin before leaving."
             )
-            member_count = member_count.scalar()
-            
-            if member_count > 1:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="You are the only admin. Promote another member to admin before leaving."
-                )
     
     # Soft delete membership (set is_active to False)
+    await Group.adjust_counts(db, group_id, members=-1, admins=-1 if is_admin else 0)
     await GroupMember.update(
         db,
         membership.id,
         is_active=False
     )
+    await membership_cache.member_removed(group_id, current_user.id)
     
     # Log activity
     await ActivityLog.log_activity(
@@ -323,7 +520,7 @@ async def promote_to_admin(
         )
     
     # Check if current user is an admin
-    is_admin = await GroupMember.is_admin(db, group_id, current_user.id)
+    is_admin = await membership_cache.is_admin(db, group_id, current_user.id)
     if not is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -354,11 +551,13 @@ async def promote_to_admin(
         )
     
     # Promote to admin
+    await Group.adjust_counts(db, group_id, admins=1)
     await GroupMember.update(
         db,
         target_membership.id,
         role=GroupMemberRole.ADMIN
     )
+    await membership_cache.role_changed(group_id, user_id, GroupMemberRole.ADMIN)
     
     return {"detail": "User has been promoted to admin"}
 
@@ -379,7 +578,7 @@ async def send_group_message(
         )
     
     # Check if user is a member
-    is_member = await GroupMember.is_member(db, group_id, current_user.id)
+    is_member = await membership_cache.is_member(db, group_id, current_user.id)
     if not is_member:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -395,24 +594,24 @@ async def send_group_message(
         # For group messages, receiver_id is null
         receiver_id=None
     )
+    live_stats.message_sent(group=True)
     
     # Notify group members via WebSocket
-    members = await GroupMember.get_group_members(db, group_id)
-    for member in members:
-        if member.user_id != current_user.id and connection_manager.is_user_connected(member.user_id):
-            await connection_manager.send_message_notification(
-                member.user_id,
-                {
-                    "type": "new_group_message",
-                    "message": {
-                        "id": new_message.id,
-                        "sender_id": current_user.id,
-                        "group_id": group_id,
-                        "content": message.content,
-                        "created_at": new_message.created_at.isoformat()
-                    }
-                }
-            )
+    member_ids = await membership_cache.member_ids(db, group_id)
+    fanout_engine.dispatch(
+        member_ids,
+        {
+            "type": "new_group_message",
+            "message": {
+                "id": new_message.id,
+                "sender_id": current_user.id,
+                "group_id": group_id,
+                "content": message.content,
+                "created_at": new_message.created_at.isoformat()
+            }
+        },
+        exclude_user_id=current_user.id
+    )
     
     # Log activity
     await ActivityLog.log_activity(
@@ -442,7 +641,7 @@ async def get_group_messages(
         )
     
     # Check if user is a member
-    is_member = await GroupMember.is_member(db, group_id, current_user.id)
+    is_member = await membership_cache.is_member(db, group_id, current_user.id)
     if not is_member:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -460,9 +659,33 @@ async def get_group_messages(
     result = await db.execute(query)
     messages = result.scalars().all()
     
-    # Mark messages as read for this user
-    for message in messages:
-        if message.sender_id != current_user.id:
-            await Message.mark_as_read(db, message.id, current_user.id)
+    # Record the page as read in one update each for the receipts and the read marker, committed together
+    if messages:
+        await Message.mark_group_messages_read(db, messages, current_user.id)
+        await GroupMember.mark_read(db, group_id, current_user.id, max(message.id for message in messages))
     
     return messages
+
+@router.post("/{group_id}/read", status_code=status.HTTP_204_NO_CONTENT)
+async def mark_group_read(
+    group_id: int,
+    message_id: Optional[int] = None,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Mark a group as read up to a message, or up to its latest message."""
+    # Check if user is a member
+    is_member = await membership_cache.is_member(db, group_id, current_user.id)
+    if not is_member:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You are not a member of this group"
+        )
+    
+    if message_id is None:
+        result = await db.execute(select(func.max(Message.id)).where(Message.group_id == group_id))
+        message_id = result.scalar()
+    
+    if message_id is not None:
+        await GroupMember.mark_read(db, group_id, current_user.id, message_id)
+    return None
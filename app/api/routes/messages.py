@@ -1,31 +1,41 @@
 from typing import List
 from datetime import datetime
-import os
-import shutil
 from pathlib import Path
 
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi.responses import RedirectResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 from fastapi import Request
 
-from app.core.dependencies import get_current_active_user, get_db
+from app.core.dependencies import get_current_active_user, get_db, get_read_db
+from app.core.friend_graph import friend_graph
+from app.core.membership_cache import membership_cache
 from app.core.config import settings
-from app.models.friendship import Friendship, FriendshipStatus
-from app.models.group import GroupMember
+from app.core.rate_limit import limiter
+from app.core.storage import (
+    content_disposition,
+    get_storage_backend,
+    parse_location,
+    storage_key as build_storage_key,
+    verify_download_signature,
+)
 from app.models.message import Message
 from app.models.file_attachment import FileAttachment
 from app.models.user import User
 from app.models.activity_log import ActivityLog, ActivityType
 from app.schemas.message import MessageCreate, MessageResponse, MessageUpdate
 from app.websockets.connection_manager import connection_manager
+from app.websockets.fanout import fanout_engine
+from app.websockets.live_stats import live_stats
 
 router = APIRouter()
-limiter = Limiter(key_func=get_remote_address)
 
-@router.post("/", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
-@limiter.limit(settings.MESSAGE_RATE_LIMIT)
+@router.post(
+    "/",
+    response_model=MessageResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(limiter.limit(settings.MESSAGE_RATE_LIMIT, "send_message"))]
+)
 async def send_message(
     request: Request,
     message: MessageCreate,
@@ -49,8 +59,8 @@ async def send_message(
         )
     
     # Check if users are friends
-    friendship = await Friendship.get_friendship(db, current_user.id, message.receiver_id)
-    if not friendship or friendship.status != FriendshipStatus.ACCEPTED:
+    are_friends = await friend_graph.are_friends(db, current_user.id, message.receiver_id)
+    if not are_friends:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You can only send messages to friends"
@@ -65,6 +75,7 @@ async def send_message(
         reply_to_id=message.reply_to_id,
         forwarded_from_id=message.forwarded_from_id
     )
+    live_stats.message_sent()
     
     # Notify receiver if online
     if connection_manager.is_user_connected(message.receiver_id):
@@ -118,8 +129,8 @@ async def upload_file(
         )
     
     # Check if users are friends
-    friendship = await Friendship.get_friendship(db, current_user.id, receiver_id)
-    if not friendship or friendship.status != FriendshipStatus.ACCEPTED:
+    are_friends = await friend_graph.are_friends(db, current_user.id, receiver_id)
+    if not are_friends:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You can only send files to friends"
@@ -147,34 +158,42 @@ async def upload_file(
             detail=f"Unsupported file type: {content_type}"
         )
     
-    # Create upload directory if it doesn't exist
-    upload_dir = Path(settings.UPLOAD_DIR) / str(current_user.id)
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Generate unique filename
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    file_extension = os.path.splitext(file.filename)[1]
-    unique_filename = f"{timestamp}_{file.filename}"
-    file_path = upload_dir / unique_filename
+    # Reserve quota before any bytes are stored
+    reserved = await User.reserve_storage(db, current_user.id, file_size, settings.STORAGE_QUOTA_BYTES)
+    if not reserved:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Storage quota exceeded"
+        )
     
-    # Save file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    storage = get_storage_backend()
+    # The original name is kept on the row; the key itself is always URL-safe
+    storage_key = build_storage_key(current_user.id, file.filename)
     
-    # Generate file URL
-    file_url = f"/uploads/{current_user.id}/{unique_filename}"
+    # Generate file URL (resolved to a signed download URL on request)
+    file_path = storage.location(storage_key)
+    file_url = f"/api/messages/files/{storage.name}/{storage_key}"
     
-    # Create file attachment record
+    # Create file attachment record before storing the file, so a failure
+    # past this point leaves a row the attachment collector can clean up
     attachment = await FileAttachment.create(
         db,
         user_id=current_user.id,
         file_name=file.filename,
-        file_path=str(file_path),
+        file_path=file_path,
         file_url=file_url,
         file_type=content_type,
         file_size=file_size
     )
     
+    # Store the file in the configured backend
+    try:
+        await storage.save(storage_key, file.file, content_type)
+    except Exception:
+        await FileAttachment.delete(db, attachment.id)
+        await User.release_storage(db, current_user.id, file_size)
+        raise
+    
     # Create message with file attachment
     new_message = await Message.create(
         db,
@@ -188,6 +207,7 @@ async def upload_file(
         file_size=file_size,
         reply_to_id=reply_to_id
     )
+    live_stats.message_sent()
     
     # Update file attachment with message ID
     await FileAttachment.update(
@@ -227,6 +247,74 @@ async def upload_file(
     
     return new_message
 
+@router.get("/files/download/{key:path}")
+async def download_local_file(
+    key: str,
+    expires: int,
+    signature: str,
+    name: str = ""
+):
+    """Serve a file from local storage using a signed, time-limited URL."""
+    if not verify_download_signature(key, expires, name, signature):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid or expired download link"
+        )
+    
+    storage = get_storage_backend("local")
+    try:
+        stream = storage.open(key)
+        first_chunk = await stream.__anext__()
+    except (FileNotFoundError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+    except StopAsyncIteration:
+        first_chunk = b""
+    
+    async def body():
+        yield first_chunk
+        async for chunk in stream:
+            yield chunk
+    
+    return StreamingResponse(
+        body(),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": content_disposition(name or Path(key).name)}
+    )
+
+@router.get("/files/{backend}/{key:path}")
+async def get_file(
+    backend: str,
+    key: str,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Redirect to a signed download URL for an attachment."""
+    file_url = f"/api/messages/files/{backend}/{key}"
+    attachment = await FileAttachment.get_by_file_url(db, file_url)
+    if not attachment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+    
+    # Check if user has access to a message carrying this file
+    if attachment.user_id != current_user.id:
+        has_access = await Message.has_file_access(db, current_user.id, file_url)
+        if not has_access:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You don't have access to this file"
+            )
+    
+    storage, storage_key = parse_location(attachment.file_path)
+    return RedirectResponse(
+        storage.signed_url(storage_key, attachment.file_name),
+        status_code=status.HTTP_307_TEMPORARY_REDIRECT
+    )
+
 @router.get("/conversation/{user_id}", response_model=List[MessageResponse])
 async def get_conversation(
     user_id: int,
@@ -236,11 +324,12 @@ async def get_conversation(
     date_to: datetime = None,
     has_attachment: bool = None,
     current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    read_db: AsyncSession = Depends(get_read_db)
 ):
     """Get conversation with another user with filters."""
     # Check if user exists
-    other_user = await User.get_by_id(db, user_id)
+    other_user = await User.get_by_id(read_db, user_id)
     if not other_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -248,8 +337,8 @@ async def get_conversation(
         )
     
     # Check if users are friends
-    friendship = await Friendship.get_friendship(db, current_user.id, user_id)
-    if not friendship or friendship.status != FriendshipStatus.ACCEPTED:
+    are_friends = await friend_graph.are_friends(db, current_user.id, user_id)
+    if not are_friends:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You can only view conversations with friends"
@@ -257,7 +346,7 @@ async def get_conversation(
     
     # Get messages with filters
     messages = await Message.get_conversation(
-        db,
+        read_db,
         current_user.id,
         user_id,
         skip=skip,
@@ -267,12 +356,17 @@ async def get_conversation(
         has_attachment=has_attachment
     )
     
-    # Mark unread messages as read
-    for message in messages:
-        if message.receiver_id == current_user.id and not message.is_read:
-            await Message.mark_as_read(db, message.id, current_user.id)
-    
-    return messages
+    # Mark unread messages as read in one statement, on the primary
+    unread_ids = [
+        message.id for message in messages
+        if message.receiver_id == current_user.id and not message.is_read
+    ]
+    read = {
+        message.id: message
+        for message in await Message.bulk_update(db, unread_ids, is_read=True, read_at=datetime.utcnow())
+    }
+    
+    return [read.get(message.id, message) for message in messages]
 
 @router.get("/search", response_model=List[MessageResponse])
 async def search_messages(
@@ -280,7 +374,7 @@ async def search_messages(
     skip: int = 0,
     limit: int = 50,
     current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Search for messages containing a specific term."""
     if len(q) < 3:
@@ -347,21 +441,20 @@ async def update_message(
     # For group messages
     elif message.group_id:
         # Notify all group members
-        members = await GroupMember.get_group_members(db, message.group_id)
-        for member in members:
-            if member.user_id != current_user.id and connection_manager.is_user_connected(member.user_id):
-                await connection_manager.send_message_notification(
-                    member.user_id,
-                    {
-                        "type": "message_updated",
-                        "message": {
-                            "id": message.id,
-                            "content": message_update.content,
-                            "is_edited": True,
-                            "group_id": message.group_id
-                        }
-                    }
-                )
+        member_ids = await membership_cache.member_ids(db, message.group_id)
+        fanout_engine.dispatch(
+            member_ids,
+            {
+                "type": "message_updated",
+                "message": {
+                    "id": message.id,
+                    "content": message_update.content,
+                    "is_edited": True,
+                    "group_id": message.group_id
+                }
+            },
+            exclude_user_id=current_user.id
+        )
     
     # Log activity
     await ActivityLog.log_activity(
@@ -415,17 +508,16 @@ async def delete_message(
     # For group messages
     elif message.group_id:
         # Notify all group members
-        members = await GroupMember.get_group_members(db, message.group_id)
-        for member in members:
-            if member.user_id != current_user.id and connection_manager.is_user_connected(member.user_id):
-                await connection_manager.send_message_notification(
-                    member.user_id,
-                    {
-                        "type": "message_deleted",
-                        "message_id": message.id,
-                        "group_id": message.group_id
-                    }
-                )
+        member_ids = await membership_cache.member_ids(db, message.group_id)
+        fanout_engine.dispatch(
+            member_ids,
+            {
+                "type": "message_deleted",
+                "message_id": message.id,
+                "group_id": message.group_id
+            },
+            exclude_user_id=current_user.id
+        )
     
     # Log activity
     await ActivityLog.log_activity(
@@ -459,7 +551,7 @@ async def forward_message(
         pass
     elif original_message.group_id:
         # Check if user is in the group
-        is_member = await GroupMember.is_member(db, original_message.group_id, current_user.id)
+        is_member = await membership_cache.is_member(db, original_message.group_id, current_user.id)
         if not is_member:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -480,8 +572,8 @@ async def forward_message(
         )
     
     # Check if users are friends
-    friendship = await Friendship.get_friendship(db, current_user.id, forward_data.receiver_id)
-    if not friendship or friendship.status != FriendshipStatus.ACCEPTED:
+    are_friends = await friend_graph.are_friends(db, current_user.id, forward_data.receiver_id)
+    if not are_friends:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You can only forward messages to friends"
@@ -500,6 +592,7 @@ async def forward_message(
         file_name=original_message.file_name,
         file_size=original_message.file_size
     )
+    live_stats.message_sent()
     
     # Notify receiver if online
     if connection_manager.is_user_connected(forward_data.receiver_id):
@@ -4,10 +4,19 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.auth_cache import invalidate_principal
+from app.core.config import settings
 from app.core.dependencies import get_current_active_user, get_db
 from app.core.security import hash_password, verify_password
 from app.models.user import User
-from app.schemas.user import UserResponse, UserUpdate
+from app.schemas.user import (
+    PresenceQuery,
+    PresenceResponse,
+    StorageUsageResponse,
+    UserResponse,
+    UserUpdate
+)
+from app.websockets.presence import presence
 
 router = APIRouter()
 
@@ -30,8 +39,40 @@ async def update_user_info(
         current_user.id,
         **user_update.dict(exclude_unset=True)
     )
+    await invalidate_principal(current_user.id)
     return updated_user
 
+@router.get("/me/storage", response_model=StorageUsageResponse)
+async def get_storage_usage(
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the current user's attachment storage usage."""
+    # Read the counter directly; the cached principal may lag behind uploads
+    return StorageUsageResponse(
+        used_bytes=await User.get_storage_used(db, current_user.id),
+        quota_bytes=settings.STORAGE_QUOTA_BYTES
+    )
+
+@router.post("/presence", response_model=List[PresenceResponse])
+async def get_presence(
+    query: PresenceQuery,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get online status and last seen time for many users at once."""
+    rows = await User.get_presence_settings(db, list(set(query.user_ids)))
+    
+    # Apply privacy settings
+    return [
+        PresenceResponse(
+            user_id=row.id,
+            online_status=presence.is_online(row.id) if row.show_online_status else None,
+            last_seen=row.last_seen_at if row.show_last_seen else None
+        )
+        for row in rows
+    ]
+
 @router.get("/{username}", response_model=UserResponse)
 async def get_user_by_username(
     username: str,
@@ -50,7 +91,7 @@ async def get_user_by_username(
     response = UserResponse.from_orm(user)
     
     if user.show_online_status:
-        response.online_status = True  # Simplified, in real app check WebSocket connections
+        response.online_status = presence.is_online(user.id)
     
     if user.show_last_seen:
         response.last_seen = user.last_seen_at
@@ -0,0 +1,203 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.session import async_session
+from app.models.activity_log import (
+    ActivityDailyStats,
+    ActivityLog,
+    ActivityLogArchive,
+    ActivityRollupState,
+    ActivityUserDailyStats,
+)
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_STATE = "activity_logs"
+
+
+async def roll_up_activity_batch(db: AsyncSession, batch_size: int) -> int:
+    """Fold the next batch of activity rows into the daily rollups.
+
+    The watermark row is locked for the whole transaction, so workers take
+    turns and each row is counted exactly once. Rows younger than
+    ``ACTIVITY_ROLLUP_SETTLE_SECONDS`` are left for a later run: ids are
+    handed out before commit, so a lower id may still be in flight. Returns
+    the number of rows folded.
+    """
+    result = await db.execute(
+        select(ActivityRollupState.last_id)
+        .where(ActivityRollupState.name == ROLLUP_STATE)
+        .with_for_update()
+    )
+    last_id = result.scalar_one()
+
+    settled_before = datetime.utcnow() - timedelta(seconds=settings.ACTIVITY_ROLLUP_SETTLE_SECONDS)
+    result = await db.execute(
+        select(ActivityLog.id, ActivityLog.created_at)
+        .where(ActivityLog.id > last_id)
+        .order_by(ActivityLog.id)
+        .limit(batch_size)
+    )
+    # Stop at the first unsettled row so the watermark never skips one
+    upto_id = last_id
+    folded = 0
+    for row_id, created_at in result:
+        if created_at >= settled_before:
+            break
+        upto_id = row_id
+        folded += 1
+    if not folded:
+        await db.rollback()
+        return 0
+
+    day = func.date(ActivityLog.created_at).label("day")
+    in_batch = (ActivityLog.id > last_id) & (ActivityLog.id <= upto_id)
+
+    per_user = insert(ActivityUserDailyStats).from_select(
+        ["day", "activity_type", "user_id", "count"],
+        select(day, ActivityLog.activity_type, ActivityLog.user_id, func.count())
+        .where(in_batch)
+        .group_by(day, ActivityLog.activity_type, ActivityLog.user_id)
+    )
+    await db.execute(per_user.on_conflict_do_update(
+        index_elements=["day", "activity_type", "user_id"],
+        set_={"count": ActivityUserDailyStats.count + per_user.excluded.count}
+    ))
+
+    per_day = insert(ActivityDailyStats).from_select(
+        ["day", "activity_type", "count"],
+        select(day, ActivityLog.activity_type, func.count())
+        .where(in_batch)
+        .group_by(day, ActivityLog.activity_type)
+    )
+    await db.execute(per_day.on_conflict_do_update(
+        index_elements=["day", "activity_type"],
+        set_={"count": ActivityDailyStats.count + per_day.excluded.count}
+    ))
+
+    await db.execute(
+        update(ActivityRollupState)
+        .where(ActivityRollupState.name == ROLLUP_STATE)
+        .values(last_id=upto_id, updated_at=datetime.utcnow())
+    )
+    await db.commit()
+    return folded
+
+
+async def prune_activity_batch(db: AsyncSession, cutoff: datetime, batch_size: int, archive: bool) -> int:
+    """Delete, or move to the archive, one batch of rolled-up rows older than cutoff.
+
+    Only rows at or below the rollup watermark are touched, so nothing is
+    pruned before it has been counted. Returns the number of rows removed.
+    """
+    watermark = (
+        select(ActivityRollupState.last_id)
+        .where(ActivityRollupState.name == ROLLUP_STATE)
+        .scalar_subquery()
+    )
+    batch = (
+        select(ActivityLog.id)
+        .where(ActivityLog.created_at < cutoff, ActivityLog.id <= watermark)
+        .order_by(ActivityLog.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    removed = delete(ActivityLog).where(ActivityLog.id.in_(batch))
+
+    if archive:
+        columns = list(ActivityLog.__table__.columns)
+        moved = removed.returning(*columns).cte("moved")
+        result = await db.execute(
+            insert(ActivityLogArchive)
+            .from_select([column.key for column in columns], select(*moved.c))
+            .returning(ActivityLogArchive.id)
+        )
+    else:
+        result = await db.execute(removed.returning(ActivityLog.id))
+    count = len(result.all())
+    await db.commit()
+    return count
+
+
+class ActivityMaintenance:
+    """Periodically roll up activity logs and prune the raw rows past retention."""
+
+    def __init__(self):
+        self._task = None
+        self._lock = asyncio.Lock()
+        self._metrics = {
+            "runs": 0,
+            "rolled_up": 0,
+            "pruned": 0,
+            "last_run_at": None,
+            "last_duration_seconds": 0.0,
+        }
+
+    async def run(self) -> Dict[str, int]:
+        """Roll up everything settled, then prune; returns the row counts of this run."""
+        async with self._lock:
+            started_at = time.perf_counter()
+            rolled_up = pruned = 0
+            async with async_session() as db:
+                while True:
+                    folded = await roll_up_activity_batch(db, settings.ACTIVITY_ROLLUP_BATCH_SIZE)
+                    rolled_up += folded
+                    if not folded:
+                        break
+
+                if settings.ACTIVITY_LOG_RETENTION_DAYS:
+                    cutoff = datetime.utcnow() - timedelta(days=settings.ACTIVITY_LOG_RETENTION_DAYS)
+                    while True:
+                        removed = await prune_activity_batch(
+                            db, cutoff, settings.ACTIVITY_RETENTION_BATCH_SIZE, settings.ACTIVITY_LOG_ARCHIVE
+                        )
+                        pruned += removed
+                        if removed < settings.ACTIVITY_RETENTION_BATCH_SIZE:
+                            break
+
+            self._metrics["runs"] += 1
+            self._metrics["rolled_up"] += rolled_up
+            self._metrics["pruned"] += pruned
+            self._metrics["last_run_at"] = datetime.utcnow().isoformat()
+            self._metrics["last_duration_seconds"] = time.perf_counter() - started_at
+            return {"rolled_up": rolled_up, "pruned": pruned}
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._metrics,
+            "retention_days": settings.ACTIVITY_LOG_RETENTION_DAYS,
+            "archive": settings.ACTIVITY_LOG_ARCHIVE,
+        }
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.ACTIVITY_MAINTENANCE_INTERVAL_SECONDS)
+            try:
+                await self.run()
+            except Exception as e:
+                logger.error("Activity log maintenance failed: %s", e)
+
+
+activity_maintenance = ActivityMaintenance()
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Tuple
+
+from sqlalchemy import case, delete, exists, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.storage import parse_location
+from app.db.session import async_session
+from app.models.file_attachment import FileAttachment
+from app.models.message import Message
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+
+async def collect_attachment_batch(
+    db: AsyncSession,
+    batch_size: int,
+    grace_seconds: int,
+    after_id: int = 0
+) -> Tuple[int, int, int]:
+    """Delete one batch of unreferenced attachments and their stored files.
+
+    An attachment is unreferenced when no live message carries its file URL.
+    That covers uploads whose message was never created (``message_id`` is
+    NULL) as well as files whose messages were all soft-deleted. Attachments
+    younger than the grace period are skipped so in-flight uploads survive.
+    Only attachments with ids above ``after_id`` are considered.
+
+    Returns (rows scanned, rows collected, last id scanned). A row whose
+    file could not be deleted is kept, with its quota, for the next run.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+    referenced = exists().where(
+        (Message.file_url == FileAttachment.file_url) &
+        (Message.is_deleted == False)
+    )
+    result = await db.execute(
+        select(
+            FileAttachment.id,
+            FileAttachment.user_id,
+            FileAttachment.file_path,
+            FileAttachment.file_size
+        )
+        .where((FileAttachment.created_at < cutoff) & (FileAttachment.id > after_id) & ~referenced)
+        .order_by(FileAttachment.id)
+        .limit(batch_size)
+    )
+    rows = result.all()
+    if not rows:
+        return 0, 0, after_id
+
+    # Remove the stored objects first; a row without a file is harmless
+    # and will be picked up again, a file without a row is leaked forever
+    deleted = []
+    for row in rows:
+        try:
+            storage, key = parse_location(row.file_path)
+            await storage.delete(key)
+        except Exception as e:
+            logger.warning("Could not delete attachment %s (%s): %s", row.id, row.file_path, e)
+        else:
+            deleted.append(row)
+
+    if not deleted:
+        return len(rows), 0, rows[-1].id
+
+    freed = {}
+    for row in deleted:
+        freed[row.user_id] = freed.get(row.user_id, 0) + row.file_size
+
+    await db.execute(delete(FileAttachment).where(FileAttachment.id.in_([row.id for row in deleted])))
+    await db.execute(
+        update(User)
+        .where(User.id.in_(list(freed)))
+        .values(storage_used_bytes=User.storage_used_bytes - case(freed, value=User.id, else_=0))
+    )
+    await db.commit()
+
+    return len(rows), len(deleted), rows[-1].id
+
+
+async def collect_orphaned_attachments(
+    batch_size: int = None,
+    grace_seconds: int = None
+) -> int:
+    """Run the collector until no unreferenced attachments remain."""
+    batch_size = batch_size or settings.ATTACHMENT_GC_BATCH_SIZE
+    grace_seconds = settings.ATTACHMENT_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+
+    total = 0
+    after_id = 0
+    async with async_session() as db:
+        # Walk forward by id so rows whose delete failed do not block the rest
+        while True:
+            scanned, collected, after_id = await collect_attachment_batch(db, batch_size, grace_seconds, after_id)
+            total += collected
+            if scanned < batch_size:
+                break
+
+    if total:
+        logger.info("Collected %d orphaned attachments", total)
+    return total
+
+
+class AttachmentCollector:
+    """Periodically remove orphaned attachments in the background."""
+
+    def __init__(self):
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await collect_orphaned_attachments()
+            except Exception as e:
+                logger.error("Attachment collection failed: %s", e)
+            await asyncio.sleep(settings.ATTACHMENT_GC_INTERVAL_SECONDS)
+
+
+attachment_collector = AttachmentCollector()
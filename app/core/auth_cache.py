@@ -0,0 +1,38 @@
+import time
+from typing import Any, Dict
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.events import event_bus
+from app.core.security import verify_token
+
+# Verified principals keyed by user id. The TTL bounds how long a change made
+# on another worker can go unnoticed if its invalidation event is lost, e.g.
+# a deactivated user is rejected everywhere within PRINCIPAL_CACHE_TTL_SECONDS.
+principal_cache = TTLCache(settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL_SECONDS)
+
+# Decoded access token payloads keyed by the raw token, kept until they expire
+token_cache = TTLCache(settings.TOKEN_CACHE_SIZE, settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """Verify a JWT token, reusing the payload of tokens seen before."""
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = verify_token(token)
+        expires_in = payload.get("exp", 0) - time.time()
+        token_cache.set(token, payload, ttl=expires_in)
+    return payload
+
+
+async def invalidate_principal(user_id: int) -> None:
+    """Drop a user's cached principal on every worker."""
+    await event_bus.publish("principal_invalidated", {"user_id": user_id})
+
+
+def _on_principal_invalidated(data: Dict[str, Any]) -> None:
+    principal_cache.pop(data["user_id"])
+
+
+event_bus.subscribe("principal_invalidated", _on_principal_invalidated)
+event_bus.subscribe("reconnected", lambda data: principal_cache.clear())
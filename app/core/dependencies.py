@@ -5,9 +5,10 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.auth_cache import decode_token, principal_cache
 from app.core.config import settings
-from app.core.security import verify_token
-from app.db.session import async_session
+from app.core.token_revocation import revocation_store
+from app.db.session import async_session, replica_router
 from app.models.user import User
 from app.schemas.token import TokenPayload
 
@@ -19,6 +20,9 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             yield session
         finally:
             await session.close()
+            # Keep this user's reads on the primary until replicas catch up
+            if session.info.get("wrote") and session.info.get("user_id") is not None:
+                await replica_router.note_write(session.info["user_id"])
 
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
@@ -31,20 +35,36 @@ async def get_current_user(
     )
     
     try:
-        payload = verify_token(token)
+        payload = decode_token(token)
         user_id: str = payload.get("sub")
-        if user_id is None:
+        if user_id is None or revocation_store.is_revoked(payload):
             raise credentials_exception
         token_data = TokenPayload(user_id=user_id)
     except JWTError:
         raise credentials_exception
     
-    user = await User.get_by_id(db, token_data.user_id)
+    user = principal_cache.get(token_data.user_id)
     if user is None:
-        raise credentials_exception
+        user = await User.get_by_id(db, token_data.user_id)
+        if user is None:
+            raise credentials_exception
+        # Detach so the cached object is never tied to another request's session
+        db.expunge(user)
+        principal_cache.set(token_data.user_id, user)
     
+    db.info["user_id"] = user.id
     return user
 
+async def get_read_db(
+    current_user: Annotated[User, Depends(get_current_user)]
+) -> AsyncGenerator[AsyncSession, None]:
+    """Session for read-only endpoints, on a replica unless the user wrote recently."""
+    async with replica_router.session_for(current_user.id)() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
 async def get_current_active_user(
     current_user: Annotated[User, Depends(get_current_user)]
 ) -> User:
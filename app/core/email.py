@@ -1,18 +1,239 @@
+import asyncio
+import logging
 import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
+@dataclass
+class OutgoingEmail:
+    recipients: List[str]
+    message: str
+    attempts: int = 0
+
+class SMTPConnection:
+    """A persistent SMTP session that reconnects when the server drops it."""
+    
+    def __init__(self):
+        self._server: Optional[smtplib.SMTP] = None
+    
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT, timeout=settings.SMTP_TIMEOUT_SECONDS)
+        if settings.SMTP_USE_TLS:
+            server.starttls()
+        
+        if settings.SMTP_USERNAME and settings.SMTP_PASSWORD:
+            server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
+        return server
+    
+    def _ensure(self) -> smtplib.SMTP:
+        if self._server is not None:
+            try:
+                self._server.noop()
+            except (smtplib.SMTPException, OSError):
+                self.close()
+        if self._server is None:
+            self._server = self._connect()
+        return self._server
+    
+    def send_batch(self, sender: str, emails: List[OutgoingEmail]) -> List[OutgoingEmail]:
+        """Send a batch over one session. Returns the emails that failed."""
+        try:
+            server = self._ensure()
+        except Exception as e:
+            logger.warning("Could not connect to SMTP server: %s", e)
+            return emails
+        
+        failed = []
+        for index, email in enumerate(emails):
+            try:
+                server.sendmail(sender, email.recipients, email.message)
+            except smtplib.SMTPRecipientsRefused as e:
+                # Permanent for these recipients, retrying will not help
+                logger.error("Email to %s refused: %s", email.recipients, e)
+            except Exception as e:
+                logger.warning("Error sending email to %s: %s", email.recipients, e)
+                failed.append(email)
+                if isinstance(e, (smtplib.SMTPServerDisconnected, OSError)):
+                    self.close()
+                    try:
+                        server = self._ensure()
+                    except Exception:
+                        failed.extend(emails[index + 1:])
+                        break
+        return failed
+    
+    def close(self) -> None:
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+class MailQueue:
+    """Deliver emails in the background over pooled SMTP sessions.
+    
+    Each worker owns one persistent SMTP connection and drains the queue in
+    batches, so a burst of emails shares a single handshake. Failed sends are
+    retried with exponential backoff. The blocking smtplib calls run on a
+    thread pool, keeping the event loop free.
+    """
+    
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._connections: List[SMTPConnection] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Emails waiting out their retry backoff, keyed by id(email)
+        self._retries: Dict[int, Tuple[asyncio.TimerHandle, OutgoingEmail]] = {}
+        self._metrics = {
+            "queued": 0,
+            "sent": 0,
+            "failed": 0,
+            "retried": 0,
+            "dropped": 0,
+            "batches": 0,
+            "send_seconds_total": 0.0,
+        }
+    
+    def start(self) -> None:
+        if self._workers:
+            return
+        
+        self._queue = asyncio.Queue(maxsize=settings.EMAIL_QUEUE_MAX_SIZE)
+        self._executor = ThreadPoolExecutor(max_workers=settings.EMAIL_WORKERS, thread_name_prefix="smtp")
+        for _ in range(settings.EMAIL_WORKERS):
+            connection = SMTPConnection()
+            self._connections.append(connection)
+            self._workers.append(asyncio.create_task(self._worker(connection)))
+    
+    async def stop(self) -> None:
+        if not self._workers:
+            return
+        
+        # Give queued and retrying emails a chance to go out before shutting down
+        try:
+            await asyncio.wait_for(self._drain(), timeout=settings.EMAIL_SHUTDOWN_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Shutting down with %d emails still queued and %d waiting to retry",
+                self._queue.qsize(),
+                len(self._retries)
+            )
+        for handle, email in self._retries.values():
+            handle.cancel()
+            self._metrics["dropped"] += 1
+            logger.error("Dropping retry to %s at shutdown", email.recipients)
+        self._retries.clear()
+        
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        
+        loop = asyncio.get_running_loop()
+        for connection in self._connections:
+            await loop.run_in_executor(self._executor, connection.close)
+        self._executor.shutdown(wait=False)
+        self._workers = []
+        self._connections = []
+    
+    def enqueue(self, recipients: List[str], message: str) -> bool:
+        """Queue an email for delivery. Returns False if the queue is full."""
+        self.start()
+        try:
+            self._queue.put_nowait(OutgoingEmail(recipients=recipients, message=message))
+        except asyncio.QueueFull:
+            self._metrics["dropped"] += 1
+            logger.error("Email queue full, dropping email to %s", recipients)
+            return False
+        
+        self._metrics["queued"] += 1
+        return True
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._metrics,
+            "pending": self._queue.qsize() if self._queue else 0,
+            "retrying": len(self._retries),
+            "workers": len(self._workers),
+        }
+    
+    async def _drain(self) -> None:
+        """Wait until the queue is empty and no retry is scheduled."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._queue.join()
+            if not self._retries:
+                return
+            # Sleep until the next retry is back in the queue, then wait for it
+            next_at = min(handle.when() for handle, _ in self._retries.values())
+            await asyncio.sleep(max(next_at - loop.time(), 0))
+    
+    async def _worker(self, connection: SMTPConnection) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                first = await asyncio.wait_for(self._queue.get(), timeout=settings.SMTP_IDLE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                # Release idle sessions; the next batch reconnects
+                await loop.run_in_executor(self._executor, connection.close)
+                continue
+            
+            batch = [first]
+            try:
+                while len(batch) < settings.EMAIL_BATCH_SIZE and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                
+                started_at = time.perf_counter()
+                try:
+                    failed = await loop.run_in_executor(self._executor, connection.send_batch, settings.EMAIL_SENDER, batch)
+                except Exception as e:
+                    logger.error("Email batch failed: %s", e)
+                    failed = batch
+                
+                self._metrics["batches"] += 1
+                self._metrics["send_seconds_total"] += time.perf_counter() - started_at
+                self._metrics["sent"] += len(batch) - len(failed)
+                for email in failed:
+                    self._retry(email)
+            finally:
+                # Also when cancelled mid-batch, so join() never waits on a dead worker
+                for _ in batch:
+                    self._queue.task_done()
+    
+    def _retry(self, email: OutgoingEmail) -> None:
+        email.attempts += 1
+        if email.attempts > settings.EMAIL_MAX_RETRIES:
+            self._metrics["failed"] += 1
+            logger.error("Giving up on email to %s after %d attempts", email.recipients, email.attempts)
+            return
+        
+        self._metrics["retried"] += 1
+        delay = settings.EMAIL_RETRY_BACKOFF_SECONDS * (2 ** (email.attempts - 1))
+        handle = asyncio.get_running_loop().call_later(delay, self._requeue, email)
+        self._retries[id(email)] = (handle, email)
+    
+    def _requeue(self, email: OutgoingEmail) -> None:
+        self._retries.pop(id(email), None)
+        try:
+            self._queue.put_nowait(email)
+        except asyncio.QueueFull:
+            self._metrics["dropped"] += 1
+            logger.error("Email queue full, dropping retry to %s", email.recipients)
+
+mail_queue = MailQueue()
+
 class EmailClient:
     def __init__(self):
         self.sender = settings.EMAIL_SENDER
-        self.smtp_server = settings.SMTP_SERVER
-        self.smtp_port = settings.SMTP_PORT
-        self.smtp_username = settings.SMTP_USERNAME
-        self.smtp_password = settings.SMTP_PASSWORD
-        self.use_tls = settings.SMTP_USE_TLS
     
     async def send_email(
         self,
@@ -22,7 +243,7 @@ class EmailClient:
         cc: Optional[List[str]] = None,
         bcc: Optional[List[str]] = None
     ) -> bool:
-        """Send an email."""
+        """Queue an email for background delivery."""
         message = MIMEMultipart()
         message["From"] = self.sender
         message["To"] = to_email
@@ -35,26 +256,13 @@ class EmailClient:
         
         message.attach(MIMEText(html_content, "html"))
         
-        try:
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                if self.use_tls:
-                    server.starttls()
-                
-                if self.smtp_username and self.smtp_password:
-                    server.login(self.smtp_username, self.smtp_password)
-                
-                recipients = [to_email]
-                if cc:
-                    recipients.extend(cc)
-                if bcc:
-                    recipients.extend(bcc)
-                
-                server.sendmail(self.sender, recipients, message.as_string())
-                
-            return True
-        except Exception as e:
-            print(f"Error sending email: {str(e)}")
-            return False
+        recipients = [to_email]
+        if cc:
+            recipients.extend(cc)
+        if bcc:
+            recipients.extend(bcc)
+        
+        return mail_queue.enqueue(recipients, message.as_string())
     
     async def send_verification_email(
         self,
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import logging
+import uuid
+from collections import defaultdict
+from typing import Any, Callable, Dict, List
+
+import asyncpg
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Dict[str, Any]], None]
+
+
+class EventBus:
+    """Broadcast small events to every worker through Postgres LISTEN/NOTIFY.
+
+    Handlers run in-process immediately on publish and on every other worker
+    when the notification arrives. They must be cheap and synchronous; they
+    are meant for cache invalidation, not business logic. When the listener
+    connection is lost, a local ``reconnected`` event is dispatched after it
+    comes back so caches can drop anything they may have missed.
+    """
+
+    CHANNEL = "chatwave_events"
+
+    def __init__(self):
+        self.instance_id = uuid.uuid4().hex
+        self._handlers: Dict[str, List[Handler]] = defaultdict(list)
+        self._connection = None
+        self._lock = asyncio.Lock()
+        self._reconnect_task = None
+        self._stopped = False
+
+    def subscribe(self, event: str, handler: Handler) -> None:
+        """Register a handler for an event type."""
+        self._handlers[event].append(handler)
+
+    async def start(self) -> None:
+        """Open the listener connection."""
+        self._stopped = False
+        try:
+            await self._connect()
+        except Exception as e:
+            logger.warning("Event bus unavailable, events stay local to this worker: %s", e)
+            self._schedule_reconnect()
+
+    async def stop(self) -> None:
+        """Close the listener connection."""
+        self._stopped = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            await connection.close()
+
+    async def publish(self, event: str, data: Dict[str, Any]) -> None:
+        """Dispatch an event locally and to every other worker."""
+        self._dispatch(event, data)
+
+        if self._connection is None:
+            return
+
+        payload = json.dumps({"source": self.instance_id, "event": event, "data": data})
+        try:
+            async with self._lock:
+                await self._connection.execute("SELECT pg_notify($1, $2)", self.CHANNEL, payload)
+        except Exception as e:
+            logger.warning("Could not publish %s event: %s", event, e)
+
+    async def _connect(self) -> None:
+        dsn = settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
+        connection = await asyncpg.connect(dsn)
+        await connection.add_listener(self.CHANNEL, self._on_notification)
+        connection.add_termination_listener(self._on_termination)
+        self._connection = connection
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        if message.get("source") == self.instance_id:
+            return
+        self._dispatch(message.get("event"), message.get("data") or {})
+
+    def _on_termination(self, connection) -> None:
+        if self._connection is connection:
+            self._connection = None
+            self._schedule_reconnect()
+
+    def _schedule_reconnect(self) -> None:
+        if not self._stopped and self._reconnect_task is None:
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = 1
+        while not self._stopped:
+            await asyncio.sleep(delay)
+            try:
+                await self._connect()
+            except Exception as e:
+                logger.warning("Event bus reconnect failed: %s", e)
+                delay = min(delay * 2, 30)
+                continue
+            self._reconnect_task = None
+            self._dispatch("reconnected", {})
+            return
+
+    def _dispatch(self, event: str, data: Dict[str, Any]) -> None:
+        for handler in self._handlers.get(event, []):
+            try:
+                handler(data)
+            except Exception as e:
+                logger.error("Event handler for %s failed: %s", event, e)
+
+
+event_bus = EventBus()
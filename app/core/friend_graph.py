@@ -0,0 +1,224 @@
+import heapq
+import random
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, List, Tuple
+
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.events import event_bus
+from app.models.friendship import Friendship, FriendshipStatus
+
+
+class Adjacency:
+    """A user's accepted friends and blocked users as sorted int arrays."""
+
+    __slots__ = ("friends", "blocked", "loaded_at")
+
+    def __init__(self, friends: Iterable[int], blocked: Iterable[int]):
+        self.friends = array("i", sorted(set(friends)))
+        self.blocked = array("i", sorted(set(blocked)))
+        self.loaded_at = time.monotonic()
+
+    @property
+    def weight(self) -> int:
+        """Cache cost: one slot per edge plus one for the entry itself."""
+        return len(self.friends) + len(self.blocked) + 1
+
+
+def contains(values: array, value: int) -> bool:
+    """Binary search a sorted array."""
+    index = bisect_left(values, value)
+    return index < len(values) and values[index] == value
+
+
+def intersect(a: array, b: array) -> List[int]:
+    """Intersect two sorted arrays, returning a sorted list."""
+    if len(a) > len(b):
+        a, b = b, a
+    # Binary search the smaller side when the sizes are lopsided
+    if len(a) * 16 < len(b):
+        return [value for value in a if contains(b, value)]
+    return sorted(set(a).intersection(b))
+
+
+class FriendGraph:
+    """Bounded, lazily loaded in-memory index of the friendship graph.
+
+    Each user's adjacency is loaded with one query the first time it is
+    needed and kept in LRU order; the cache is bounded by the total number of
+    edges held, plus one per cached user. Friendship endpoints invalidate both
+    ends of a changed edge on every worker through the event bus. A version
+    counter stops a load that raced with an invalidation from re-inserting
+    stale data. Entries are reloaded after ``FRIEND_GRAPH_TTL_SECONDS`` as a
+    backstop for invalidations missed while the event bus was disconnected.
+
+    Friend suggestions are ranked from the same adjacencies and cached per
+    user; a change to one of the user's own edges drops them, while changes
+    further out are picked up when the cache entry expires.
+    """
+
+    def __init__(self, max_edges: int):
+        self.max_edges = max_edges
+        self._adjacency: "OrderedDict[int, Adjacency]" = OrderedDict()
+        self._edges = 0
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        self._suggestions = TTLCache(
+            settings.FRIEND_SUGGESTION_CACHE_SIZE,
+            settings.FRIEND_SUGGESTION_CACHE_TTL_SECONDS
+        )
+
+        event_bus.subscribe("friendship_changed", self._on_friendship_changed)
+        event_bus.subscribe("reconnected", lambda data: self.clear())
+
+    async def get(self, db: AsyncSession, user_id: int) -> Adjacency:
+        """Get a user's adjacency, loading it if needed."""
+        adjacency = self._fresh(user_id)
+        if adjacency is not None:
+            self._adjacency.move_to_end(user_id)
+            self.hits += 1
+            return adjacency
+
+        self.misses += 1
+        return (await self.load_many(db, [user_id]))[user_id]
+
+    async def load_many(self, db: AsyncSession, user_ids: Iterable[int]) -> Dict[int, Adjacency]:
+        """Get adjacencies for many users, loading the missing ones in one query."""
+        found: Dict[int, Adjacency] = {}
+        missing = []
+        for user_id in set(user_ids):
+            adjacency = self._fresh(user_id)
+            if adjacency is None:
+                missing.append(user_id)
+            else:
+                found[user_id] = adjacency
+        if not missing:
+            return found
+
+        version = self._version
+        result = await db.execute(
+            select(Friendship.requester_id, Friendship.addressee_id, Friendship.status).where(
+                or_(Friendship.requester_id.in_(missing), Friendship.addressee_id.in_(missing)) &
+                Friendship.status.in_([FriendshipStatus.ACCEPTED, FriendshipStatus.BLOCKED])
+            )
+        )
+
+        edges: Dict[int, Tuple[List[int], List[int]]] = {user_id: ([], []) for user_id in missing}
+        for requester_id, addressee_id, status in result:
+            for user_id, other_id in ((requester_id, addressee_id), (addressee_id, requester_id)):
+                if user_id in edges:
+                    edges[user_id][0 if status == FriendshipStatus.ACCEPTED else 1].append(other_id)
+
+        for user_id, (friends, blocked) in edges.items():
+            adjacency = Adjacency(friends, blocked)
+            found[user_id] = adjacency
+            if version == self._version:
+                self._store(user_id, adjacency)
+        return found
+
+    async def are_friends(self, db: AsyncSession, user1_id: int, user2_id: int) -> bool:
+        """Check if two users are accepted friends."""
+        adjacency = await self.get(db, user1_id)
+        return contains(adjacency.friends, user2_id)
+
+    async def is_blocked(self, db: AsyncSession, user1_id: int, user2_id: int) -> bool:
+        """Check if either user has blocked the other."""
+        adjacency = await self.get(db, user1_id)
+        return contains(adjacency.blocked, user2_id)
+
+    async def mutual_friends(self, db: AsyncSession, user1_id: int, user2_id: int) -> List[int]:
+        """Get the ids of friends two users have in common."""
+        adjacencies = await self.load_many(db, [user1_id, user2_id])
+        return intersect(adjacencies[user1_id].friends, adjacencies[user2_id].friends)
+
+    async def suggestions(self, db: AsyncSession, user_id: int) -> List[Tuple[int, int]]:
+        """Rank friends of friends as (user id, mutual friend count), best first."""
+        ranked = self._suggestions.get(user_id)
+        if ranked is not None:
+            return ranked
+
+        adjacency = await self.get(db, user_id)
+        friends = adjacency.friends
+        if len(friends) > settings.FRIEND_SUGGESTION_SAMPLE_SIZE:
+            friends = random.sample(list(friends), settings.FRIEND_SUGGESTION_SAMPLE_SIZE)
+        neighbourhood = await self.load_many(db, friends)
+
+        mutual_counts = Counter()
+        for friend_adjacency in neighbourhood.values():
+            mutual_counts.update(friend_adjacency.friends)
+
+        candidates = (
+            (-count, candidate_id) for candidate_id, count in mutual_counts.items()
+            if candidate_id != user_id
+            and not contains(adjacency.friends, candidate_id)
+            and not contains(adjacency.blocked, candidate_id)
+        )
+        ranked = [
+            (candidate_id, -count)
+            for count, candidate_id in heapq.nsmallest(settings.FRIEND_SUGGESTIONS_MAX, candidates)
+        ]
+        self._suggestions.set(user_id, ranked)
+        return ranked
+
+    async def friendship_changed(self, user1_id: int, user2_id: int) -> None:
+        """Invalidate both ends of a changed friendship on every worker."""
+        await event_bus.publish("friendship_changed", {"user_ids": [user1_id, user2_id]})
+
+    def invalidate(self, user_ids: Iterable[int]) -> None:
+        self._version += 1
+        for user_id in user_ids:
+            adjacency = self._adjacency.pop(user_id, None)
+            if adjacency is not None:
+                self._edges -= adjacency.weight
+            self._suggestions.pop(user_id)
+
+    def clear(self) -> None:
+        self._version += 1
+        self._adjacency.clear()
+        self._edges = 0
+        self._suggestions.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "users": len(self._adjacency),
+            "edges": self._edges,
+            "max_edges": self.max_edges,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "suggestions": self._suggestions.stats(),
+        }
+
+    def _fresh(self, user_id: int):
+        """Get a cached adjacency unless it has outlived the TTL."""
+        adjacency = self._adjacency.get(user_id)
+        if adjacency is not None and time.monotonic() - adjacency.loaded_at >= settings.FRIEND_GRAPH_TTL_SECONDS:
+            del self._adjacency[user_id]
+            self._edges -= adjacency.weight
+            return None
+        return adjacency
+
+    def _store(self, user_id: int, adjacency: Adjacency) -> None:
+        previous = self._adjacency.pop(user_id, None)
+        if previous is not None:
+            self._edges -= previous.weight
+
+        self._adjacency[user_id] = adjacency
+        self._edges += adjacency.weight
+        while self._edges > self.max_edges and len(self._adjacency) > 1:
+            _, evicted = self._adjacency.popitem(last=False)
+            self._edges -= evicted.weight
+
+    def _on_friendship_changed(self, data: Dict[str, Any]) -> None:
+        self.invalidate(data["user_ids"])
+
+
+friend_graph = FriendGraph(settings.FRIEND_GRAPH_MAX_EDGES)
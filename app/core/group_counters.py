@@ -0,0 +1,107 @@
+import asyncio
+import logging
+from typing import Tuple
+
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.session import async_session
+from app.models.group import Group, GroupMember, GroupMemberRole
+
+logger = logging.getLogger(__name__)
+
+
+async def repair_group_counter_batch(db: AsyncSession, after_id: int, batch_size: int) -> Tuple[int, int]:
+    """Recompute member and admin counts for the next batch of groups.
+
+    The batch's group rows are locked first. Every membership change shifts
+    its group's counters in the same transaction, so once the locks are held
+    no change is in flight and the counts below see all of them. Returns the
+    last group id of the batch (0 when there are no more groups) and the
+    number of groups whose counters were wrong.
+    """
+    result = await db.execute(
+        select(Group.id)
+        .where(Group.id > after_id)
+        .order_by(Group.id)
+        .limit(batch_size)
+        .with_for_update()
+    )
+    group_ids = list(result.scalars())
+    if not group_ids:
+        return 0, 0
+
+    counts = (
+        select(
+            Group.id.label("group_id"),
+            func.count(GroupMember.id).label("members"),
+            func.count(GroupMember.id).filter(GroupMember.role == GroupMemberRole.ADMIN).label("admins")
+        )
+        .outerjoin(GroupMember, and_(GroupMember.group_id == Group.id, GroupMember.is_active == True))
+        .where(Group.id.in_(group_ids))
+        .group_by(Group.id)
+        .subquery()
+    )
+    result = await db.execute(
+        update(Group)
+        .where(
+            (Group.id == counts.c.group_id) &
+            ((Group.member_count != counts.c.members) | (Group.admin_count != counts.c.admins))
+        )
+        .values(member_count=counts.c.members, admin_count=counts.c.admins, updated_at=Group.updated_at)
+        .returning(Group.id)
+    )
+    repaired = len(result.all())
+    await db.commit()
+
+    return group_ids[-1], repaired
+
+
+async def repair_group_counters(batch_size: int = None) -> int:
+    """Recompute every group's counters, returning how many needed fixing."""
+    batch_size = batch_size or settings.GROUP_COUNTER_REPAIR_BATCH_SIZE
+
+    total = 0
+    after_id = 0
+    async with async_session() as db:
+        while True:
+            after_id, repaired = await repair_group_counter_batch(db, after_id, batch_size)
+            total += repaired
+            if not after_id:
+                break
+
+    if total:
+        logger.warning("Repaired member counters of %d groups", total)
+    return total
+
+
+class GroupCounterRepair:
+    """Periodically recompute group counters in the background."""
+
+    def __init__(self):
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.GROUP_COUNTER_REPAIR_INTERVAL_SECONDS)
+            try:
+                await repair_group_counters()
+            except Exception as e:
+                logger.error("Group counter repair failed: %s", e)
+
+
+group_counter_repair = GroupCounterRepair()
@@ -0,0 +1,178 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, KeysView, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.events import event_bus
+from app.models.group import GroupMember, GroupMemberRole
+
+
+class GroupMembership:
+    """A group's active members and their roles."""
+
+    __slots__ = ("roles", "version", "loaded_at")
+
+    def __init__(self, roles: Dict[int, GroupMemberRole]):
+        self.roles = roles
+        self.version = 0
+        self.loaded_at = time.monotonic()
+
+    @property
+    def member_ids(self) -> KeysView[int]:
+        return self.roles.keys()
+
+    @property
+    def admin_count(self) -> int:
+        return sum(1 for role in self.roles.values() if role == GroupMemberRole.ADMIN)
+
+    @property
+    def weight(self) -> int:
+        """Cache cost: one slot per member plus one for the entry itself."""
+        return len(self.roles) + 1
+
+
+class MembershipCache:
+    """Bounded, lazily loaded cache of group memberships.
+
+    Each group's role map is loaded with one query the first time it is
+    needed and kept in LRU order, bounded by the total number of members
+    held. Invite, leave and promote update cached groups in place on every
+    worker through the event bus, bumping the group's ``version`` so callers
+    can tell a membership has changed. A global counter stops a load that
+    raced with a change from caching stale data. Entries are reloaded after
+    ``GROUP_MEMBERSHIP_CACHE_TTL_SECONDS`` as a backstop for change events
+    missed while the event bus was disconnected.
+    """
+
+    # User ids per change event; keeps NOTIFY payloads under 8000 bytes
+    EVENT_CHUNK_SIZE = 500
+
+    def __init__(self, max_members: int):
+        self.max_members = max_members
+        self._groups: "OrderedDict[int, GroupMembership]" = OrderedDict()
+        self._members = 0
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+
+        event_bus.subscribe("group_membership_changed", self._on_membership_changed)
+        event_bus.subscribe("reconnected", lambda data: self.clear())
+
+    async def get(self, db: AsyncSession, group_id: int) -> GroupMembership:
+        """Get a group's membership, loading it if needed."""
+        membership = self._fresh(group_id)
+        if membership is not None:
+            self._groups.move_to_end(group_id)
+            self.hits += 1
+            return membership
+
+        self.misses += 1
+        version = self._version
+        membership = GroupMembership(dict(await GroupMember.get_member_roles(db, group_id)))
+        if version == self._version:
+            self._store(group_id, membership)
+        return membership
+
+    async def is_member(self, db: AsyncSession, group_id: int, user_id: int) -> bool:
+        """Check if a user is an active member of a group."""
+        return user_id in (await self.get(db, group_id)).roles
+
+    async def is_admin(self, db: AsyncSession, group_id: int, user_id: int) -> bool:
+        """Check if a user is an admin of a group."""
+        return (await self.get(db, group_id)).roles.get(user_id) == GroupMemberRole.ADMIN
+
+    async def member_ids(self, db: AsyncSession, group_id: int) -> List[int]:
+        """Get the ids of a group's active members."""
+        # A copy, so callers can await while iterating
+        return list((await self.get(db, group_id)).member_ids)
+
+    async def member_added(self, group_id: int, user_id: int, role: GroupMemberRole) -> None:
+        """Record a new member on every worker."""
+        await self.members_added(group_id, [user_id], role)
+
+    async def member_removed(self, group_id: int, user_id: int) -> None:
+        """Record a member leaving on every worker."""
+        await self.members_removed(group_id, [user_id])
+
+    async def role_changed(self, group_id: int, user_id: int, role: GroupMemberRole) -> None:
+        """Record a member's new role on every worker."""
+        await self.roles_changed(group_id, [user_id], role)
+
+    async def members_added(self, group_id: int, user_ids: List[int], role: GroupMemberRole) -> None:
+        await self._publish(group_id, user_ids, role)
+
+    async def members_removed(self, group_id: int, user_ids: List[int]) -> None:
+        await self._publish(group_id, user_ids, None)
+
+    async def roles_changed(self, group_id: int, user_ids: List[int], role: GroupMemberRole) -> None:
+        await self._publish(group_id, user_ids, role)
+
+    def invalidate(self, group_id: int) -> None:
+        self._version += 1
+        membership = self._groups.pop(group_id, None)
+        if membership is not None:
+            self._members -= membership.weight
+
+    def clear(self) -> None:
+        self._version += 1
+        self._groups.clear()
+        self._members = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "groups": len(self._groups),
+            "members": self._members,
+            "max_members": self.max_members,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    async def _publish(self, group_id: int, user_ids: List[int], role: Optional[GroupMemberRole]) -> None:
+        for start in range(0, len(user_ids), self.EVENT_CHUNK_SIZE):
+            await event_bus.publish("group_membership_changed", {
+                "group_id": group_id,
+                "user_ids": user_ids[start:start + self.EVENT_CHUNK_SIZE],
+                "role": role.value if role is not None else None
+            })
+
+    def _fresh(self, group_id: int) -> Optional[GroupMembership]:
+        """Get a cached membership unless it has outlived the TTL."""
+        membership = self._groups.get(group_id)
+        if membership is not None and time.monotonic() - membership.loaded_at >= settings.GROUP_MEMBERSHIP_CACHE_TTL_SECONDS:
+            del self._groups[group_id]
+            self._members -= membership.weight
+            return None
+        return membership
+
+    def _store(self, group_id: int, membership: GroupMembership) -> None:
+        previous = self._groups.pop(group_id, None)
+        if previous is not None:
+            self._members -= previous.weight
+
+        self._groups[group_id] = membership
+        self._members += membership.weight
+        while self._members > self.max_members and len(self._groups) > 1:
+            _, evicted = self._groups.popitem(last=False)
+            self._members -= evicted.weight
+
+    def _on_membership_changed(self, data: Dict[str, Any]) -> None:
+        self._version += 1
+        membership = self._groups.get(data["group_id"])
+        if membership is None:
+            return
+
+        self._members -= membership.weight
+        for user_id in data["user_ids"]:
+            if data["role"] is None:
+                membership.roles.pop(user_id, None)
+            else:
+                membership.roles[user_id] = GroupMemberRole(data["role"])
+        self._members += membership.weight
+        membership.version += 1
+
+
+membership_cache = MembershipCache(settings.GROUP_MEMBERSHIP_CACHE_MAX_MEMBERS)
@@ -0,0 +1,16 @@
+from typing import Any, Callable, List, Sequence
+
+from fastapi import Response
+
+
+def paginate(response: Response, rows: Sequence[Any], limit: int, cursor_of: Callable[[Any], int]) -> List[Any]:
+    """Trim rows fetched with ``limit + 1`` to one page.
+
+    When more rows exist, the cursor of the last row returned is sent in the
+    ``X-Next-Cursor`` header; passing it back as ``cursor`` fetches the next page.
+    """
+    rows = list(rows)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = str(cursor_of(rows[-1]))
+    return rows
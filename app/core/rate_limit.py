@@ -0,0 +1,184 @@
+import logging
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from jose import JWTError
+from limits import parse
+from limits.aio.strategies import (
+    FixedWindowRateLimiter,
+    MovingWindowRateLimiter,
+    SlidingWindowCounterRateLimiter,
+)
+from limits.storage import storage_from_string
+
+from app.core.auth_cache import decode_token
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = {
+    "fixed-window": FixedWindowRateLimiter,
+    "moving-window": MovingWindowRateLimiter,
+    "sliding-window-counter": SlidingWindowCounterRateLimiter,
+}
+
+
+def rate_limit_key(request: Request) -> str:
+    """Key requests on the authenticated user when possible, else on the client IP."""
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            user_id = decode_token(token).get("sub")
+        except JWTError:
+            user_id = None
+        if user_id is not None:
+            return f"user:{user_id}"
+    return f"ip:{client_ip(request) or 'unknown'}"
+
+
+def client_ip(request: Request) -> Optional[str]:
+    """The client address, or None when the server does not know it."""
+    return request.client.host if request.client else None
+
+
+class RateLimiter:
+    """Rate limiter whose counters live in a shared ``limits`` storage.
+
+    With ``RATE_LIMIT_STORAGE_URI`` pointing at a shared backend (for example
+    ``async+redis://localhost:6379``) every worker enforces the same budget.
+    Once the shared store rejects a key, the rejection is remembered locally
+    until the window resets, so a client hammering an exhausted limit costs
+    no further round trips.
+
+    Busy keys also reserve hits from the store in blocks. A key starts with
+    plain single hits. Each time a worker uses up its block within the
+    window, the next block it takes is twice as large, up to
+    ``RATE_LIMIT_LOCAL_RESERVE_MAX`` and a tenth of the limit. Requests are
+    then admitted from the local allowance without a round trip. Hits a
+    worker reserved but did not use still count against the key until the
+    window passes, so the error is at most one block per worker. Limits
+    under 20 hits per window never reserve.
+    """
+
+    def __init__(self, storage_uri: str, strategy: str):
+        self._storage = storage_from_string(storage_uri)
+        self._strategy = STRATEGIES[strategy](self._storage)
+        self.shared = not storage_uri.split("://", 1)[0].endswith("memory")
+        if not self.shared:
+            logger.warning(
+                "Rate limits are kept in process memory (%s), so each worker enforces its own budget; "
+                "set RATE_LIMIT_STORAGE_URI to a shared store such as async+redis:// when running several workers",
+                storage_uri
+            )
+        self._blocked: Dict[Tuple[str, str], float] = {}
+        # (scope, key) -> [hits left, expires at, block size]
+        self._allowance: Dict[Tuple[str, str], List[float]] = {}
+        self._metrics = {
+            "checks": 0,
+            "allowed_locally": 0,
+            "reserved": 0,
+            "rejected": 0,
+            "rejected_locally": 0,
+            "check_seconds_total": 0.0,
+            "check_seconds_max": 0.0,
+        }
+
+    def limit(self, limit_value: str, scope: str):
+        """Build a FastAPI dependency enforcing ``limit_value`` (e.g. "5/minute")."""
+        item = parse(limit_value)
+
+        async def check_rate_limit(request: Request) -> None:
+            key = rate_limit_key(request)
+            started_at = time.perf_counter()
+            try:
+                await self._check(item, limit_value, scope, key)
+            finally:
+                elapsed = time.perf_counter() - started_at
+                self._metrics["checks"] += 1
+                self._metrics["check_seconds_total"] += elapsed
+                self._metrics["check_seconds_max"] = max(self._metrics["check_seconds_max"], elapsed)
+
+        return check_rate_limit
+
+    async def _check(self, item, limit_value: str, scope: str, key: str) -> None:
+        now = time.time()
+        blocked_until = self._blocked.get((scope, key))
+        if blocked_until is not None:
+            if blocked_until > now:
+                self._metrics["rejected_locally"] += 1
+                raise self._exceeded(limit_value, blocked_until - now)
+            del self._blocked[(scope, key)]
+
+        allowance = self._allowance.get((scope, key))
+        if allowance is not None and allowance[1] > now and allowance[0] > 0:
+            allowance[0] -= 1
+            self._metrics["allowed_locally"] += 1
+            return
+
+        block = self._next_block(item, allowance, now)
+        if block > 1 and await self._strategy.hit(item, scope, key, cost=block):
+            self._metrics["reserved"] += block
+            self._reserve(scope, key, block, now + item.get_expiry(), now)
+            return
+        if await self._strategy.hit(item, scope, key):
+            if allowance is not None:
+                del self._allowance[(scope, key)]
+            if self._block_cap(item) > 1:
+                # Remember the hit so a second one within the window starts reserving
+                self._reserve(scope, key, 1, now + item.get_expiry(), now)
+            return
+
+        window = await self._strategy.get_window_stats(item, scope, key)
+        self._block(scope, key, window.reset_time, now)
+        self._metrics["rejected"] += 1
+        raise self._exceeded(limit_value, window.reset_time - now)
+
+    @staticmethod
+    def _block_cap(item) -> int:
+        return min(settings.RATE_LIMIT_LOCAL_RESERVE_MAX, item.amount // 10)
+
+    def _next_block(self, item, allowance: Optional[List[float]], now: float) -> int:
+        """Double the block when the last one ran out within its window."""
+        if allowance is None or allowance[0] > 0 or allowance[1] <= now:
+            return 1
+        return max(1, min(int(allowance[2]) * 2, self._block_cap(item)))
+
+    def _reserve(self, scope: str, key: str, block: int, until: float, now: float) -> None:
+        if len(self._allowance) >= settings.RATE_LIMIT_LOCAL_CACHE_SIZE:
+            for expired in [k for k, a in self._allowance.items() if a[1] <= now]:
+                del self._allowance[expired]
+            if len(self._allowance) >= settings.RATE_LIMIT_LOCAL_CACHE_SIZE:
+                return
+        self._allowance[(scope, key)] = [block - 1, until, block]
+
+    def _block(self, scope: str, key: str, until: float, now: float) -> None:
+        if len(self._blocked) >= settings.RATE_LIMIT_LOCAL_CACHE_SIZE:
+            for expired in [k for k, t in self._blocked.items() if t <= now]:
+                del self._blocked[expired]
+            if len(self._blocked) >= settings.RATE_LIMIT_LOCAL_CACHE_SIZE:
+                return
+        self._blocked[(scope, key)] = until
+
+    @staticmethod
+    def _exceeded(limit_value: str, retry_after: float) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Rate limit exceeded: {limit_value}",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        checks = self._metrics["checks"]
+        return {
+            **self._metrics,
+            "shared_storage": self.shared,
+            "blocked_keys": len(self._blocked),
+            "reserved_keys": len(self._allowance),
+            "avg_check_seconds": self._metrics["check_seconds_total"] / checks if checks else 0.0,
+        }
+
+
+limiter = RateLimiter(settings.RATE_LIMIT_STORAGE_URI, settings.RATE_LIMIT_STRATEGY)
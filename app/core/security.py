@@ -1,6 +1,9 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Any, Dict, Optional
 import secrets
+import time
 import uuid
 
 import bcrypt
@@ -22,16 +25,108 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         hashed_password.encode('utf-8')
     )
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Check if a stored hash was made with different cost parameters."""
+    try:
+        rounds = int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds != settings.PASSWORD_HASH_ROUNDS
+
+class PasswordHasherBusy(Exception):
+    """Raised when a hashing request waits too long for a free worker."""
+
+class PasswordHasher:
+    """Run bcrypt on a dedicated, bounded thread pool.
+
+    bcrypt releases the GIL, so hashing in worker threads keeps the event loop
+    responsive. At most ``workers + max_queue`` requests are admitted at once;
+    callers that cannot get a slot within ``queue_timeout`` seconds get
+    ``PasswordHasherBusy`` instead of piling up behind a login burst.
+    """
+    
+    def __init__(self, workers: int, max_queue: int, queue_timeout: float):
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hasher")
+        self._slots = asyncio.Semaphore(workers + max_queue)
+        self._metrics = {
+            "hash_calls": 0,
+            "verify_calls": 0,
+            "rejected": 0,
+            "in_flight": 0,
+            "wait_seconds_total": 0.0,
+            "run_seconds_total": 0.0,
+            "run_seconds_max": 0.0,
+        }
+    
+    async def _run(self, func, *args):
+        queued_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._metrics["rejected"] += 1
+            raise PasswordHasherBusy()
+        
+        self._metrics["in_flight"] += 1
+        try:
+            loop = asyncio.get_running_loop()
+            started_at = time.perf_counter()
+            result = await loop.run_in_executor(self._executor, func, *args)
+            finished_at = time.perf_counter()
+            
+            self._metrics["wait_seconds_total"] += started_at - queued_at
+            self._metrics["run_seconds_total"] += finished_at - started_at
+            self._metrics["run_seconds_max"] = max(self._metrics["run_seconds_max"], finished_at - started_at)
+            return result
+        finally:
+            self._metrics["in_flight"] -= 1
+            self._slots.release()
+    
+    async def hash(self, password: str) -> str:
+        """Hash a password without blocking the event loop."""
+        self._metrics["hash_calls"] += 1
+        return await self._run(hash_password, password)
+    
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a password without blocking the event loop."""
+        self._metrics["verify_calls"] += 1
+        return await self._run(verify_password, plain_password, hashed_password)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get hashing metrics."""
+        calls = self._metrics["hash_calls"] + self._metrics["verify_calls"]
+        return {
+            **self._metrics,
+            "workers": self.workers,
+            "avg_wait_seconds": self._metrics["wait_seconds_total"] / calls if calls else 0.0,
+            "avg_run_seconds": self._metrics["run_seconds_total"] / calls if calls else 0.0,
+        }
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+    queue_timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS,
+)
+
+def _token_claims(data: Dict[str, Any], expire: datetime) -> Dict[str, Any]:
+    """Add expiry, issue time and a unique id (used for revocation) to token data."""
+    to_encode = data.copy()
+    to_encode.update({
+        "exp": expire,
+        "iat": time.time(),
+        "jti": uuid.uuid4().hex
+    })
+    return to_encode
+
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """Create a new access token."""
-    to_encode = data.copy()
-    
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    to_encode = _token_claims(data, expire)
     encoded_jwt = jwt.encode(
         to_encode, 
         settings.JWT_SECRET, 
@@ -42,9 +137,8 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
 
 def create_refresh_token(data: Dict[str, Any]) -> str:
     """Create a new refresh token."""
-    to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire})
+    to_encode = _token_claims(data, expire)
     
     encoded_jwt = jwt.encode(
         to_encode, 
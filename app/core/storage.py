@@ -0,0 +1,223 @@
+import hashlib
+import hmac
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Dict, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+CHUNK_SIZE = 1024 * 1024  # 1MB chunks
+
+
+class StorageBackend:
+    """Base class for attachment storage backends.
+
+    Objects are addressed by a backend-relative key. ``location()`` turns a key
+    into the ``<backend>://<key>`` string stored in ``FileAttachment.file_path``
+    so every row records which backend holds its bytes.
+    """
+
+    name: str = ""
+
+    def location(self, key: str) -> str:
+        """Get the backend-qualified location of an object."""
+        return f"{self.name}://{key}"
+
+    async def save(self, key: str, fileobj: BinaryIO, content_type: str) -> None:
+        """Stream a file object into the backend under the given key."""
+        raise NotImplementedError
+
+    async def open(self, key: str) -> AsyncIterator[bytes]:
+        """Stream an object out of the backend in chunks."""
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        """Delete an object. Missing objects are ignored."""
+        raise NotImplementedError
+
+    def signed_url(self, key: str, file_name: str, expires_in: Optional[int] = None) -> str:
+        """Get a time-limited URL that downloads the object directly."""
+        raise NotImplementedError
+
+
+class LocalStorageBackend(StorageBackend):
+    """Store attachments on the local filesystem under ``UPLOAD_DIR``."""
+
+    name = "local"
+
+    def __init__(self, root: str = None):
+        self.root = Path(root or settings.UPLOAD_DIR)
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        # Refuse keys that escape the upload directory
+        if self.root.resolve() not in path.parents:
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def _write(self, key: str, fileobj: BinaryIO) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as buffer:
+            shutil.copyfileobj(fileobj, buffer, CHUNK_SIZE)
+
+    async def save(self, key: str, fileobj: BinaryIO, content_type: str) -> None:
+        await run_in_threadpool(self._write, key, fileobj)
+
+    async def open(self, key: str) -> AsyncIterator[bytes]:
+        path = self._path(key)
+        with open(path, "rb") as f:
+            while True:
+                chunk = await run_in_threadpool(f.read, CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    async def delete(self, key: str) -> None:
+        path = self._path(key)
+        try:
+            await run_in_threadpool(os.remove, path)
+        except FileNotFoundError:
+            pass
+
+    def signed_url(self, key: str, file_name: str, expires_in: Optional[int] = None) -> str:
+        expires = int(time.time()) + (expires_in or settings.SIGNED_URL_EXPIRE_SECONDS)
+        query = urlencode({
+            "name": file_name,
+            "expires": expires,
+            "signature": sign_download(key, expires, file_name),
+        })
+        return f"{settings.STORAGE_PUBLIC_URL}/api/messages/files/download/{quote(key)}?{query}"
+
+
+class S3StorageBackend(StorageBackend):
+    """Store attachments in an S3-compatible object store (AWS S3, MinIO, ...)."""
+
+    name = "s3"
+
+    def __init__(self):
+        # Imported lazily so boto3 is only required when the backend is used
+        import boto3
+        from botocore.config import Config
+
+        self.bucket = settings.S3_BUCKET
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=settings.S3_ENDPOINT_URL or None,
+            region_name=settings.S3_REGION,
+            aws_access_key_id=settings.S3_ACCESS_KEY_ID or None,
+            aws_secret_access_key=settings.S3_SECRET_ACCESS_KEY or None,
+            config=Config(signature_version="s3v4"),
+        )
+
+    async def save(self, key: str, fileobj: BinaryIO, content_type: str) -> None:
+        # upload_fileobj switches to multipart uploads for large files,
+        # so the body is streamed rather than buffered in memory
+        await run_in_threadpool(
+            self.client.upload_fileobj,
+            fileobj,
+            self.bucket,
+            key,
+            ExtraArgs={"ContentType": content_type},
+        )
+
+    async def open(self, key: str) -> AsyncIterator[bytes]:
+        response = await run_in_threadpool(self.client.get_object, Bucket=self.bucket, Key=key)
+        body = response["Body"]
+        try:
+            while True:
+                chunk = await run_in_threadpool(body.read, CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+
+    async def delete(self, key: str) -> None:
+        await run_in_threadpool(self.client.delete_object, Bucket=self.bucket, Key=key)
+
+    def signed_url(self, key: str, file_name: str, expires_in: Optional[int] = None) -> str:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": key,
+                "ResponseContentDisposition": content_disposition(file_name),
+            },
+            ExpiresIn=expires_in or settings.SIGNED_URL_EXPIRE_SECONDS,
+        )
+
+
+BACKENDS = {
+    LocalStorageBackend.name: LocalStorageBackend,
+    S3StorageBackend.name: S3StorageBackend,
+}
+
+_instances: Dict[str, StorageBackend] = {}
+
+
+def get_storage_backend(name: str = None) -> StorageBackend:
+    """Get a storage backend by name, defaulting to ``STORAGE_BACKEND``."""
+    name = name or settings.STORAGE_BACKEND
+    if name not in _instances:
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown storage backend: {name}")
+        _instances[name] = BACKENDS[name]()
+    return _instances[name]
+
+
+def parse_location(location: str) -> Tuple[StorageBackend, str]:
+    """Resolve a stored ``file_path`` into its backend and key.
+
+    Rows written before backends existed hold a plain local path; those are
+    mapped onto the local backend.
+    """
+    if "://" in location:
+        name, key = location.split("://", 1)
+        return get_storage_backend(name), key
+
+    local = get_storage_backend(LocalStorageBackend.name)
+    path = Path(location)
+    if path.is_absolute():
+        return local, str(path.resolve().relative_to(local.root.resolve()))
+    return local, str(path.relative_to(local.root))
+
+
+def storage_key(user_id: int, file_name: str) -> str:
+    """Build a fresh, URL-safe key for a user's upload, keeping a plain extension."""
+    suffix = Path(file_name).suffix
+    if not suffix[1:].isalnum():
+        suffix = ""
+    return f"{user_id}/{uuid.uuid4().hex}{suffix.lower()}"
+
+
+def content_disposition(file_name: str) -> str:
+    """Build an attachment Content-Disposition header that keeps the original name."""
+    fallback = quote(file_name, safe="")
+    return f"attachment; filename=\"{fallback}\"; filename*=utf-8''{fallback}"
+
+
+def _download_secret() -> bytes:
+    # Never the JWT key itself, so a download signature can not be mistaken for a token signature
+    if settings.DOWNLOAD_SIGNING_SECRET:
+        return settings.DOWNLOAD_SIGNING_SECRET.encode("utf-8")
+    return hmac.new(settings.JWT_SECRET.encode("utf-8"), b"attachment-download", hashlib.sha256).digest()
+
+
+def sign_download(key: str, expires: int, file_name: str) -> str:
+    """Sign a local download key with its expiry timestamp and download name."""
+    message = f"download:{key}:{expires}:{file_name}".encode("utf-8")
+    return hmac.new(_download_secret(), message, hashlib.sha256).hexdigest()
+
+
+def verify_download_signature(key: str, expires: int, file_name: str, signature: str) -> bool:
+    """Verify a signed local download URL."""
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(sign_download(key, expires, file_name), signature)
@@ -0,0 +1,191 @@
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.events import event_bus
+from app.db.session import async_session
+from app.models.revoked_token import RevokedToken
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+
+class RevocationStore:
+    """In-memory view of revoked tokens, backed by the database.
+
+    Individual tokens are revoked by jti (logout); all of a user's tokens are
+    revoked by a per-user cutoff compared against the token's ``iat``
+    (logout from all devices, admin sign-out). Both checks are dictionary
+    lookups, so ``is_revoked`` costs nothing measurable per request. Other
+    workers learn about revocations through the event bus and, as a backstop
+    for events missed while the bus was disconnected, by reloading from the
+    database every ``TOKEN_REVOCATION_RELOAD_INTERVAL_SECONDS``. Entries are
+    dropped from memory and from the database once the tokens they cover have
+    expired anyway.
+    """
+
+    def __init__(self):
+        self._revoked: Dict[str, float] = {}
+        self._expiries: List[Tuple[float, str]] = []
+        self._valid_after: Dict[int, float] = {}
+        self._task = None
+
+        event_bus.subscribe("token_revoked", self._on_token_revoked)
+        event_bus.subscribe("user_tokens_revoked", self._on_user_tokens_revoked)
+        event_bus.subscribe("reconnected", self._on_reconnected)
+
+    def is_revoked(self, payload: Dict[str, Any]) -> bool:
+        """Check if a decoded token has been revoked."""
+        if payload.get("jti") in self._revoked:
+            return True
+
+        cutoff = self._valid_after.get(int(payload.get("sub", 0)))
+        return cutoff is not None and payload.get("iat", 0) < cutoff
+
+    async def is_revoked_in_db(self, db: AsyncSession, payload: Dict[str, Any], user: User) -> bool:
+        """Check a decoded token against the database rather than memory.
+
+        For long-lived tokens, where a revocation this worker missed must not
+        be honoured until the next reload. ``user`` is the token's subject.
+        """
+        if self.is_revoked(payload):
+            return True
+
+        if user.tokens_valid_after is not None:
+            cutoff = _timestamp(user.tokens_valid_after)
+            if payload.get("iat", 0) < cutoff:
+                self._valid_after[user.id] = cutoff
+                return True
+
+        jti = payload.get("jti")
+        if jti and await RevokedToken.is_revoked(db, jti):
+            self._add_token(jti, float(payload["exp"]))
+            return True
+        return False
+
+    async def revoke_token(self, db: AsyncSession, payload: Dict[str, Any]) -> None:
+        """Revoke a single token."""
+        jti = payload.get("jti")
+        if not jti:
+            return
+
+        expires = float(payload["exp"])
+        await RevokedToken.revoke(db, jti, int(payload["sub"]), datetime.utcfromtimestamp(expires))
+        await event_bus.publish("token_revoked", {"jti": jti, "exp": expires})
+
+    async def revoke_user(self, db: AsyncSession, user_id: int) -> None:
+        """Revoke every token issued to a user so far."""
+        now = datetime.utcnow()
+        await User.update(db, user_id, tokens_valid_after=now)
+        await event_bus.publish("user_tokens_revoked", {
+            "user_id": user_id,
+            "valid_after": _timestamp(now)
+        })
+
+    async def load(self) -> None:
+        """Merge every live revocation in the database into the in-memory view.
+
+        Revocations are never undone, so merging rather than replacing keeps
+        any that arrived over the event bus while the queries ran.
+        """
+        since = datetime.utcnow() - self._max_token_lifetime()
+        async with async_session() as db:
+            tokens = await RevokedToken.get_active(db)
+            cutoffs = await User.get_token_cutoffs(db, since)
+
+        for jti, expires_at in tokens:
+            self._add_token(jti, _timestamp(expires_at))
+        for user_id, valid_after in cutoffs:
+            cutoff = _timestamp(valid_after)
+            if cutoff > self._valid_after.get(user_id, 0):
+                self._valid_after[user_id] = cutoff
+
+    async def start(self) -> None:
+        try:
+            await self.load()
+        except Exception as e:
+            logger.error("Could not load revoked tokens: %s", e)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def prune(self) -> None:
+        """Forget revocations whose tokens have expired."""
+        now = time.time()
+        while self._expiries and self._expiries[0][0] <= now:
+            _, jti = heapq.heappop(self._expiries)
+            self._revoked.pop(jti, None)
+
+        oldest_live_token = now - self._max_token_lifetime().total_seconds()
+        for user_id in [u for u, cutoff in self._valid_after.items() if cutoff < oldest_live_token]:
+            del self._valid_after[user_id]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "revoked_tokens": len(self._revoked),
+            "revoked_users": len(self._valid_after),
+        }
+
+    async def _run(self):
+        last_pruned = time.monotonic()
+        while True:
+            await asyncio.sleep(settings.TOKEN_REVOCATION_RELOAD_INTERVAL_SECONDS)
+            try:
+                await self.load()
+            except Exception as e:
+                logger.error("Could not reload revoked tokens: %s", e)
+
+            if time.monotonic() - last_pruned < settings.TOKEN_REVOCATION_PRUNE_INTERVAL_SECONDS:
+                continue
+            last_pruned = time.monotonic()
+            self.prune()
+            try:
+                async with async_session() as db:
+                    while await RevokedToken.delete_expired(db) > 0:
+                        pass
+            except Exception as e:
+                logger.error("Could not prune revoked tokens: %s", e)
+
+    def _add_token(self, jti: str, expires: float) -> None:
+        if jti not in self._revoked:
+            self._revoked[jti] = expires
+            heapq.heappush(self._expiries, (expires, jti))
+
+    def _on_token_revoked(self, data: Dict[str, Any]) -> None:
+        self._add_token(data["jti"], data["exp"])
+
+    def _on_user_tokens_revoked(self, data: Dict[str, Any]) -> None:
+        self._valid_after[data["user_id"]] = data["valid_after"]
+
+    def _on_reconnected(self, data: Dict[str, Any]) -> None:
+        # Revocations may have been missed while disconnected
+        asyncio.create_task(self.load())
+
+    @staticmethod
+    def _max_token_lifetime() -> timedelta:
+        return max(
+            timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+            timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        )
+
+
+def _timestamp(value: datetime) -> float:
+    """Convert a naive UTC datetime to a POSIX timestamp."""
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+
+revocation_store = RevocationStore()
@@ -1,12 +1,19 @@
+from typing import Any, Dict, List, Sequence
+
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.future import select
-from sqlalchemy import update, delete
+from sqlalchemy import insert, update, delete
 
 Base = declarative_base()
 
 class CRUDBase:
-    """Base class for CRUD operations."""
+    """Base class for CRUD operations.
+    
+    Writes return their rows with RETURNING, so a write costs one statement
+    plus the commit instead of a follow-up SELECT.
+    """
     
     @classmethod
     async def get_by_id(cls, db: AsyncSession, id: int):
@@ -23,18 +30,69 @@ class CRUDBase:
     @classmethod
     async def create(cls, db: AsyncSession, **kwargs):
         """Create a new record."""
-        obj = cls(**kwargs)
-        db.add(obj)
+        result = await db.execute(insert(cls).values(**kwargs).returning(cls))
+        obj = result.scalar_one()
         await db.commit()
-        await db.refresh(obj)
         return obj
     
+    @classmethod
+    async def bulk_create(cls, db: AsyncSession, rows: List[Dict[str, Any]]):
+        """Create several records with one multi-row INSERT, returned in the order given."""
+        if not rows:
+            return []
+        result = await db.scalars(insert(cls).returning(cls, sort_by_parameter_order=True), rows)
+        objs = result.all()
+        await db.commit()
+        return objs
+    
     @classmethod
     async def update(cls, db: AsyncSession, id: int, **kwargs):
         """Update a record."""
-        await db.execute(update(cls).where(cls.id == id).values(**kwargs))
+        result = await db.execute(
+            update(cls)
+            .where(cls.id == id)
+            .values(**kwargs)
+            .returning(cls)
+            .execution_options(populate_existing=True)
+        )
+        obj = result.scalars().first()
         await db.commit()
-        return await cls.get_by_id(db, id)
+        return obj
+    
+    @classmethod
+    async def bulk_update(cls, db: AsyncSession, ids: Sequence[int], **kwargs):
+        """Set the same values on several records, returning those that exist."""
+        if not ids:
+            return []
+        result = await db.execute(
+            update(cls)
+            .where(cls.id.in_(ids))
+            .values(**kwargs)
+            .returning(cls)
+            .execution_options(populate_existing=True)
+        )
+        objs = result.scalars().all()
+        await db.commit()
+        return objs
+    
+    @classmethod
+    async def upsert(cls, db: AsyncSession, index_elements: Sequence[str], **kwargs):
+        """Insert a record, or update the one that conflicts on index_elements.
+        
+        index_elements must match a unique index or constraint.
+        """
+        stmt = postgresql.insert(cls).values(**kwargs)
+        set_ = {key: stmt.excluded[key] for key in kwargs if key not in index_elements}
+        # DO NOTHING would return no row for an existing record
+        set_ = set_ or {key: stmt.excluded[key] for key in index_elements}
+        result = await db.execute(
+            stmt.on_conflict_do_update(index_elements=list(index_elements), set_=set_)
+            .returning(cls)
+            .execution_options(populate_existing=True)
+        )
+        obj = result.scalar_one()
+        await db.commit()
+        return obj
     
     @classmethod
     async def delete(cls, db: AsyncSession, id: int):
@@ -1,18 +1,259 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+import asyncio
+import itertools
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event, exc, text
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.core.config import settings
+from app.core.events import event_bus
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = {
+            "checkouts": 0,
+            "waited": 0,  # Checkouts that found no idle connection
+            "timeouts": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        idle = self.checkedin() > 0
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics["timeouts"] += 1
+            raise
+        waited = time.perf_counter() - started_at
+        self.metrics["checkouts"] += 1
+        if not idle:
+            self.metrics["waited"] += 1
+        self.metrics["wait_seconds_total"] += waited
+        self.metrics["wait_seconds_max"] = max(self.metrics["wait_seconds_max"], waited)
+        return connection
+
+    def recreate(self):
+        # Keep the class (and metrics) across pool recreation after a disconnect
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def stats(self) -> Dict[str, Any]:
+        checkouts = self.metrics["checkouts"]
+        capacity = self.size() + self._max_overflow
+        return {
+            **self.metrics,
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "saturation": self.checkedout() / capacity if capacity else 0.0,
+            "avg_wait_seconds": self.metrics["wait_seconds_total"] / checkouts if checkouts else 0.0,
+        }
+
+
+def create_engine(url: str) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        echo=False,
+        future=True,
+        poolclass=InstrumentedPool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        },
+    )
 
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=False,
-    future=True,
-)
+
+class PrimarySession(Session):
+    """Session on the primary that remembers whether it wrote anything."""
+
+
+@event.listens_for(PrimarySession, "after_flush")
+def _flushed(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(PrimarySession, "do_orm_execute")
+def _executed(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+engine = create_engine(settings.DATABASE_URL)
 
 async_session = sessionmaker(
     engine,
     class_=AsyncSession,
+    sync_session_class=PrimarySession,
     expire_on_commit=False,
     autocommit=False,
     autoflush=False,
 )
+
+
+class Replica:
+    __slots__ = ("name", "engine", "session", "lag_seconds", "checked_at")
+
+    def __init__(self, url: str):
+        self.name = make_url(url).render_as_string(hide_password=True)
+        self.engine = create_engine(url)
+        self.session = sessionmaker(
+            self.engine,
+            class_=AsyncSession,
+            expire_on_commit=False,
+            autocommit=False,
+            autoflush=False,
+        )
+        self.lag_seconds: Optional[float] = None
+        self.checked_at = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        fresh = time.monotonic() - self.checked_at < settings.DB_REPLICA_LAG_CHECK_SECONDS * 3
+        return fresh and self.lag_seconds is not None and self.lag_seconds <= settings.DB_REPLICA_MAX_LAG_SECONDS
+
+
+class ReplicaRouter:
+    """Route read-only sessions to read replicas when it is safe to.
+
+    Replicas are polled for replication lag every
+    ``DB_REPLICA_LAG_CHECK_SECONDS``; one that lags more than
+    ``DB_REPLICA_MAX_LAG_SECONDS``, or could not be checked, gets no reads.
+    A user who wrote through the primary within
+    ``DB_READ_YOUR_WRITES_SECONDS`` keeps reading from the primary so they
+    see their own changes; writes are shared with the other workers over
+    the event bus, at most one event per user per half window. With no
+    healthy replica every read goes to the primary.
+    """
+
+    def __init__(self, urls: List[str]):
+        self.replicas = [Replica(url) for url in urls]
+        self._cycle = itertools.cycle(self.replicas) if self.replicas else None
+        self._recent_writers: Dict[int, float] = {}
+        self._announced: Dict[int, float] = {}
+        self._task = None
+        self._metrics = {"replica_reads": 0, "primary_reads": 0, "read_your_writes": 0, "lagging": 0}
+
+        event_bus.subscribe("user_wrote", self._on_user_wrote)
+
+    def session_for(self, user_id: Optional[int] = None) -> sessionmaker:
+        """Pick the session factory for a read-only unit of work."""
+        if not self.replicas:
+            return async_session
+
+        if user_id is not None and self._wrote_recently(user_id):
+            self._metrics["read_your_writes"] += 1
+            self._metrics["primary_reads"] += 1
+            return async_session
+
+        for _ in range(len(self.replicas)):
+            replica = next(self._cycle)
+            if replica.healthy:
+                self._metrics["replica_reads"] += 1
+                return replica.session
+
+        self._metrics["lagging"] += 1
+        self._metrics["primary_reads"] += 1
+        return async_session
+
+    async def note_write(self, user_id: int) -> None:
+        """Send a user's reads to the primary for the read-your-writes window."""
+        if not self.replicas:
+            return
+        now = time.monotonic()
+        self._recent_writers[user_id] = now
+        if now - self._announced.get(user_id, 0.0) >= settings.DB_READ_YOUR_WRITES_SECONDS / 2:
+            self._announced[user_id] = now
+            await event_bus.publish("user_wrote", {"user_id": user_id})
+
+    def start(self) -> None:
+        if self.replicas and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._metrics,
+            "primary_pool": engine.pool.stats(),
+            "replicas": [
+                {
+                    "name": replica.name,
+                    "healthy": replica.healthy,
+                    "lag_seconds": replica.lag_seconds,
+                    "pool": replica.engine.pool.stats(),
+                }
+                for replica in self.replicas
+            ],
+        }
+
+    def _wrote_recently(self, user_id: int) -> bool:
+        wrote_at = self._recent_writers.get(user_id)
+        if wrote_at is None:
+            return False
+        if time.monotonic() - wrote_at < settings.DB_READ_YOUR_WRITES_SECONDS:
+            return True
+        del self._recent_writers[user_id]
+        return False
+
+    async def _run(self):
+        while True:
+            for replica in self.replicas:
+                await self._check_lag(replica)
+            self._forget_old_writers()
+            await asyncio.sleep(settings.DB_REPLICA_LAG_CHECK_SECONDS)
+
+    async def _check_lag(self, replica: Replica) -> None:
+        try:
+            async with replica.engine.connect() as connection:
+                # An idle primary sends no WAL, so a replayed-everything replica counts as current
+                result = await connection.execute(text(
+                    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+                ))
+                lag = result.scalar()
+            replica.lag_seconds = float(lag) if lag is not None else None
+            replica.checked_at = time.monotonic()
+        except Exception as e:
+            replica.lag_seconds = None
+            logger.warning("Could not check lag of replica %s: %s", replica.name, e)
+
+    def _forget_old_writers(self) -> None:
+        deadline = time.monotonic() - settings.DB_READ_YOUR_WRITES_SECONDS
+        for writers in (self._recent_writers, self._announced):
+            for user_id in [u for u, wrote_at in writers.items() if wrote_at < deadline]:
+                del writers[user_id]
+
+    def _on_user_wrote(self, data: Dict[str, Any]) -> None:
+        self._recent_writers[data["user_id"]] = time.monotonic()
+
+
+replica_router = ReplicaRouter([url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()])
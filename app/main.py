@@ -1,17 +1,24 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
 
 from app.api.routes import auth, users, friends, messages, calls, groups, admin
+from app.core.activity_retention import activity_maintenance
+from app.core.attachment_gc import attachment_collector
 from app.core.config import settings
 from app.core.dependencies import get_db
+from app.core.email import mail_queue
+from app.core.events import event_bus
+from app.core.group_counters import group_counter_repair
+from app.core.security import PasswordHasherBusy
+from app.core.token_revocation import revocation_store
+from app.db.session import replica_router
 from app.websockets.connection_manager import router as websocket_router
-
-# Create limiter
-limiter = Limiter(key_func=get_remote_address)
+from app.websockets.call_signaling import call_signaling
+from app.websockets.fanout import fanout_engine
+from app.websockets.live_stats import live_stats
+from app.websockets.presence import presence
 
 app = FastAPI(
     title="ChatWave API",
@@ -26,11 +33,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Content-Disposition"],
 )
 
-# Add rate limiting exception handler
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server is busy, please try again"},
+        headers={"Retry-After": "1"},
+    )
 
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
@@ -42,6 +54,33 @@ app.include_router(groups.router, prefix="/api/groups", tags=["Groups"])
 app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
 app.include_router(websocket_router)
 
+@app.on_event("startup")
+async def start_background_tasks():
+    await event_bus.start()
+    replica_router.start()
+    await revocation_store.start()
+    attachment_collector.start()
+    mail_queue.start()
+    group_counter_repair.start()
+    activity_maintenance.start()
+    await presence.start()
+    call_signaling.start()
+    live_stats.start()
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await live_stats.stop()
+    await call_signaling.stop()
+    await fanout_engine.stop()
+    await presence.stop()
+    await activity_maintenance.stop()
+    await group_counter_repair.stop()
+    await mail_queue.stop()
+    await attachment_collector.stop()
+    await revocation_store.stop()
+    await replica_router.stop()
+    await event_bus.stop()
+
 @app.get("/", tags=["Health"])
 async def health_check():
     return {"status": "healthy", "app": "ChatWave"}
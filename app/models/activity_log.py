@@ -1,7 +1,7 @@
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum as PyEnum
 
-from sqlalchemy import Column, DateTime, Enum, ForeignKey, Integer, String, Text
+from sqlalchemy import Column, Date, DateTime, Enum, ForeignKey, Index, Integer, String, Text, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
@@ -37,7 +37,7 @@ class ActivityLog(Base, CRUDBase):
     description = Column(Text, nullable=True)
     ip_address = Column(String, nullable=True)
     user_agent = Column(String, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     
     @classmethod
     async def log_activity(
@@ -78,3 +78,86 @@ class ActivityLog(Base, CRUDBase):
         
         result = await db.execute(query)
         return result.scalars().all()
+
+class ActivityLogArchive(Base):
+    """Raw activity rows moved out of activity_logs by the retention engine."""
+    __tablename__ = "activity_logs_archive"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, nullable=False, index=True)
+    activity_type = Column(Enum(ActivityType), nullable=False)
+    description = Column(Text, nullable=True)
+    ip_address = Column(String, nullable=True)
+    user_agent = Column(String, nullable=True)
+    created_at = Column(DateTime, index=True)
+
+class ActivityDailyStats(Base):
+    """Activity counts per day and activity type."""
+    __tablename__ = "activity_daily_stats"
+    
+    day = Column(Date, primary_key=True)
+    activity_type = Column(Enum(ActivityType), primary_key=True)
+    count = Column(Integer, default=0, nullable=False)
+    
+    @classmethod
+    async def get_range(cls, db: AsyncSession, start: date, end: date, activity_type: ActivityType = None):
+        """Get counts per day and activity type, oldest first."""
+        query = select(cls).where(cls.day >= start, cls.day <= end)
+        
+        if activity_type:
+            query = query.where(cls.activity_type == activity_type)
+        
+        result = await db.execute(query.order_by(cls.day, cls.activity_type))
+        return result.scalars().all()
+
+class ActivityUserDailyStats(Base):
+    """Activity counts per day, activity type and user."""
+    __tablename__ = "activity_user_daily_stats"
+    __table_args__ = (
+        Index("ix_activity_user_daily_stats_user_id_day", "user_id", "day"),
+    )
+    
+    day = Column(Date, primary_key=True)
+    activity_type = Column(Enum(ActivityType), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    count = Column(Integer, default=0, nullable=False)
+    
+    @classmethod
+    async def get_top_users(
+        cls,
+        db: AsyncSession,
+        activity_type: ActivityType,
+        start: date,
+        end: date,
+        limit: int = 100
+    ):
+        """Get (user_id, count) for the users with the most activities of a type, busiest first."""
+        total = func.sum(cls.count).label("count")
+        result = await db.execute(
+            select(cls.user_id, total)
+            .where(cls.activity_type == activity_type, cls.day >= start, cls.day <= end)
+            .group_by(cls.user_id)
+            .order_by(total.desc(), cls.user_id)
+            .limit(limit)
+        )
+        return result.all()
+    
+    @classmethod
+    async def get_user_totals(cls, db: AsyncSession, user_id: int, start: date, end: date):
+        """Get (activity_type, count) totals for one user."""
+        total = func.sum(cls.count).label("count")
+        result = await db.execute(
+            select(cls.activity_type, total)
+            .where(cls.user_id == user_id, cls.day >= start, cls.day <= end)
+            .group_by(cls.activity_type)
+            .order_by(cls.activity_type)
+        )
+        return result.all()
+
+class ActivityRollupState(Base):
+    """How far activity_logs has been folded into the rollups."""
+    __tablename__ = "activity_rollup_state"
+    
+    name = Column(String, primary_key=True)
+    last_id = Column(Integer, default=0, nullable=False)  # Every row up to this id is rolled up
+    updated_at = Column(DateTime, default=datetime.utcnow)
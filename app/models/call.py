@@ -1,7 +1,9 @@
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum as PyEnum
+from typing import List, Optional
 
-from sqlalchemy import Column, DateTime, Enum, ForeignKey, Integer, String
+from sqlalchemy import Column, Date, DateTime, Enum, ForeignKey, Integer, String, cast, func, or_, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
@@ -50,18 +52,217 @@ class Call(Base, CRUDBase):
         return result.scalars().all()
     
     @classmethod
-    async def complete_call(cls, db: AsyncSession, call_id: int):
-        """Mark a call as completed and calculate duration."""
-        call = await cls.get_by_id(db, call_id)
-        if call and call.status == CallStatus.ACCEPTED:
-            call.status = CallStatus.COMPLETED
-            call.ended_at = datetime.utcnow()
-            
-            if call.answered_at:
-                # Calculate duration in seconds
-                duration = (call.ended_at - call.answered_at).total_seconds()
-                call.duration_seconds = int(duration)
-            
-            await db.commit()
-            return True
-        return False
+    async def finish(
+        cls,
+        db: AsyncSession,
+        call_id: int,
+        status: CallStatus,
+        ended_at: datetime,
+        answered_at: Optional[datetime] = None,
+        duration_seconds: Optional[int] = None,
+        quality_score: Optional[int] = None
+    ):
+        """Write a call's final state, only if it can still reach it.
+
+        One conditional UPDATE: a call is completed while ringing or
+        answered (its answer may not be written yet), but only declined or
+        missed while ringing. Returns the call, or None if it had already
+        moved on.
+        """
+        if status == CallStatus.COMPLETED:
+            expected = [CallStatus.INITIATED, CallStatus.ACCEPTED]
+        else:
+            expected = [CallStatus.INITIATED]
+        result = await db.execute(
+            update(cls)
+            .where(cls.id == call_id, cls.status.in_(expected))
+            .values(
+                status=status,
+                answered_at=answered_at,
+                ended_at=ended_at,
+                duration_seconds=duration_seconds,
+                quality_score=func.coalesce(quality_score, cls.quality_score)
+            )
+            .returning(cls)
+        )
+        call = result.scalars().first()
+        if call:
+            await record_call_rollups(db, call)
+        await db.commit()
+        return call
+    
+    @classmethod
+    async def accept(cls, db: AsyncSession, call_id: int, answered_at: datetime):
+        """Record that a ringing call was answered, only if it is still ringing.
+
+        Lets ``complete_call`` end the call should the worker that owns it go
+        away. Returns the call, or None if it had already left the initiated
+        state.
+        """
+        result = await db.execute(
+            update(cls)
+            .where(cls.id == call_id, cls.status == CallStatus.INITIATED)
+            .values(status=CallStatus.ACCEPTED, answered_at=answered_at)
+            .returning(cls)
+        )
+        call = result.scalars().first()
+        await db.commit()
+        return call
+    
+    @classmethod
+    async def complete_call(
+        cls,
+        db: AsyncSession,
+        call_id: int,
+        user_id: int,
+        quality_score: Optional[int] = None
+    ):
+        """Complete an accepted call a user takes part in, in one conditional UPDATE.
+
+        Duration is computed by the database. Returns the call, or None if it
+        does not exist, the user is not a participant or it is not accepted.
+        """
+        now = func.timezone("utc", func.now())
+        result = await db.execute(
+            update(cls)
+            .where(
+                cls.id == call_id,
+                cls.status == CallStatus.ACCEPTED,
+                or_(cls.caller_id == user_id, cls.receiver_id == user_id)
+            )
+            .values(
+                status=CallStatus.COMPLETED,
+                ended_at=now,
+                duration_seconds=cast(func.extract("epoch", now - cls.answered_at), Integer),
+                quality_score=func.coalesce(quality_score, cls.quality_score)
+            )
+            .returning(cls)
+        )
+        call = result.scalars().first()
+        if call:
+            await record_call_rollups(db, call)
+        await db.commit()
+        return call
+
+
+class CallRollup:
+    """Counters shared by the call rollup tables."""
+    
+    calls_answered = Column(Integer, default=0, nullable=False)
+    calls_missed = Column(Integer, default=0, nullable=False)
+    calls_declined = Column(Integer, default=0, nullable=False)
+    talk_seconds = Column(Integer, default=0, nullable=False)
+    quality_score_total = Column(Integer, default=0, nullable=False)
+    quality_score_count = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    COUNTERS = (
+        "calls_answered", "calls_missed", "calls_declined",
+        "talk_seconds", "quality_score_total", "quality_score_count"
+    )
+    
+    @property
+    def talk_minutes(self) -> float:
+        return round(self.talk_seconds / 60, 1)
+    
+    @property
+    def average_quality_score(self) -> Optional[float]:
+        if not self.quality_score_count:
+            return None
+        return round(self.quality_score_total / self.quality_score_count, 2)
+    
+    @staticmethod
+    def increments(call: Call) -> dict:
+        """Counter increments for one finished call."""
+        return {
+            "calls_answered": int(call.answered_at is not None),
+            "calls_missed": int(call.status == CallStatus.MISSED),
+            "calls_declined": int(call.status == CallStatus.DECLINED),
+            "talk_seconds": call.duration_seconds or 0,
+            "quality_score_total": call.quality_score or 0,
+            "quality_score_count": int(call.quality_score is not None)
+        }
+    
+    @classmethod
+    async def _upsert(cls, db: AsyncSession, rows: List[dict], key: str, counters: tuple):
+        """Insert rollup rows, adding to the counters of rows that exist."""
+        stmt = insert(cls).values(rows)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[key],
+                set_={
+                    **{name: getattr(cls, name) + getattr(stmt.excluded, name) for name in counters},
+                    "updated_at": stmt.excluded.updated_at
+                }
+            )
+        )
+
+class UserCallStats(CallRollup, Base):
+    __tablename__ = "user_call_stats"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    calls_made = Column(Integer, default=0, nullable=False)
+    calls_received = Column(Integer, default=0, nullable=False)
+    
+    @property
+    def answer_rate(self) -> float:
+        """Share of received calls that were answered."""
+        return round(self.calls_answered / self.calls_received, 4) if self.calls_received else 0.0
+    
+    @classmethod
+    async def get_for_user(cls, db: AsyncSession, user_id: int):
+        """Get a user's call totals; all zero if they have no finished calls."""
+        result = await db.execute(select(cls).where(cls.user_id == user_id))
+        stats = result.scalars().first()
+        if stats is None:
+            stats = cls(user_id=user_id, calls_made=0, calls_received=0, **{name: 0 for name in cls.COUNTERS})
+        return stats
+    
+    @classmethod
+    async def record(cls, db: AsyncSession, call: Call):
+        """Add a finished call to both participants' totals."""
+        now = datetime.utcnow()
+        increments = cls.increments(call)
+        caller = {
+            "user_id": call.caller_id, "calls_made": 1, "calls_received": 0,
+            "talk_seconds": increments["talk_seconds"],
+            "quality_score_total": increments["quality_score_total"],
+            "quality_score_count": increments["quality_score_count"]
+        }
+        receiver = {"user_id": call.receiver_id, "calls_made": 0, "calls_received": 1, **increments}
+        rows = [
+            {name: 0 for name in cls.COUNTERS} | row | {"updated_at": now}
+            # Lock rows in user id order so concurrent upserts cannot deadlock
+            for row in sorted((caller, receiver), key=lambda row: row["user_id"])
+        ]
+        await cls._upsert(db, rows, "user_id", cls.COUNTERS + ("calls_made", "calls_received"))
+
+class DailyCallStats(CallRollup, Base):
+    __tablename__ = "daily_call_stats"
+    
+    day = Column(Date, primary_key=True)
+    calls = Column(Integer, default=0, nullable=False)
+    
+    @property
+    def answer_rate(self) -> float:
+        """Share of calls that were answered."""
+        return round(self.calls_answered / self.calls, 4) if self.calls else 0.0
+    
+    @classmethod
+    async def get_range(cls, db: AsyncSession, start: date, end: date):
+        """Get platform totals for each day with calls, oldest first."""
+        result = await db.execute(
+            select(cls).where(cls.day >= start, cls.day <= end).order_by(cls.day)
+        )
+        return result.scalars().all()
+    
+    @classmethod
+    async def record(cls, db: AsyncSession, call: Call):
+        """Add a finished call to the totals of the (UTC) day it started."""
+        row = {"day": call.started_at.date(), "calls": 1, **cls.increments(call), "updated_at": datetime.utcnow()}
+        await cls._upsert(db, [row], "day", cls.COUNTERS + ("calls",))
+
+async def record_call_rollups(db: AsyncSession, call: Call):
+    """Add a finished call to the rollups, in the transaction that finished it."""
+    await UserCallStats.record(db, call)
+    await DailyCallStats.record(db, call)
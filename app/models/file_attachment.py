@@ -13,12 +13,18 @@ class FileAttachment(Base, CRUDBase):
     message_id = Column(Integer, ForeignKey("messages.id"), nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     file_name = Column(String, nullable=False)
-    file_path = Column(String, nullable=False)
-    file_url = Column(String, nullable=False)
+    file_path = Column(String, nullable=False)  # "<backend>://<key>", see app.core.storage
+    file_url = Column(String, nullable=False, index=True)
     file_type = Column(String, nullable=False)
     file_size = Column(Integer, nullable=False)  # Size in bytes
     created_at = Column(DateTime, default=datetime.utcnow)
     
+    @classmethod
+    async def get_by_file_url(cls, db: AsyncSession, file_url: str):
+        """Get an attachment by its file URL."""
+        result = await db.execute(select(cls).where(cls.file_url == file_url))
+        return result.scalars().first()
+    
     @classmethod
     async def get_user_files(
         cls, 
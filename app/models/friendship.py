@@ -1,12 +1,15 @@
 from datetime import datetime
 from enum import Enum as PyEnum
 
-from sqlalchemy import Column, DateTime, Enum, ForeignKey, Integer, String, UniqueConstraint
+from typing import List, Optional
+
+from sqlalchemy import Column, DateTime, Enum, ForeignKey, Index, Integer, String, UniqueConstraint, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base, CRUDBase
+from app.models.user import User
 
 class FriendshipStatus(str, PyEnum):
     PENDING = "pending"
@@ -27,6 +30,7 @@ class Friendship(Base, CRUDBase):
     # Ensure unique relationships between users
     __table_args__ = (
         UniqueConstraint('requester_id', 'addressee_id', name='unique_friendship'),
+        Index('ix_friendships_addressee_id_status', 'addressee_id', 'status'),
     )
     
     @classmethod
@@ -63,3 +67,51 @@ class Friendship(Base, CRUDBase):
             )
         )
         return result.scalars().all()
+    
+    @classmethod
+    async def get_pending_user_ids(cls, db: AsyncSession, user_id: int) -> List[int]:
+        """Get the other users in a user's pending requests, sent or received."""
+        result = await db.execute(
+            select(cls.requester_id, cls.addressee_id).where(
+                ((cls.requester_id == user_id) | (cls.addressee_id == user_id)) &
+                (cls.status == FriendshipStatus.PENDING)
+            )
+        )
+        return [addressee_id if requester_id == user_id else requester_id for requester_id, addressee_id in result]
+    
+    @classmethod
+    async def get_friends_page(cls, db: AsyncSession, user_id: int, after_id: Optional[int] = None, limit: int = 100):
+        """Get a page of a user's friends as profile rows, ordered by user id."""
+        # One index-friendly branch per side of the friendship
+        friend_ids = union_all(
+            select(cls.addressee_id.label("friend_id")).where(
+                (cls.requester_id == user_id) & (cls.status == FriendshipStatus.ACCEPTED)
+            ),
+            select(cls.requester_id.label("friend_id")).where(
+                (cls.addressee_id == user_id) & (cls.status == FriendshipStatus.ACCEPTED)
+            )
+        ).subquery()
+        
+        query = select(*User.profile_columns()).join(friend_ids, User.id == friend_ids.c.friend_id)
+        if after_id is not None:
+            query = query.where(User.id > after_id)
+        result = await db.execute(query.order_by(User.id).limit(limit))
+        return result.all()
+    
+    @classmethod
+    async def get_pending_requests_page(cls, db: AsyncSession, user_id: int, after_id: Optional[int] = None, limit: int = 100):
+        """Get a page of pending friend requests with requester details, ordered by request id."""
+        query = select(
+            cls.id,
+            cls.requester_id,
+            User.username.label("requester_username"),
+            User.avatar_url.label("requester_avatar"),
+            cls.created_at
+        ).join(User, User.id == cls.requester_id).where(
+            (cls.addressee_id == user_id) &
+            (cls.status == FriendshipStatus.PENDING)
+        )
+        if after_id is not None:
+            query = query.where(cls.id > after_id)
+        result = await db.execute(query.order_by(cls.id).limit(limit))
+        return result.all()
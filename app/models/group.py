@@ -1,12 +1,17 @@
 from datetime import datetime
 from enum import Enum as PyEnum
+from typing import List, Optional
 
-from sqlalchemy import Boolean, Column, DateTime, Enum, ForeignKey, Integer, String, Text
+from sqlalchemy import Boolean, Column, DateTime, Enum, ForeignKey, Index, Integer, String, Text, cast, column, exists, func, insert, literal, table, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base, CRUDBase
+from app.models.user import User
+
+# Lightweight view of the messages table; app.models.message imports this module
+messages_table = table("messages", column("id"), column("group_id"))
 
 class GroupMemberRole(str, PyEnum):
     ADMIN = "admin"
@@ -23,24 +28,64 @@ class Group(Base, CRUDBase):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Active members and admins, kept in step with group_members
+    member_count = Column(Integer, default=0, server_default="0", nullable=False)
+    admin_count = Column(Integer, default=0, server_default="0", nullable=False)
+    
     @classmethod
     async def get_user_groups(cls, db: AsyncSession, user_id: int):
         """Get all groups a user is a member of."""
-        # First get all group memberships for the user
-        memberships_query = select(GroupMember.group_id).where(
-            (GroupMember.user_id == user_id) & 
-            (GroupMember.is_active == True)
+        result = await db.execute(
+            select(cls).join(GroupMember, GroupMember.group_id == cls.id).where(
+                (GroupMember.user_id == user_id) & 
+                (GroupMember.is_active == True)
+            )
+        )
+        return result.scalars().all()
+    
+    @classmethod
+    async def create_with_admin(cls, db: AsyncSession, created_by: int, **kwargs):
+        """Create a group and its creator's admin membership in one transaction."""
+        group = cls(created_by=created_by, member_count=1, admin_count=1, **kwargs)
+        db.add(group)
+        await db.flush()
+        db.add(GroupMember(group_id=group.id, user_id=created_by, role=GroupMemberRole.ADMIN))
+        await db.commit()
+        return group
+    
+    @classmethod
+    async def lock(cls, db: AsyncSession, group_id: int):
+        """Get a group with its row locked until the transaction ends.
+        
+        Taken before checking the last-admin rule, so two demotions or
+        departures can not both pass the check, and before adding members,
+        so two invites can not both add the same user.
+        """
+        result = await db.execute(
+            select(cls)
+            .where(cls.id == group_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
         )
-        memberships_result = await db.execute(memberships_query)
-        group_ids = [row[0] for row in memberships_result]
+        return result.scalars().first()
+    
+    @classmethod
+    async def adjust_counts(cls, db: AsyncSession, group_id: int, members: int = 0, admins: int = 0) -> None:
+        """Atomically shift a group's member and admin counters.
         
-        if not group_ids:
-            return []
-            
-        # Then get the groups
-        groups_query = select(cls).where(cls.id.in_(group_ids))
-        groups_result = await db.execute(groups_query)
-        return groups_result.scalars().all()
+        Leaves the transaction for the caller to commit, so the counters change
+        together with the membership rows they count.
+        """
+        await db.execute(
+            update(cls)
+            .where(cls.id == group_id)
+            .values(
+                member_count=cls.member_count + members,
+                admin_count=cls.admin_count + admins,
+                # Counters are not an edit of the group's details
+                updated_at=cls.updated_at
+            )
+        )
 
 class GroupMember(Base, CRUDBase):
     __tablename__ = "group_members"
@@ -52,6 +97,22 @@ class GroupMember(Base, CRUDBase):
     is_active = Column(Boolean, default=True)
     joined_at = Column(DateTime, default=datetime.utcnow)
     
+    # Newest group message this member has read; later ones count as unread
+    last_read_message_id = Column(Integer, nullable=True)
+    
+    __table_args__ = (
+        Index('ix_group_members_group_id_user_id', 'group_id', 'user_id'),
+    )
+    
+    @staticmethod
+    def latest_message_id(group_id: int):
+        """Scalar subquery for a group's newest message id, the read marker of a new member."""
+        return (
+            select(func.max(messages_table.c.id))
+            .where(messages_table.c.group_id == group_id)
+            .scalar_subquery()
+        )
+    
     @classmethod
     async def get_group_members(cls, db: AsyncSession, group_id: int):
         """Get all active members of a group."""
@@ -62,6 +123,120 @@ class GroupMember(Base, CRUDBase):
         result = await db.execute(query)
         return result.scalars().all()
     
+    @classmethod
+    async def bulk_add(cls, db: AsyncSession, group_id: int, user_ids: List[int], role: GroupMemberRole) -> List[int]:
+        """Add users who are not already active members, returning the ids added.
+        
+        Runs as one INSERT ... SELECT and leaves the transaction for the caller to commit.
+        Callers hold ``Group.lock`` so overlapping adds can not both pass the existence check.
+        """
+        already_member = exists().where(
+            (cls.group_id == group_id) &
+            (cls.user_id == User.id) &
+            (cls.is_active == True)
+        )
+        candidates = select(
+            literal(group_id),
+            User.id,
+            cast(literal(role, cls.role.type), cls.role.type),
+            literal(True),
+            literal(datetime.utcnow()),
+            cls.latest_message_id(group_id)
+        ).where(User.id.in_(user_ids) & ~already_member)
+        
+        result = await db.execute(
+            insert(cls)
+            .from_select(["group_id", "user_id", "role", "is_active", "joined_at", "last_read_message_id"], candidates)
+            .returning(cls.user_id)
+        )
+        return list(result.scalars())
+    
+    @classmethod
+    async def bulk_deactivate(cls, db: AsyncSession, group_id: int, user_ids: List[int]):
+        """Deactivate the memberships of several users, returning (user_id, role) of those removed.
+        
+        Leaves the transaction for the caller to commit.
+        """
+        result = await db.execute(
+            update(cls)
+            .where((cls.group_id == group_id) & cls.user_id.in_(user_ids) & (cls.is_active == True))
+            .values(is_active=False)
+            .returning(cls.user_id, cls.role)
+        )
+        return result.all()
+    
+    @classmethod
+    async def bulk_set_role(cls, db: AsyncSession, group_id: int, user_ids: List[int], role: GroupMemberRole) -> List[int]:
+        """Give several active members a role, returning the ids whose role changed.
+        
+        Leaves the transaction for the caller to commit.
+        """
+        result = await db.execute(
+            update(cls)
+            .where(
+                (cls.group_id == group_id) &
+                cls.user_id.in_(user_ids) &
+                (cls.is_active == True) &
+                (cls.role != role)
+            )
+            .values(role=role)
+            .returning(cls.user_id)
+        )
+        return list(result.scalars())
+    
+    @classmethod
+    async def mark_read(cls, db: AsyncSession, group_id: int, user_id: int, message_id: int) -> None:
+        """Move a member's read marker forward to a message; never moves it back."""
+        await db.execute(
+            update(cls)
+            .where((cls.group_id == group_id) & (cls.user_id == user_id) & (cls.is_active == True))
+            .values(last_read_message_id=func.greatest(func.coalesce(cls.last_read_message_id, 0), message_id))
+        )
+        await db.commit()
+    
+    @classmethod
+    async def get_member_roles(cls, db: AsyncSession, group_id: int):
+        """Get (user_id, role) for every active member of a group."""
+        result = await db.execute(
+            select(cls.user_id, cls.role).where(
+                (cls.group_id == group_id) & 
+                (cls.is_active == True)
+            )
+        )
+        return result.all()
+    
+    @classmethod
+    async def get_admin_ids(cls, db: AsyncSession, group_id: int) -> List[int]:
+        """Get the user ids of a group's active admins."""
+        result = await db.execute(
+            select(cls.user_id).where(
+                (cls.group_id == group_id) & 
+                (cls.is_active == True) &
+                (cls.role == GroupMemberRole.ADMIN)
+            )
+        )
+        return list(result.scalars())
+    
+    @classmethod
+    async def get_group_members_page(cls, db: AsyncSession, group_id: int, after_id: Optional[int] = None, limit: int = 100):
+        """Get a page of active members with their profile details, ordered by membership id."""
+        query = select(
+            cls.id,
+            cls.user_id,
+            User.username,
+            User.full_name,
+            User.avatar_url,
+            cls.role,
+            cls.joined_at
+        ).join(User, User.id == cls.user_id).where(
+            (cls.group_id == group_id) & 
+            (cls.is_active == True)
+        )
+        if after_id is not None:
+            query = query.where(cls.id > after_id)
+        result = await db.execute(query.order_by(cls.id).limit(limit))
+        return result.all()
+    
     @classmethod
     async def is_member(cls, db: AsyncSession, group_id: int, user_id: int):
         """Check if a user is an active member of a group."""
@@ -1,10 +1,15 @@
 from datetime import datetime
+from typing import List
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text, JSON
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, String, Text, JSON, cast, func, true, update
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app.db.base import Base, CRUDBase
+from app.models.group import Group, GroupMember
+from app.models.user import User
 
 class Message(Base, CRUDBase):
     __tablename__ = "messages"
@@ -17,7 +22,7 @@ class Message(Base, CRUDBase):
     
     # File attachment fields
     has_attachment = Column(Boolean, default=False)
-    file_url = Column(String, nullable=True)
+    file_url = Column(String, nullable=True, index=True)
     file_type = Column(String, nullable=True)
     file_name = Column(String, nullable=True)
     file_size = Column(Integer, nullable=True)  # Size in bytes
@@ -43,6 +48,10 @@ class Message(Base, CRUDBase):
     # For storing read receipts in group chats
     read_by = Column(JSON, default=list)
     
+    __table_args__ = (
+        Index('ix_messages_group_id_id', 'group_id', 'id'),
+    )
+    
     @classmethod
     async def get_conversation(
         cls, 
@@ -102,6 +111,88 @@ class Message(Base, CRUDBase):
         result = await db.execute(query)
         return result.scalars().all()
     
+    @classmethod
+    async def get_group_overview(cls, db: AsyncSession, user_id: int, unread_cap: int):
+        """Get every group of a user with its latest message and unread count.
+        
+        One query: a LATERAL subquery per group picks the newest message off
+        the (group_id, id) index, and a second counts messages after the
+        member's read marker, stopping at ``unread_cap``.
+        """
+        last_message = (
+            select(
+                cls.id,
+                cls.sender_id,
+                cls.content,
+                cls.has_attachment,
+                cls.file_type,
+                cls.created_at
+            )
+            .where((cls.group_id == Group.id) & (cls.is_deleted == False))
+            .order_by(cls.id.desc())
+            .limit(1)
+            .lateral("last_message")
+        )
+        unread_messages = (
+            select(cls.id)
+            .where(
+                (cls.group_id == Group.id) &
+                (cls.id > func.coalesce(GroupMember.last_read_message_id, 0)) &
+                (cls.sender_id != user_id) &
+                (cls.is_deleted == False)
+            )
+            .limit(unread_cap)
+            .correlate(Group, GroupMember)
+            .subquery()
+        )
+        unread = select(func.count().label("unread_count")).select_from(unread_messages).lateral("unread")
+        
+        query = (
+            select(
+                Group.id,
+                Group.name,
+                Group.avatar_url,
+                Group.member_count,
+                unread.c.unread_count,
+                last_message.c.id.label("last_message_id"),
+                last_message.c.sender_id.label("last_message_sender_id"),
+                User.username.label("last_message_sender_username"),
+                last_message.c.content.label("last_message_content"),
+                last_message.c.has_attachment.label("last_message_has_attachment"),
+                last_message.c.file_type.label("last_message_file_type"),
+                last_message.c.created_at.label("last_message_created_at")
+            )
+            .select_from(GroupMember)
+            .join(Group, Group.id == GroupMember.group_id)
+            .outerjoin(last_message, true())
+            .outerjoin(User, User.id == last_message.c.sender_id)
+            .join(unread, true())
+            .where((GroupMember.user_id == user_id) & (GroupMember.is_active == True))
+            .order_by(last_message.c.id.desc().nulls_last(), Group.id)
+        )
+        result = await db.execute(query)
+        return result.all()
+    
+    @classmethod
+    async def has_file_access(cls, db: AsyncSession, user_id: int, file_url: str) -> bool:
+        """Check if a user can see any message carrying the given file."""
+        member_groups = select(GroupMember.group_id).where(
+            (GroupMember.user_id == user_id) &
+            (GroupMember.is_active == True)
+        )
+        query = select(cls.id).where(
+            (cls.file_url == file_url) &
+            (cls.is_deleted == False) &
+            (
+                (cls.sender_id == user_id) |
+                (cls.receiver_id == user_id) |
+                (cls.group_id.in_(member_groups))
+            )
+        ).limit(1)
+        
+        result = await db.execute(query)
+        return result.first() is not None
+    
     @classmethod
     async def mark_as_delivered(cls, db: AsyncSession, message_id: int):
         """Mark a message as delivered."""
@@ -113,6 +204,33 @@ class Message(Base, CRUDBase):
             return True
         return False
     
+    @classmethod
+    async def mark_group_messages_read(cls, db: AsyncSession, messages: List["Message"], user_id: int) -> None:
+        """Add a user to ``read_by`` on a page of group messages in one UPDATE.
+        
+        Skips the user's own messages and ones they already read, and updates
+        the loaded messages to match. Leaves the transaction for the caller
+        to commit.
+        """
+        unread = [m.id for m in messages if m.sender_id != user_id and user_id not in (m.read_by or [])]
+        if not unread:
+            return
+        
+        read_by = func.coalesce(cast(cls.read_by, JSONB), func.jsonb_build_array())
+        reader = func.jsonb_build_array(user_id)
+        result = await db.execute(
+            update(cls)
+            .where(cls.id.in_(unread) & ~read_by.contains(reader))
+            .values(read_by=cast(read_by.op("||")(reader), JSON))
+            .returning(cls.id, cls.read_by)
+            .execution_options(synchronize_session=False)
+        )
+        # Without marking the messages dirty, so the commit does not write them again
+        updated = dict(result.all())
+        for message in messages:
+            if message.id in updated:
+                set_committed_value(message, "read_by", updated[message.id])
+    
     @classmethod
     async def mark_as_read(cls, db: AsyncSession, message_id: int, user_id: int = None):
         """Mark a message as read."""
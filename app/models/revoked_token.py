@@ -0,0 +1,53 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db.base import Base, CRUDBase
+
+class RevokedToken(Base, CRUDBase):
+    __tablename__ = "revoked_tokens"
+    
+    jti = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    @classmethod
+    async def revoke(cls, db: AsyncSession, jti: str, user_id: int, expires_at: datetime):
+        """Record a revoked token id."""
+        await db.execute(
+            insert(cls)
+            .values(jti=jti, user_id=user_id, expires_at=expires_at, created_at=datetime.utcnow())
+            .on_conflict_do_nothing(index_elements=[cls.jti])
+        )
+        await db.commit()
+    
+    @classmethod
+    async def is_revoked(cls, db: AsyncSession, jti: str) -> bool:
+        """Check if a token id has been revoked."""
+        result = await db.execute(select(cls.jti).where(cls.jti == jti))
+        return result.scalar() is not None
+    
+    @classmethod
+    async def get_active(cls, db: AsyncSession):
+        """Get (jti, expires_at) for every revoked token that has not expired yet."""
+        result = await db.execute(
+            select(cls.jti, cls.expires_at).where(cls.expires_at > datetime.utcnow())
+        )
+        return result.all()
+    
+    @classmethod
+    async def delete_expired(cls, db: AsyncSession, batch_size: int = 1000) -> int:
+        """Delete one batch of revocations whose tokens have expired."""
+        expired = (
+            select(cls.jti)
+            .where(cls.expires_at <= datetime.utcnow())
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        result = await db.execute(delete(cls).where(cls.jti.in_(expired)))
+        await db.commit()
+        return result.rowcount
@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
-from sqlalchemy import Boolean, Column, DateTime, Integer, String, Enum
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, Integer, String, Enum, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from enum import Enum as PyEnum
@@ -42,6 +42,45 @@ class User(Base, CRUDBase):
     two_factor_enabled = Column(Boolean, default=False)
     two_factor_secret = Column(String, nullable=True)
     
+    # Tokens issued before this moment are revoked (logout from all devices)
+    tokens_valid_after = Column(DateTime, nullable=True)
+    
+    # Total bytes of attachments owned by the user, kept incrementally
+    storage_used_bytes = Column(BigInteger, default=0, server_default="0", nullable=False)
+    
+    @classmethod
+    def profile_columns(cls):
+        """Columns served in UserResponse, for queries that skip loading full rows."""
+        return (
+            cls.id, cls.email, cls.username, cls.full_name, cls.status_message,
+            cls.avatar_url, cls.timezone, cls.is_active, cls.is_verified, cls.role,
+            cls.created_at, cls.last_seen_at
+        )
+    
+    @classmethod
+    async def get_profiles(cls, db: AsyncSession, user_ids: List[int], online_visible_only: bool = False):
+        """Get profile rows for active users, in the order of the ids given."""
+        if not user_ids:
+            return []
+        query = select(*cls.profile_columns()).where(cls.id.in_(user_ids) & (cls.is_active == True))
+        if online_visible_only:
+            query = query.where(cls.show_online_status == True)
+        result = await db.execute(query)
+        rows = {row.id: row for row in result}
+        return [rows[user_id] for user_id in user_ids if user_id in rows]
+    
+    @classmethod
+    async def get_presence_settings(cls, db: AsyncSession, user_ids: List[int]):
+        """Get privacy flags and last seen time for many users in one query."""
+        if not user_ids:
+            return []
+        result = await db.execute(
+            select(cls.id, cls.show_online_status, cls.show_last_seen, cls.last_seen_at).where(
+                cls.id.in_(user_ids)
+            )
+        )
+        return result.all()
+    
     @classmethod
     async def get_by_email(cls, db: AsyncSession, email: str) -> Optional["User"]:
         """Get a user by email."""
@@ -73,3 +112,43 @@ class User(Base, CRUDBase):
         """Get all users with pagination (admin function)."""
         result = await db.execute(select(cls).offset(skip).limit(limit))
         return result.scalars().all()
+    
+    @classmethod
+    async def get_token_cutoffs(cls, db: AsyncSession, since: datetime):
+        """Get (id, tokens_valid_after) for users whose tokens were revoked after a moment."""
+        result = await db.execute(
+            select(cls.id, cls.tokens_valid_after).where(cls.tokens_valid_after > since)
+        )
+        return result.all()
+    
+    @classmethod
+    async def get_storage_used(cls, db: AsyncSession, user_id: int) -> int:
+        """Get a user's attachment storage usage in bytes."""
+        result = await db.execute(select(cls.storage_used_bytes).where(cls.id == user_id))
+        return result.scalar() or 0
+    
+    @classmethod
+    async def reserve_storage(cls, db: AsyncSession, user_id: int, size: int, quota: int) -> bool:
+        """Atomically add to a user's storage usage if it stays within quota."""
+        result = await db.execute(
+            update(cls)
+            .where(
+                (cls.id == user_id) &
+                (cls.storage_used_bytes + size <= quota)
+            )
+            .values(storage_used_bytes=cls.storage_used_bytes + size)
+            .returning(cls.storage_used_bytes)
+        )
+        reserved = result.first() is not None
+        await db.commit()
+        return reserved
+    
+    @classmethod
+    async def release_storage(cls, db: AsyncSession, user_id: int, size: int) -> None:
+        """Subtract from a user's storage usage."""
+        await db.execute(
+            update(cls)
+            .where(cls.id == user_id)
+            .values(storage_used_bytes=cls.storage_used_bytes - size)
+        )
+        await db.commit()
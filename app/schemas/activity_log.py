@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
 from pydantic import BaseModel
@@ -17,3 +17,16 @@ class ActivityLogResponse(ActivityLogBase):
     ip_address: Optional[str] = None
     user_agent: Optional[str] = None
     created_at: datetime
+
+class ActivityDailyStatsResponse(ActivityLogBase):
+    day: date
+    activity_type: ActivityType
+    count: int
+
+class ActivityUserCountResponse(ActivityLogBase):
+    user_id: int
+    count: int
+
+class ActivityTypeCountResponse(ActivityLogBase):
+    activity_type: ActivityType
+    count: int
@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
 from pydantic import BaseModel
@@ -26,3 +26,20 @@ class CallResponse(CallBase):
     ended_at: Optional[datetime] = None
     duration_seconds: Optional[int] = None
     quality_score: Optional[int] = None
+
+class CallStatsBase(CallBase):
+    calls_answered: int
+    calls_missed: int
+    calls_declined: int
+    talk_seconds: int
+    talk_minutes: float
+    answer_rate: float
+    average_quality_score: Optional[float] = None
+
+class UserCallStatsResponse(CallStatsBase):
+    calls_made: int
+    calls_received: int
+
+class DailyCallStatsResponse(CallStatsBase):
+    day: date
+    calls: int
@@ -4,6 +4,7 @@ from typing import List, Optional
 from pydantic import BaseModel
 
 from app.models.friendship import FriendshipStatus
+from app.schemas.user import UserResponse
 
 class FriendshipBase(BaseModel):
     class Config:
@@ -29,3 +30,11 @@ class FriendRequestResponse(BaseModel):
     requester_username: str
     requester_avatar: Optional[str] = None
     created_at: datetime
+
+class MutualFriendsResponse(BaseModel):
+    user_id: int
+    count: int
+    friends: List[UserResponse]
+
+class FriendSuggestionResponse(UserResponse):
+    mutual_friends: int
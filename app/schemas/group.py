@@ -1,8 +1,10 @@
 from datetime import datetime
+from enum import Enum
 from typing import Optional, List
 
 from pydantic import BaseModel, Field
 
+from app.core.config import settings
 from app.models.group import GroupMemberRole
 
 class GroupBase(BaseModel):
@@ -27,6 +29,25 @@ class GroupResponse(GroupBase):
     created_by: int
     created_at: datetime
     updated_at: datetime
+    member_count: int = 0
+    admin_count: int = 0
+
+class GroupLastMessage(BaseModel):
+    id: int
+    sender_id: int
+    sender_username: Optional[str] = None
+    content: Optional[str] = None
+    has_attachment: bool = False
+    file_type: Optional[str] = None
+    created_at: datetime
+
+class GroupOverviewResponse(BaseModel):
+    id: int
+    name: str
+    avatar_url: Optional[str] = None
+    member_count: int
+    unread_count: int
+    last_message: Optional[GroupLastMessage] = None
 
 class GroupMemberBase(BaseModel):
     class Config:
@@ -43,3 +64,23 @@ class GroupMemberResponse(GroupMemberBase):
 
 class GroupInvite(BaseModel):
     user_id: int
+
+class BulkMembers(BaseModel):
+    user_ids: List[int] = Field(..., min_length=1, max_length=settings.GROUP_BULK_MAX_USERS)
+
+class BulkRoleChange(BulkMembers):
+    role: GroupMemberRole
+
+class BulkMembershipStatus(str, Enum):
+    ADDED = "added"
+    ALREADY_MEMBER = "already_member"
+    REMOVED = "removed"
+    UPDATED = "updated"
+    UNCHANGED = "unchanged"
+    NOT_MEMBER = "not_member"
+    NOT_FOUND = "not_found"
+    SKIPPED = "skipped"
+
+class BulkMembershipResult(BaseModel):
+    user_id: int
+    status: BulkMembershipStatus
@@ -1,8 +1,9 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel, EmailStr, Field, validator
 
+from app.core.config import settings
 from app.models.user import UserRole
 
 class UserBase(BaseModel):
@@ -57,6 +58,18 @@ class UserResponse(UserBase):
     online_status: Optional[bool] = None
     last_seen: Optional[datetime] = None
 
+class StorageUsageResponse(BaseModel):
+    used_bytes: int
+    quota_bytes: int
+
+class PresenceQuery(BaseModel):
+    user_ids: List[int] = Field(..., max_length=settings.PRESENCE_QUERY_MAX_IDS)
+
+class PresenceResponse(BaseModel):
+    user_id: int
+    online_status: Optional[bool] = None
+    last_seen: Optional[datetime] = None
+
 class UserInDB(UserBase):
     id: int
     hashed_password: str
@@ -0,0 +1,375 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from fastapi import WebSocket
+
+from app.core.config import settings
+from app.core.events import event_bus
+from app.db.session import async_session
+from app.models.call import Call, CallStatus
+
+logger = logging.getLogger(__name__)
+
+
+class Timer:
+    __slots__ = ("slot", "rounds", "callback")
+
+    def __init__(self, slot: int, rounds: int, callback: Callable[[], None]):
+        self.slot = slot
+        self.rounds = rounds
+        self.callback = callback
+
+
+class TimerWheel:
+    """Hashed timing wheel driving many timeouts from one task.
+
+    Scheduling and cancelling are O(1) set operations, and each tick only
+    looks at the timers hashed into one slot, so thousands of ringing calls
+    cost one sleeping task instead of one per call. Timers fire up to one
+    tick late.
+    """
+
+    def __init__(self, tick_seconds: float, slots: int):
+        self.tick_seconds = tick_seconds
+        self._slots: List[Set[Timer]] = [set() for _ in range(slots)]
+        self._cursor = 0
+        self._task = None
+
+    def schedule(self, delay: float, callback: Callable[[], None]) -> Timer:
+        ticks = max(1, int(round(delay / self.tick_seconds)))
+        # The slot is first reached after ((ticks - 1) % slots) + 1 ticks; each round is a full revolution more
+        rounds = (ticks - 1) // len(self._slots)
+        timer = Timer((self._cursor + ticks) % len(self._slots), rounds, callback)
+        self._slots[timer.slot].add(timer)
+        return timer
+
+    def cancel(self, timer: Timer) -> None:
+        self._slots[timer.slot].discard(timer)
+
+    def __len__(self) -> int:
+        return sum(len(slot) for slot in self._slots)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        next_tick = time.monotonic()
+        while True:
+            next_tick += self.tick_seconds
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+            self._advance()
+
+    def _advance(self) -> None:
+        self._cursor = (self._cursor + 1) % len(self._slots)
+        slot = self._slots[self._cursor]
+        for timer in list(slot):
+            if timer.rounds > 0:
+                timer.rounds -= 1
+                continue
+            slot.discard(timer)
+            try:
+                timer.callback()
+            except Exception as e:
+                logger.error("Timer callback failed: %s", e)
+
+
+class CallSession:
+    """In-memory state of a live call."""
+
+    __slots__ = (
+        "id", "caller_id", "receiver_id", "status",
+        "started_at", "answered_at", "ended_at", "duration_seconds", "quality_score", "ring_timer"
+    )
+
+    def __init__(self, call: Call):
+        self.id = call.id
+        self.caller_id = call.caller_id
+        self.receiver_id = call.receiver_id
+        self.status = CallStatus.INITIATED
+        self.started_at = call.started_at
+        self.answered_at: Optional[datetime] = None
+        self.ended_at: Optional[datetime] = None
+        self.duration_seconds: Optional[int] = None
+        self.quality_score: Optional[int] = None
+        self.ring_timer: Optional[Timer] = None
+
+    def other_party(self, user_id: int) -> int:
+        return self.receiver_id if user_id == self.caller_id else self.caller_id
+
+
+class CallSignaling:
+    """Call signaling over the user WebSocket, with the call state in memory.
+
+    The worker that initiated a call owns its state machine. Frames for a
+    call owned by another worker, and frames for a user connected to
+    another worker, travel over the event bus. While a call rings or runs
+    only the answer is written to the database, so a call whose worker goes
+    away can still be completed over REST; its final state (declined,
+    missed or completed, with timings) is persisted once when it ends.
+
+    Client frames carry a ``call_id``:
+
+    - ``call_offer`` / ``call_answer`` with an ``sdp``; the answer accepts
+    - ``call_ice_candidate`` with a ``candidate``, relayed to the other party
+    - ``call_decline`` (receiver, while ringing) and ``call_hangup`` (either,
+      optionally with a ``quality_score`` once the call was answered)
+    """
+
+    FRAME_TYPES = frozenset({"call_offer", "call_answer", "call_ice_candidate", "call_decline", "call_hangup"})
+    STATUS_FRAMES = {
+        CallStatus.ACCEPTED: "call_answer",
+        CallStatus.DECLINED: "call_decline",
+        CallStatus.COMPLETED: "call_hangup",
+    }
+
+    def __init__(self):
+        self._calls: Dict[int, CallSession] = {}
+        self._user_calls: Dict[int, Set[int]] = {}
+        self._connections: Dict[int, WebSocket] = {}
+        self._wheel = TimerWheel(settings.CALL_TIMER_TICK_SECONDS, settings.CALL_TIMER_WHEEL_SLOTS)
+        self._tasks: Set[asyncio.Task] = set()
+        self._metrics = {"calls": 0, "answered": 0, "declined": 0, "missed": 0, "completed": 0, "relayed": 0}
+
+        event_bus.subscribe("call_frame", self._on_call_frame)
+        event_bus.subscribe("call_signal", self._on_call_signal)
+        event_bus.subscribe("call_user_disconnected", self._on_user_disconnected)
+
+    def bind(self, connections: Dict[int, WebSocket]) -> None:
+        """Use the connection manager's sockets for delivery."""
+        self._connections = connections
+
+    def get(self, call_id: int) -> Optional[CallSession]:
+        return self._calls.get(call_id)
+
+    async def ring(self, call: Call, caller_name: str, receiver_online: bool) -> CallSession:
+        """Start ringing a newly created call."""
+        session = CallSession(call)
+        self._calls[session.id] = session
+        self._user_calls.setdefault(session.caller_id, set()).add(session.id)
+        self._user_calls.setdefault(session.receiver_id, set()).add(session.id)
+        self._metrics["calls"] += 1
+
+        if not receiver_online:
+            await self._finish(session, CallStatus.MISSED)
+            return session
+
+        session.ring_timer = self._wheel.schedule(
+            settings.CALL_RING_TIMEOUT_SECONDS,
+            lambda: self._track(self._ring_timed_out(session.id), f"call:ring_timeout:{session.id}")
+        )
+        await self._deliver(session.receiver_id, {
+            "type": "incoming_call",
+            "call": {
+                "id": session.id,
+                "caller_id": session.caller_id,
+                "caller_name": caller_name,
+                "started_at": session.started_at.isoformat()
+            }
+        })
+        return session
+
+    async def handle_frame(self, user_id: int, frame: Dict[str, Any]) -> None:
+        """Handle a call frame received on a user's WebSocket."""
+        call_id = frame.get("call_id")
+        if call_id in self._calls:
+            await self._process(user_id, frame)
+        elif call_id is not None:
+            await event_bus.publish("call_frame", {"user_id": user_id, "frame": frame})
+
+    async def apply(
+        self,
+        session: CallSession,
+        user_id: int,
+        status: CallStatus,
+        quality_score: Optional[int] = None
+    ) -> CallSession:
+        """Apply a status change requested over REST to a call owned here."""
+        if status == CallStatus.COMPLETED and quality_score is not None:
+            # Written with the final state
+            session.quality_score = quality_score
+        return await self._transition(session, user_id, self.STATUS_FRAMES.get(status))
+
+    async def user_disconnected(self, user_id: int) -> None:
+        """End a user's calls when their last socket goes away."""
+        await self._end_user_calls(user_id)
+        await event_bus.publish("call_user_disconnected", {"user_id": user_id})
+
+    def start(self) -> None:
+        self._wheel.start()
+
+    async def stop(self) -> None:
+        await self._wheel.stop()
+        for session in list(self._calls.values()):
+            status = CallStatus.COMPLETED if session.status == CallStatus.ACCEPTED else CallStatus.MISSED
+            await self._finish(session, status)
+        if self._tasks:
+            await asyncio.wait(list(self._tasks), timeout=settings.CALL_PERSIST_SHUTDOWN_TIMEOUT_SECONDS)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._metrics,
+            "ringing": sum(1 for s in self._calls.values() if s.status == CallStatus.INITIATED),
+            "active": sum(1 for s in self._calls.values() if s.status == CallStatus.ACCEPTED),
+            "timers": len(self._wheel),
+        }
+
+    async def _process(self, user_id: int, frame: Dict[str, Any]) -> None:
+        session = self._calls.get(frame.get("call_id"))
+        if session is None or user_id not in (session.caller_id, session.receiver_id):
+            return
+
+        frame_type = frame.get("type")
+        if frame_type in ("call_offer", "call_ice_candidate"):
+            self._metrics["relayed"] += 1
+            relayed = {key: value for key, value in frame.items() if key in ("type", "call_id", "sdp", "candidate")}
+            await self._deliver(session.other_party(user_id), {**relayed, "from_user_id": user_id})
+            return
+
+        quality_score = frame.get("quality_score")
+        if frame_type == "call_hangup" and session.status == CallStatus.ACCEPTED and isinstance(quality_score, int):
+            session.quality_score = quality_score
+
+        if (
+            frame_type == "call_answer"
+            and frame.get("sdp") is not None
+            and user_id == session.receiver_id
+            and session.status == CallStatus.INITIATED
+        ):
+            await self._deliver(session.caller_id, {
+                "type": "call_answer",
+                "call_id": session.id,
+                "sdp": frame["sdp"],
+                "from_user_id": user_id
+            })
+        await self._transition(session, user_id, frame_type)
+
+    async def _transition(self, session: CallSession, user_id: int, frame_type: Optional[str]) -> CallSession:
+        if session.status == CallStatus.INITIATED:
+            if frame_type == "call_answer" and user_id == session.receiver_id:
+                self._wheel.cancel(session.ring_timer)
+                session.status = CallStatus.ACCEPTED
+                session.answered_at = datetime.utcnow()
+                self._metrics["answered"] += 1
+                self._track(self._persist_answer(session), f"call:persist_answer:{session.id}")
+                await self._notify_status(session)
+            elif frame_type == "call_decline" and user_id == session.receiver_id:
+                await self._finish(session, CallStatus.DECLINED)
+            elif frame_type == "call_hangup":
+                # The receiver hanging up a ringing call declines it; the caller giving up misses it
+                await self._finish(session, CallStatus.DECLINED if user_id == session.receiver_id else CallStatus.MISSED)
+        elif session.status == CallStatus.ACCEPTED and frame_type == "call_hangup":
+            await self._finish(session, CallStatus.COMPLETED)
+        return session
+
+    async def _ring_timed_out(self, call_id: int) -> None:
+        session = self._calls.get(call_id)
+        if session is not None and session.status == CallStatus.INITIATED:
+            await self._finish(session, CallStatus.MISSED)
+
+    async def _end_user_calls(self, user_id: int) -> None:
+        for call_id in list(self._user_calls.get(user_id, ())):
+            session = self._calls.get(call_id)
+            if session is not None:
+                status = CallStatus.COMPLETED if session.status == CallStatus.ACCEPTED else CallStatus.MISSED
+                await self._finish(session, status)
+
+    async def _finish(self, session: CallSession, status: CallStatus) -> None:
+        if self._calls.pop(session.id, None) is None:
+            return
+        if session.ring_timer is not None:
+            self._wheel.cancel(session.ring_timer)
+        for user_id in (session.caller_id, session.receiver_id):
+            calls = self._user_calls.get(user_id)
+            if calls is not None:
+                calls.discard(session.id)
+                if not calls:
+                    del self._user_calls[user_id]
+
+        session.status = status
+        session.ended_at = datetime.utcnow()
+        self._metrics[status.value] += 1
+        if session.answered_at is not None:
+            session.duration_seconds = int((session.ended_at - session.answered_at).total_seconds())
+
+        self._track(self._persist(session), f"call:persist:{session.id}")
+
+        await self._notify_status(session)
+
+    def _track(self, coroutine, name: str) -> None:
+        """Run a coroutine in the background, keeping a reference until it ends."""
+        task = asyncio.create_task(coroutine, name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Call task %s failed", task.get_name(), exc_info=task.exception())
+
+    async def _persist_answer(self, session: CallSession) -> None:
+        try:
+            async with async_session() as db:
+                await Call.accept(db, session.id, session.answered_at)
+        except Exception as e:
+            logger.error("Could not persist answer of call %s: %s", session.id, e)
+
+    async def _persist(self, session: CallSession) -> None:
+        try:
+            async with async_session() as db:
+                call = await Call.finish(
+                    db,
+                    session.id,
+                    session.status,
+                    session.ended_at,
+                    answered_at=session.answered_at,
+                    duration_seconds=session.duration_seconds,
+                    quality_score=session.quality_score
+                )
+            if call is None:
+                logger.warning("Call %s had already ended; final state not written", session.id)
+        except Exception as e:
+            logger.error("Could not persist final state of call %s: %s", session.id, e)
+
+    async def _notify_status(self, session: CallSession) -> None:
+        data = {"type": "call_status_updated", "call": {"id": session.id, "status": session.status.value}}
+        await self._deliver(session.caller_id, data)
+        await self._deliver(session.receiver_id, data)
+
+    async def _deliver(self, user_id: int, data: Dict[str, Any]) -> None:
+        websocket = self._connections.get(user_id)
+        if websocket is None:
+            await event_bus.publish("call_signal", {"user_id": user_id, "data": data})
+            return
+        try:
+            await websocket.send_json(data)
+        except Exception as e:
+            logger.warning("Could not deliver call signal to user %s: %s", user_id, e)
+
+    def _on_call_frame(self, data: Dict[str, Any]) -> None:
+        if data["frame"].get("call_id") in self._calls:
+            self._track(self._process(data["user_id"], data["frame"]), f"call:frame:{data['frame']['call_id']}")
+
+    def _on_call_signal(self, data: Dict[str, Any]) -> None:
+        websocket = self._connections.get(data["user_id"])
+        if websocket is not None:
+            self._track(websocket.send_json(data["data"]), f"call:signal:{data['user_id']}")
+
+    def _on_user_disconnected(self, data: Dict[str, Any]) -> None:
+        if data["user_id"] in self._user_calls:
+            self._track(self._end_user_calls(data["user_id"]), f"call:user_disconnected:{data['user_id']}")
+
+
+call_signaling = CallSignaling()
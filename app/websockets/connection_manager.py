@@ -2,14 +2,19 @@ import json
 import asyncio
 from typing import Dict, List, Set
 
-from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, Query
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.dependencies import get_db
+from app.core.dependencies import get_current_user, get_db
+from app.core.membership_cache import membership_cache
 from app.models.user import User
-from app.models.group import GroupMember
 from app.models.group import Group
 from app.models.message import Message
+from app.websockets.call_signaling import call_signaling
+from app.websockets.fanout import fanout_engine
+from app.websockets.flood_control import FloodControl
+from app.websockets.live_stats import live_stats
+from app.websockets.presence import presence
 
 router = APIRouter()
 
@@ -26,6 +31,8 @@ class ConnectionManager:
         await websocket.accept()
         self.active_connections[user_id] = websocket
         self.subscriptions[user_id] = set()
+        live_stats.connection_opened()
+        await presence.connected(user_id)
         
         # Notify friends that user is online
         await self.broadcast_status(user_id, True)
@@ -48,6 +55,8 @@ class ConnectionManager:
                 members.remove(user_id)
         
         # Notify friends that user is offline
+        asyncio.create_task(presence.disconnected(user_id))
+        asyncio.create_task(call_signaling.user_disconnected(user_id))
         asyncio.create_task(self.broadcast_status(user_id, False))
     
     def is_user_connected(self, user_id: int) -> bool:
@@ -149,17 +158,33 @@ class ConnectionManager:
                         await self.active_connections[user_id].send_json(data)
 
 connection_manager = ConnectionManager()
+call_signaling.bind(connection_manager.active_connections)
+fanout_engine.bind(connection_manager.active_connections)
+live_stats.bind(connection_manager)
+
+async def authenticate_websocket(websocket: WebSocket, token: str, user_id: int, db: AsyncSession):
+    """Check the token belongs to the user the socket claims to be, closing it if not."""
+    try:
+        user = await get_current_user(token, db)
+    except HTTPException:
+        await websocket.close(code=4001)
+        return None
+    
+    if user.id != user_id or not user.is_active:
+        await websocket.close(code=4003)
+        return None
+    return user
 
 @router.websocket("/ws/{user_id}")
 async def websocket_endpoint(
     websocket: WebSocket,
     user_id: int,
+    token: str = Query(...),
     db: AsyncSession = Depends(get_db)
 ):
-    # Verify user exists
-    user = await User.get_by_id(db, user_id)
+    # Verify the token belongs to this user; calls, SDP and ICE are delivered here
+    user = await authenticate_websocket(websocket, token, user_id, db)
     if not user:
-        await websocket.close(code=4004)
         return
     
     # Accept connection
@@ -168,10 +193,24 @@ async def websocket_endpoint(
     # Update user's last seen
     await User.update_last_seen(db, user_id)
     
+    flood_control = FloodControl()
+    
     try:
         while True:
             data = await websocket.receive_json()
             
+            # Drop frames over their event type's rate limit
+            if not flood_control.allow(data.get("type")):
+                if flood_control.exhausted:
+                    await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+                    raise WebSocketDisconnect(code=status.WS_1008_POLICY_VIOLATION)
+                await websocket.send_json({
+                    "type": "error",
+                    "detail": "Rate limit exceeded",
+                    "event": data.get("type")
+                })
+                continue
+            
             # Handle different message types
             if data["type"] == "subscribe":
                 target_id = data.get("user_id")
@@ -193,7 +232,7 @@ async def websocket_endpoint(
                 group_id = data.get("group_id")
                 if group_id:
                     # Verify user is a member of the group
-                    is_member = await GroupMember.is_member(db, group_id, user_id)
+                    is_member = await membership_cache.is_member(db, group_id, user_id)
                     if is_member:
                         await connection_manager.join_group(user_id, group_id)
             
@@ -202,6 +241,10 @@ async def websocket_endpoint(
                 if group_id:
                     await connection_manager.leave_group(user_id, group_id)
             
+            # Call offers, answers, ICE candidates and hangups
+            elif data["type"] in call_signaling.FRAME_TYPES:
+                await call_signaling.handle_frame(user_id, data)
+            
             # Heartbeat to keep connection alive
             elif data["type"] == "ping":
                 await websocket.send_json({"type": "pong"})
@@ -220,13 +263,13 @@ async def group_websocket_endpoint(
     websocket: WebSocket,
     group_id: int,
     user_id: int = Query(...),
+    token: str = Query(...),
     db: AsyncSession = Depends(get_db)
 ):
     """WebSocket endpoint for group chats."""
-    # Verify user exists
-    user = await User.get_by_id(db, user_id)
+    # Verify the token belongs to this user
+    user = await authenticate_websocket(websocket, token, user_id, db)
     if not user:
-        await websocket.close(code=4004)
         return
     
     # Verify group exists
@@ -236,7 +279,7 @@ async def group_websocket_endpoint(
         return
     
     # Verify user is a member of the group
-    is_member = await GroupMember.is_member(db, group_id, user_id)
+    is_member = await membership_cache.is_member(db, group_id, user_id)
     if not is_member:
         await websocket.close(code=4003)
         return
@@ -261,10 +304,24 @@ async def group_websocket_endpoint(
         exclude_user_id=user_id
     )
     
+    flood_control = FloodControl()
+    
     try:
         while True:
             data = await websocket.receive_json()
             
+            # Drop frames over their event type's rate limit
+            if not flood_control.allow(data.get("type")):
+                if flood_control.exhausted:
+                    await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+                    raise WebSocketDisconnect(code=status.WS_1008_POLICY_VIOLATION)
+                await websocket.send_json({
+                    "type": "error",
+                    "detail": "Rate limit exceeded",
+                    "event": data.get("type")
+                })
+                continue
+            
             # Handle different message types
             if data["type"] == "group_message":
                 content = data.get("content")
@@ -277,10 +334,12 @@ async def group_websocket_endpoint(
                         content=content,
                         receiver_id=None
                     )
+                    live_stats.message_sent(group=True)
                     
-                    # Broadcast to all group members
-                    await connection_manager.broadcast_to_group(
-                        group_id,
+                    # Fan out to all online group members, the sender included
+                    member_ids = await membership_cache.member_ids(db, group_id)
+                    fanout_engine.dispatch(
+                        member_ids,
                         {
                             "type": "new_group_message",
                             "message": {
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from fastapi import WebSocket
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class FanoutEngine:
+    """Deliver one event to many connected users in the background.
+
+    Recipients are intersected with the live connections first, so offline
+    members cost nothing. The event is serialized once, and the remaining
+    sockets are split into shards sent concurrently, with at most
+    ``FANOUT_MAX_CONCURRENT_SHARDS`` shards in flight across all fan-outs.
+    A socket that does not accept the frame within
+    ``FANOUT_SEND_TIMEOUT_SECONDS`` is skipped so one slow client cannot
+    hold up the rest.
+    """
+
+    def __init__(self):
+        self._connections: Dict[int, WebSocket] = {}
+        self._shard_slots = asyncio.Semaphore(settings.FANOUT_MAX_CONCURRENT_SHARDS)
+        self._tasks: Set[asyncio.Task] = set()
+        self._metrics = {
+            "fanouts": 0,
+            "recipients": 0,
+            "delivered": 0,
+            "failed": 0,
+            "errors": 0,  # Fan-outs that raised
+            "duration_seconds_total": 0.0,
+            "duration_seconds_max": 0.0,
+            "last_recipients_per_second": 0.0,
+        }
+
+    def bind(self, connections: Dict[int, WebSocket]) -> None:
+        """Use the connection manager's sockets for delivery."""
+        self._connections = connections
+
+    def dispatch(self, recipient_ids: Iterable[int], data: Dict[str, Any], exclude_user_id: Optional[int] = None) -> None:
+        """Schedule delivery of an event; returns without waiting for it."""
+        task = asyncio.create_task(
+            self.deliver(recipient_ids, data, exclude_user_id),
+            name=f"fanout:{data.get('type')}"
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+
+    async def deliver(self, recipient_ids: Iterable[int], data: Dict[str, Any], exclude_user_id: Optional[int] = None) -> int:
+        """Send an event to every connected recipient, returning how many received it."""
+        started_at = time.perf_counter()
+        online = self._connections.keys() & set(recipient_ids)
+        online.discard(exclude_user_id)
+        sockets = [self._connections[user_id] for user_id in online if user_id in self._connections]
+
+        text = json.dumps(data)
+        size = settings.FANOUT_SHARD_SIZE
+        results = await asyncio.gather(*(
+            self._send_shard(sockets[start:start + size], text)
+            for start in range(0, len(sockets), size)
+        ))
+        delivered = sum(results)
+
+        elapsed = time.perf_counter() - started_at
+        self._metrics["fanouts"] += 1
+        self._metrics["recipients"] += len(sockets)
+        self._metrics["delivered"] += delivered
+        self._metrics["failed"] += len(sockets) - delivered
+        self._metrics["duration_seconds_total"] += elapsed
+        self._metrics["duration_seconds_max"] = max(self._metrics["duration_seconds_max"], elapsed)
+        if sockets and elapsed > 0:
+            self._metrics["last_recipients_per_second"] = len(sockets) / elapsed
+        return delivered
+
+    async def stop(self) -> None:
+        """Wait for in-flight fan-outs, up to FANOUT_SHUTDOWN_TIMEOUT_SECONDS."""
+        if not self._tasks:
+            return
+        _, pending = await asyncio.wait(list(self._tasks), timeout=settings.FANOUT_SHUTDOWN_TIMEOUT_SECONDS)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning("Cancelled %d unfinished fan-outs at shutdown", len(pending))
+
+    def stats(self) -> Dict[str, Any]:
+        fanouts = self._metrics["fanouts"]
+        return {
+            **self._metrics,
+            "in_flight": len(self._tasks),
+            "avg_duration_seconds": self._metrics["duration_seconds_total"] / fanouts if fanouts else 0.0,
+        }
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self._metrics["errors"] += 1
+            logger.error("Fan-out %s failed", task.get_name(), exc_info=task.exception())
+
+    async def _send_shard(self, sockets: List[WebSocket], text: str) -> int:
+        delivered = 0
+        async with self._shard_slots:
+            for websocket in sockets:
+                try:
+                    async with asyncio.timeout(settings.FANOUT_SEND_TIMEOUT_SECONDS):
+                        await websocket.send_text(text)
+                    delivered += 1
+                except Exception:
+                    # Timed out or closed; the socket's own receive loop cleans up
+                    pass
+        return delivered
+
+
+fanout_engine = FanoutEngine()
@@ -0,0 +1,82 @@
+import time
+from collections import defaultdict
+from typing import Dict, Tuple
+
+from app.core.config import settings
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, up to ``capacity``."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def consume(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class FloodMetrics:
+    """Process-wide counters of accepted and dropped WebSocket frames."""
+
+    def __init__(self):
+        self.accepted: Dict[str, int] = defaultdict(int)
+        self.dropped: Dict[str, int] = defaultdict(int)
+        self.disconnects = 0
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "accepted": dict(self.accepted),
+            "dropped": dict(self.dropped),
+            "disconnects": self.disconnects,
+        }
+
+
+flood_metrics = FloodMetrics()
+
+
+class FloodControl:
+    """Per-connection flood control with one token bucket per event type.
+
+    Frames over their bucket's rate are dropped. Each drop also spends a token
+    from a violation bucket; a client that keeps violating drains it and
+    ``exhausted`` turns True, at which point the connection should be closed.
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[float, int]] = None):
+        self._limits = limits or settings.WS_EVENT_RATE_LIMITS
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._violations = TokenBucket(
+            settings.WS_FLOOD_MAX_VIOLATIONS / settings.WS_FLOOD_VIOLATION_WINDOW_SECONDS,
+            settings.WS_FLOOD_MAX_VIOLATIONS,
+        )
+        self.exhausted = False
+
+    def allow(self, event_type: str) -> bool:
+        """Check a frame against its event type's bucket."""
+        if event_type not in self._limits:
+            event_type = "default"
+
+        bucket = self._buckets.get(event_type)
+        if bucket is None:
+            bucket = self._buckets[event_type] = TokenBucket(*self._limits[event_type])
+
+        if bucket.consume():
+            flood_metrics.accepted[event_type] += 1
+            return True
+
+        flood_metrics.dropped[event_type] += 1
+        if not self.exhausted and not self._violations.consume():
+            self.exhausted = True
+            flood_metrics.disconnects += 1
+        return False
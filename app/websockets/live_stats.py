@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List
+
+from app.core.config import settings
+from app.core.events import event_bus
+from app.websockets.presence import presence
+
+logger = logging.getLogger(__name__)
+
+
+class SlidingWindowRate:
+    """Events per second over the last few seconds, in one-second buckets."""
+
+    __slots__ = ("window", "_counts", "_seconds", "total")
+
+    def __init__(self, window: int):
+        self.window = window
+        self._counts = [0] * window
+        self._seconds = [0] * window
+        self.total = 0
+
+    def add(self, count: int = 1) -> None:
+        second = int(time.monotonic())
+        index = second % self.window
+        if self._seconds[index] != second:
+            self._seconds[index] = second
+            self._counts[index] = 0
+        self._counts[index] += count
+        self.total += count
+
+    def rate(self, seconds: int) -> float:
+        """Average rate over the last ``seconds`` complete seconds."""
+        now = int(time.monotonic())
+        events = sum(
+            count for count, second in zip(self._counts, self._seconds)
+            if now - seconds <= second < now
+        )
+        return events / seconds
+
+
+class LiveStats:
+    """Operational counters for the admin dashboard, summed over all workers.
+
+    Socket gauges are read from the connection manager and event rates are
+    counted in sliding windows as messages are sent. Once per
+    ``LIVE_STATS_INTERVAL_SECONDS`` each worker builds its own snapshot and
+    publishes it on the event bus; the cluster-wide view is then summed
+    from the latest snapshot of every worker heard from recently. Reading it
+    costs no database queries, and the view is rebuilt once per interval
+    however many admins are watching.
+    """
+
+    RATES = ("messages_sent", "group_messages_sent", "connections_opened")
+    RATE_WINDOWS = (1, 10, 60)
+
+    def __init__(self):
+        self.worker_id = event_bus.instance_id
+        self._rates = {name: SlidingWindowRate(max(self.RATE_WINDOWS) + 1) for name in self.RATES}
+        self._manager = None
+        self._remote: Dict[str, Dict[str, Any]] = {}
+        self._heard_from: Dict[str, float] = {}
+        self._snapshot: Dict[str, Any] = {}
+        self._task = None
+
+        event_bus.subscribe("live_stats", self._on_live_stats)
+
+    def bind(self, manager) -> None:
+        """Read socket gauges from the connection manager."""
+        self._manager = manager
+
+    def message_sent(self, group: bool = False) -> None:
+        self._rates["group_messages_sent" if group else "messages_sent"].add()
+
+    def connection_opened(self) -> None:
+        self._rates["connections_opened"].add()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The cluster-wide view as of the last interval."""
+        return self._snapshot or self._aggregate(self._local())
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.LIVE_STATS_INTERVAL_SECONDS)
+            local = self._local()
+            self._expire_silent_workers()
+            self._snapshot = self._aggregate(local)
+            try:
+                await event_bus.publish("live_stats", {"worker": self.worker_id, "stats": local})
+            except Exception as e:
+                logger.error("Could not publish live stats: %s", e)
+
+    def _local(self) -> Dict[str, Any]:
+        """This worker's gauges and rates."""
+        stats: Dict[str, Any] = {"user_sockets": 0, "group_sockets": 0, "groups_with_sockets": 0}
+        if self._manager is not None:
+            group_sockets = [len(users) for users in self._manager.group_connections.values() if users]
+            stats["user_sockets"] = len(self._manager.active_connections)
+            stats["group_sockets"] = sum(group_sockets)
+            stats["groups_with_sockets"] = len(group_sockets)
+        for name, rate in self._rates.items():
+            stats[f"{name}_total"] = rate.total
+            for seconds in self.RATE_WINDOWS:
+                stats[f"{name}_per_second_{seconds}s"] = rate.rate(seconds)
+        return stats
+
+    def _aggregate(self, local: Dict[str, Any]) -> Dict[str, Any]:
+        workers: List[Dict[str, Any]] = [local, *self._remote.values()]
+        totals = {key: sum(stats.get(key, 0) for stats in workers) for key in local}
+        return {
+            "workers": len(workers),
+            "users_online": presence.online_count(),
+            **totals,
+            "generated_at": time.time(),
+        }
+
+    def _expire_silent_workers(self) -> None:
+        deadline = time.monotonic() - settings.LIVE_STATS_WORKER_TIMEOUT_SECONDS
+        for worker in [w for w, heard_at in self._heard_from.items() if heard_at < deadline]:
+            del self._heard_from[worker]
+            self._remote.pop(worker, None)
+
+    def _on_live_stats(self, data: Dict[str, Any]) -> None:
+        if data["worker"] == self.worker_id:
+            return
+        self._remote[data["worker"]] = data["stats"]
+        self._heard_from[data["worker"]] = time.monotonic()
+
+
+live_stats = LiveStats()
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Set
+
+from app.core.config import settings
+from app.core.events import event_bus
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceRegistry:
+    """Which users hold a live WebSocket connection, on this or any worker.
+
+    Local connections are tracked directly by the connection manager. Other
+    workers' connections arrive over the event bus: each connect and
+    disconnect is announced, and full snapshots are exchanged when a worker
+    starts or its listener reconnects. Workers also send a heartbeat, and
+    the users of a worker that has gone silent (crashed, partitioned) are
+    forgotten after ``PRESENCE_WORKER_TIMEOUT_SECONDS``.
+    """
+
+    def __init__(self):
+        self.worker_id = event_bus.instance_id
+        self._local: Set[int] = set()
+        self._remote: Dict[str, Set[int]] = {}
+        self._heard_from: Dict[str, float] = {}
+        self._task = None
+
+        event_bus.subscribe("presence_changed", self._on_presence_changed)
+        event_bus.subscribe("presence_snapshot", self._on_presence_snapshot)
+        event_bus.subscribe("presence_heartbeat", self._on_presence_heartbeat)
+        event_bus.subscribe("presence_sync_requested", self._on_sync_requested)
+        event_bus.subscribe("reconnected", self._on_reconnected)
+
+    def is_online(self, user_id: int) -> bool:
+        """Check if a user is connected to any worker."""
+        if user_id in self._local:
+            return True
+        return any(user_id in users for users in self._remote.values())
+
+    def online_count(self) -> int:
+        """Count the distinct users connected to any worker."""
+        return len(self._local.union(*self._remote.values()))
+
+    def online(self, user_ids: Iterable[int]) -> List[int]:
+        """Filter user ids down to the ones that are connected."""
+        return [user_id for user_id in user_ids if self.is_online(user_id)]
+
+    async def connected(self, user_id: int) -> None:
+        self._local.add(user_id)
+        await self._publish_change(user_id, True)
+
+    async def disconnected(self, user_id: int) -> None:
+        self._local.discard(user_id)
+        await self._publish_change(user_id, False)
+
+    async def start(self) -> None:
+        await event_bus.publish("presence_sync_requested", {"worker": self.worker_id})
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Tell the other workers this worker's users are gone
+        await event_bus.publish("presence_snapshot", {"worker": self.worker_id, "reset": True, "user_ids": []})
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "local_users": len(self._local),
+            "remote_workers": len(self._remote),
+            "remote_users": sum(len(users) for users in self._remote.values()),
+        }
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.PRESENCE_HEARTBEAT_SECONDS)
+            self._expire_silent_workers()
+            try:
+                await event_bus.publish("presence_heartbeat", {"worker": self.worker_id})
+            except Exception as e:
+                logger.error("Could not send presence heartbeat: %s", e)
+
+    async def _publish_change(self, user_id: int, online: bool) -> None:
+        await event_bus.publish("presence_changed", {
+            "worker": self.worker_id,
+            "user_id": user_id,
+            "online": online
+        })
+
+    async def _announce(self) -> None:
+        """Send this worker's connected users to the other workers."""
+        user_ids = sorted(self._local)
+        size = settings.PRESENCE_SNAPSHOT_CHUNK_SIZE
+        for start in range(0, max(len(user_ids), 1), size):
+            await event_bus.publish("presence_snapshot", {
+                "worker": self.worker_id,
+                "reset": start == 0,
+                "user_ids": user_ids[start:start + size]
+            })
+
+    def _expire_silent_workers(self) -> None:
+        deadline = time.monotonic() - settings.PRESENCE_WORKER_TIMEOUT_SECONDS
+        for worker in [w for w, heard_at in self._heard_from.items() if heard_at < deadline]:
+            del self._heard_from[worker]
+            self._remote.pop(worker, None)
+
+    def _remote_users(self, data: Dict[str, Any]) -> Set[int]:
+        worker = data["worker"]
+        self._heard_from[worker] = time.monotonic()
+        return self._remote.setdefault(worker, set())
+
+    def _on_presence_changed(self, data: Dict[str, Any]) -> None:
+        if data["worker"] == self.worker_id:
+            return
+        users = self._remote_users(data)
+        if data["online"]:
+            users.add(data["user_id"])
+        else:
+            users.discard(data["user_id"])
+
+    def _on_presence_snapshot(self, data: Dict[str, Any]) -> None:
+        if data["worker"] == self.worker_id:
+            return
+        users = self._remote_users(data)
+        if data["reset"]:
+            users.clear()
+        users.update(data["user_ids"])
+
+    def _on_presence_heartbeat(self, data: Dict[str, Any]) -> None:
+        if data["worker"] != self.worker_id:
+            self._remote_users(data)
+
+    def _on_sync_requested(self, data: Dict[str, Any]) -> None:
+        if data["worker"] != self.worker_id:
+            asyncio.create_task(self._announce())
+
+    def _on_reconnected(self, data: Dict[str, Any]) -> None:
+        # Changes may have been missed in either direction while disconnected
+        self._remote.clear()
+        self._heard_from.clear()
+        asyncio.create_task(self._resync())
+
+    async def _resync(self) -> None:
+        await self._announce()
+        await event_bus.publish("presence_sync_requested", {"worker": self.worker_id})
+
+
+presence = PresenceRegistry()
@@ -0,0 +1,40 @@
+import asyncio
+import os
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.db import session as db_session
+from app.db.base import Base
+from app.main import app  # noqa: F401  Registers every model's table
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@pytest.fixture
+def database():
+    """Session factory on a fresh schema in the ``TEST_DATABASE_URL`` database.
+
+    The app's primary session is pointed at the same database for the test.
+    Every table is dropped and recreated first, so never point it at data
+    that matters. Tests that take this fixture are skipped when it is not set.
+    """
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+
+    # No pooling, so each test's event loop opens its own connections
+    engine = create_async_engine(TEST_DATABASE_URL, poolclass=NullPool)
+
+    async def reset_schema():
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.drop_all)
+            await connection.run_sync(Base.metadata.create_all)
+
+    asyncio.run(reset_schema())
+    db_session.async_session.configure(bind=engine)
+    try:
+        yield db_session.async_session
+    finally:
+        db_session.async_session.configure(bind=db_session.engine)
+        asyncio.run(engine.dispose())
@@ -0,0 +1,99 @@
+import asyncio
+from datetime import datetime
+
+from fastapi import HTTPException
+
+from app.api.routes.calls import update_call_status
+from app.models.call import Call, CallStatus
+from app.models.user import User
+from app.schemas.call import CallUpdate
+from app.websockets.call_signaling import TimerWheel, call_signaling
+
+
+def ticks_until_fired(wheel: TimerWheel, delay_ticks: int) -> int:
+    fired = []
+    wheel.schedule(delay_ticks * wheel.tick_seconds, lambda: fired.append(True))
+    for tick in range(1, delay_ticks * 3 + 1):
+        wheel._advance()
+        if fired:
+            return tick
+    return -1
+
+
+def test_timer_fires_after_its_delay():
+    for delay_ticks in (1, 3, 7, 8, 9):
+        assert ticks_until_fired(TimerWheel(0.5, 8), delay_ticks) == delay_ticks
+
+
+def test_timer_delay_that_is_a_multiple_of_the_wheel_size():
+    for delay_ticks in (8, 16, 24):
+        assert ticks_until_fired(TimerWheel(0.5, 8), delay_ticks) == delay_ticks
+
+
+def test_timer_fires_after_its_delay_from_any_cursor_position():
+    wheel = TimerWheel(0.5, 8)
+    for _ in range(5):
+        wheel._advance()
+    assert ticks_until_fired(wheel, 16) == 16
+
+
+def test_cancelled_timer_never_fires():
+    wheel = TimerWheel(0.5, 8)
+    fired = []
+    timer = wheel.schedule(2.0, lambda: fired.append(True))
+    wheel.cancel(timer)
+    for _ in range(20):
+        wheel._advance()
+    assert not fired
+    assert len(wheel) == 0
+
+
+async def ringing_call(database):
+    async with database() as db:
+        caller = await User.create(db, email="caller@example.com", username="caller", hashed_password="x", is_active=True)
+        receiver = await User.create(db, email="receiver@example.com", username="receiver", hashed_password="x", is_active=True)
+        call = await Call.create(db, caller_id=caller.id, receiver_id=receiver.id, status=CallStatus.INITIATED)
+    return caller, receiver, call
+
+
+def test_accept_and_decline_writes_race_for_one_ringing_call(database):
+    async def scenario():
+        _, _, call = await ringing_call(database)
+        async with database() as accepting, database() as declining:
+            results = await asyncio.gather(
+                Call.accept(accepting, call.id, datetime.utcnow()),
+                Call.finish(declining, call.id, CallStatus.DECLINED, datetime.utcnow()),
+            )
+
+        winners = [result for result in results if result is not None]
+        assert len(winners) == 1
+        async with database() as db:
+            assert (await Call.get_by_id(db, call.id)).status == winners[0].status
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_accept_and_decline_requests_conflict(database):
+    async def scenario():
+        caller, receiver, call = await ringing_call(database)
+        await call_signaling.ring(call, caller.username, receiver_online=True)
+        try:
+            async with database() as accepting, database() as declining:
+                results = await asyncio.gather(
+                    update_call_status(call.id, CallUpdate(status=CallStatus.ACCEPTED), receiver, accepting),
+                    update_call_status(call.id, CallUpdate(status=CallStatus.DECLINED), receiver, declining),
+                    return_exceptions=True,
+                )
+
+            conflicts = [result for result in results if isinstance(result, HTTPException)]
+            assert [conflict.status_code for conflict in conflicts] == [409]
+            winner = next(result for result in results if not isinstance(result, HTTPException))
+
+            # Only the winner's transition is written
+            await asyncio.gather(*call_signaling._tasks)
+            async with database() as db:
+                assert (await Call.get_by_id(db, call.id)).status == winner.status
+        finally:
+            await call_signaling.stop()
+
+    asyncio.run(scenario())
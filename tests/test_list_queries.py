@@ -0,0 +1,103 @@
+import asyncio
+from contextlib import contextmanager
+
+from fastapi import Response
+from sqlalchemy import event
+
+from app.api.routes.friends import get_friend_requests, get_friends
+from app.api.routes.groups import get_group_members
+from app.core.membership_cache import membership_cache
+from app.models.friendship import Friendship, FriendshipStatus
+from app.models.group import Group, GroupMember, GroupMemberRole
+from app.models.user import User
+
+PAGE_SIZE = 8
+
+
+@contextmanager
+def counting_statements(database):
+    """Collect the SQL statements sent through the test database's engine."""
+    engine = database.kw["bind"].sync_engine
+    statements = []
+
+    def record(connection, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+async def create_users(database, count):
+    async with database() as db:
+        return [
+            await User.create(db, email=f"user{i}@example.com", username=f"user{i}", hashed_password="x", is_active=True)
+            for i in range(count)
+        ]
+
+
+async def statements_per_page(database, list_page, limit):
+    """Count the statements one page of a listing costs, starting from cold caches."""
+    membership_cache.clear()
+    async with database() as db:
+        with counting_statements(database) as statements:
+            page = await list_page(db, limit)
+    assert len(page) == limit
+    return len(statements)
+
+
+def assert_constant_statements(database, list_page):
+    async def scenario():
+        one = await statements_per_page(database, list_page, 1)
+        many = await statements_per_page(database, list_page, PAGE_SIZE)
+        assert one == many
+
+    asyncio.run(scenario())
+
+
+def test_friends_page_costs_the_same_queries_for_any_size(database):
+    async def setup():
+        me, *others = await create_users(database, PAGE_SIZE + 2)
+        async with database() as db:
+            for other in others:
+                await Friendship.create(db, requester_id=me.id, addressee_id=other.id, status=FriendshipStatus.ACCEPTED)
+        return me
+
+    me = asyncio.run(setup())
+    assert_constant_statements(
+        database,
+        lambda db, limit: get_friends(Response(), cursor=None, limit=limit, current_user=me, db=db)
+    )
+
+
+def test_friend_requests_page_costs_the_same_queries_for_any_size(database):
+    async def setup():
+        me, *others = await create_users(database, PAGE_SIZE + 2)
+        async with database() as db:
+            for other in others:
+                await Friendship.create(db, requester_id=other.id, addressee_id=me.id, status=FriendshipStatus.PENDING)
+        return me
+
+    me = asyncio.run(setup())
+    assert_constant_statements(
+        database,
+        lambda db, limit: get_friend_requests(Response(), cursor=None, limit=limit, current_user=me, db=db)
+    )
+
+
+def test_group_members_page_costs_the_same_queries_for_any_size(database):
+    async def setup():
+        me, *others = await create_users(database, PAGE_SIZE + 2)
+        async with database() as db:
+            group = await Group.create_with_admin(db, me.id, name="Test group")
+            await GroupMember.bulk_add(db, group.id, [other.id for other in others], GroupMemberRole.MEMBER)
+            await db.commit()
+        return me, group
+
+    me, group = asyncio.run(setup())
+    assert_constant_statements(
+        database,
+        lambda db, limit: get_group_members(group.id, Response(), cursor=None, limit=limit, current_user=me, db=db)
+    )